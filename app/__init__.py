@@ -89,10 +89,16 @@ def create_app(config_name=None, config_object=None):
 
     cors.init_app(app)
     cache.init_app(app)
+    if app.config.get("CACHE_L1_ENABLED"):
+        from app.services.two_tier_cache import TwoTierCache
+
+        app.extensions["cache"][cache] = TwoTierCache.from_config(app.extensions["cache"][cache], app.config)
     jwtManager.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
 
+    from app.services.cache_tags import add_cache_tags, cached_with_tags, purge_tags, spot_tags
+
     # JWT user loader
     @jwtManager.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
@@ -185,6 +191,15 @@ def create_app(config_name=None, config_object=None):
         status_code = 200 if health_status["status"] == "healthy" else 503
         return jsonify(health_status), status_code
 
+    @app.route("/cache/stats")
+    @jwt_required()
+    def get_cache_stats():
+        """Hit and miss counts per cache tier, for this worker"""
+        if not get_current_user().admin:
+            abort(403, "You must be an admin to that")
+        backend = cache.cache
+        return {"data": backend.stats() if hasattr(backend, "stats") else {"backend": type(backend).__name__}}
+
     @app.route("/health/ready")
     def readiness_check():
         try:
@@ -263,9 +278,10 @@ def create_app(config_name=None, config_object=None):
         return jsonify(auth_token=auth_token)
 
     @app.route("/beachimages")
-    @cache.cached(query_string=True)
+    @cached_with_tags(query_string=True)
     def get_beach_images():
         beach_id = request.args.get("beach_id")
+        add_cache_tags(f"spot:{beach_id}")
         output = []
         images = Image.query.filter_by(beach_id=beach_id).all()
         for image in images:
@@ -353,6 +369,7 @@ def create_app(config_name=None, config_object=None):
                 spot.locality_id = int(locality_id)
             data.append(spot.get_dict())
         db.session.commit()
+        purge_tags(*{tag for spot in spots for tag in spot_tags(spot)})
         return {"data": data}
 
     @app.route("/update-usernames")
@@ -594,6 +611,53 @@ def create_app(config_name=None, config_object=None):
         print(f"  - Sent: {result['sent']}")
         print(f"  - Failed: {result['failed']}")
 
+    @app.cli.command("process-notifications")
+    def process_notifications():
+        """Send all due review notification jobs"""
+        from app.helpers.send_notifications import process_notification_jobs
+
+        print("Processing notification jobs...")
+        result = process_notification_jobs()
+
+        print(f"Processed {result['total_processed']} notification jobs:")
+        print(f"  - Sent: {result['sent']}")
+        print(f"  - Failed: {result['failed']}")
+
+    @app.cli.command("build-similar-spots")
+    def build_similar_spots():
+        """Recompute similar spots from co-reviews"""
+        from app.helpers.spot_similarity import build_similar_spots
+
+        print("Building similar spots...")
+        result = build_similar_spots()
+
+        print(f"Stored {result['pairs']} similar spot pairs:")
+        print(f"  - Spots with neighbors: {result['spots']}")
+        print(f"  - Reviews considered: {result['reviews']}")
+
+    @app.cli.command("decay-trending")
+    def decay_trending():
+        """Decay spot trending scores to now"""
+        from app.helpers.trending import decay_trending_scores
+
+        print("Decaying trending scores...")
+        result = decay_trending_scores()
+
+        print(f"Decayed {result['updated']} trending scores:")
+        print(f"  - Zeroed: {result['zeroed']}")
+
+    @app.cli.command("build-autocomplete")
+    def build_autocomplete():
+        """Write the autocomplete snapshot that web workers memory-map"""
+        from app.services.autocomplete_index import build_snapshot
+
+        path = app.config["AUTOCOMPLETE_INDEX_PATH"]
+        print(f"Building autocomplete snapshot at {path}...")
+        result = build_snapshot(path)
+
+        print(f"Indexed {result['spots']} spots:")
+        print(f"  - Keys: {result['keys']}")
+
     @app.cli.command("check-scheduler-health")
     def check_scheduler_health():
         """Check if the email scheduler is running properly"""
@@ -38,9 +38,41 @@ class Config:
 
         self.SQLALCHEMY_DATABASE_URI = db_url
 
-    # Cache Configuration
-    CACHE_TYPE = "SimpleCache"
+    # Cache Configuration ("app.services.shared_cache.SharedRedisCache" shares one cache across workers)
+    CACHE_TYPE = os.environ.get("CACHE_TYPE", "SimpleCache")
     CACHE_DEFAULT_TIMEOUT = 300
+    # Responses cached with cache_tags.cached_with_tags are purged on write, so they can live longer;
+    # ignored with SimpleCache, whose purges only reach one worker
+    CACHE_TAGGED_TIMEOUT = int(os.environ.get("CACHE_TAGGED_TIMEOUT", 24 * 60 * 60))
+    # Coalesced rebuilds: how long a rebuild may hold its lock, and how long other requests wait on it
+    CACHE_LOCK_TIMEOUT = int(os.environ.get("CACHE_LOCK_TIMEOUT", 30))
+    CACHE_LOCK_WAIT = float(os.environ.get("CACHE_LOCK_WAIT", 5))
+    # Shared cache server, "fake://" for the in-process stand-in
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+    CACHE_REDIS_MAX_CONNECTIONS = int(os.environ.get("CACHE_REDIS_MAX_CONNECTIONS", 20))
+    CACHE_REDIS_POOL_TIMEOUT = float(os.environ.get("CACHE_REDIS_POOL_TIMEOUT", 0.5))
+    CACHE_REDIS_SOCKET_TIMEOUT = float(os.environ.get("CACHE_REDIS_SOCKET_TIMEOUT", 0.25))
+    CACHE_REDIS_CONNECT_TIMEOUT = float(os.environ.get("CACHE_REDIS_CONNECT_TIMEOUT", 0.25))
+    # Treat cache errors as misses, and skip the server for CACHE_REDIS_RETRY_SECONDS after one
+    CACHE_FAIL_OPEN = os.environ.get("CACHE_FAIL_OPEN", "True").lower() == "true"
+    CACHE_REDIS_RETRY_SECONDS = int(os.environ.get("CACHE_REDIS_RETRY_SECONDS", 5))
+    # Per-worker LRU in front of CACHE_TYPE; other workers' writes and purges show up within CACHE_L1_TIMEOUT
+    CACHE_L1_ENABLED = os.environ.get("CACHE_L1_ENABLED", "False").lower() == "true"
+    CACHE_L1_MAX_ENTRIES = int(os.environ.get("CACHE_L1_MAX_ENTRIES", 2000))
+    CACHE_L1_MAX_BYTES = int(os.environ.get("CACHE_L1_MAX_BYTES", 32 * 1024 * 1024))
+    CACHE_L1_TIMEOUT = int(os.environ.get("CACHE_L1_TIMEOUT", 5))
+
+    # Spatial index for nearby-spot lookups (rebuilt per worker, refreshed from Spot.updated)
+    SPATIAL_INDEX_ENABLED = os.environ.get("SPATIAL_INDEX_ENABLED", "True").lower() == "true"
+    SPATIAL_INDEX_REFRESH_SECONDS = int(os.environ.get("SPATIAL_INDEX_REFRESH_SECONDS", 60))
+    TYPEAHEAD_INDEX_REFRESH_SECONDS = int(os.environ.get("TYPEAHEAD_INDEX_REFRESH_SECONDS", 60))
+    FACET_INDEX_REFRESH_SECONDS = int(os.environ.get("FACET_INDEX_REFRESH_SECONDS", 60))
+    # Autocomplete snapshot, rebuilt hourly by a background thread in the web workers (or by
+    # `flask build-autocomplete`) and memory-mapped by every worker on the host
+    AUTOCOMPLETE_INDEX_PATH = os.environ.get("AUTOCOMPLETE_INDEX_PATH", "/tmp/snorkel-autocomplete.idx")
+    # Search query log, buffered per worker and written to search_query in batches (0 = only on demand)
+    SEARCH_LOG_ENABLED = os.environ.get("SEARCH_LOG_ENABLED", "True").lower() == "true"
+    SEARCH_LOG_FLUSH_SECONDS = int(os.environ.get("SEARCH_LOG_FLUSH_SECONDS", 10))
 
     # Email Configuration
     SENDGRID_API_KEY = os.environ.get("SENDGRID_API_KEY")
@@ -50,6 +82,10 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY")
     S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME")
 
+    # Push notifications ("stub" swaps Pinpoint for an in-process client that records sends)
+    PINPOINT_CLIENT = os.environ.get("PINPOINT_CLIENT", "boto3")
+    PINPOINT_APPLICATION_ID = os.environ.get("PINPOINT_APPLICATION_ID")
+
     # Google Services
     GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
     GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
@@ -97,7 +133,6 @@ class DevelopmentConfig(Config):
     """Development configuration."""
 
     DEBUG = True
-    CACHE_TYPE = "SimpleCache"
 
     def __init__(self):
         super().__init__()
@@ -107,7 +142,10 @@ class ProductionConfig(Config):
     """Production configuration."""
 
     DEBUG = False
-    CACHE_TYPE = "SimpleCache"  # Consider Redis for production
+    CACHE_TYPE = os.environ.get(
+        "CACHE_TYPE",
+        "app.services.shared_cache.SharedRedisCache" if os.environ.get("CACHE_REDIS_URL") else "SimpleCache",
+    )
 
 
 class TestingConfig(Config):
@@ -116,6 +154,8 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     CACHE_TYPE = "SimpleCache"
+    PINPOINT_CLIENT = "stub"
+    SEARCH_LOG_FLUSH_SECONDS = 0
 
     def __init__(self):
         test_db_url = os.environ.get("TEST_DATABASE_URL")
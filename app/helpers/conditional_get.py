@@ -0,0 +1,76 @@
+import functools
+import hashlib
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+from flask import current_app, make_response, request
+
+
+def _flatten(values):
+    """Scalars in values, including inside result rows"""
+    for value in values:
+        if isinstance(value, Sequence) and not isinstance(value, (str, bytes)):
+            yield from _flatten(value)
+        else:
+            yield value
+
+
+def validators(values):
+    """(ETag, Last-Modified) for a response at request.full_path built from entities with these versions
+
+    The ETag hashes every value, so a count drops it when a row is deleted even though no
+    `updated` moved. Last-Modified is the latest datetime among them, taken as UTC.
+    """
+    values = list(_flatten(values))
+    etag = hashlib.md5(repr([request.full_path, *values]).encode()).hexdigest()
+    last_modified = max((value for value in values if isinstance(value, datetime)), default=None)
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return etag, last_modified
+
+
+def not_modified(etag):
+    """Whether the client's copy is current per If-None-Match
+
+    If-Modified-Since is ignored: versions include counts, and a deleted row lowers a count
+    without moving Last-Modified, so only the ETag notices.
+    """
+    return bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+
+def conditional_get(versions):
+    """Set ETag and Last-Modified on a GET view's responses and answer revalidations with 304
+
+    versions(*view_args, **view_kwargs) returns a few values that change whenever the response
+    would: typically the max `updated` and the count of the entities it is built from, read with
+    one aggregate query each. It runs before the view (and any cache in front of it), so a client
+    whose copy is current costs those queries and no serialization. Returning None skips
+    validation, e.g. when the entity doesn't exist and the view is about to 404.
+
+    Only If-None-Match is answered with 304; Last-Modified is informational. Responses are marked
+    ``Cache-Control: no-cache`` so clients revalidate every time instead of guessing a freshness
+    lifetime from Last-Modified.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            values = versions(*args, **kwargs)
+            if values is None:
+                return view(*args, **kwargs)
+            etag, last_modified = validators(values)
+            if not_modified(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
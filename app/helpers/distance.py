@@ -0,0 +1,13 @@
+import math
+
+# Same constants as the ``distance`` hybrids on the models, so Python and SQL rank rows identically
+MILES_PER_DEGREE = 69.1
+DEGREES_PER_RADIAN = 57.3
+
+
+def spot_distance(latitude, longitude, spot_latitude, spot_longitude):
+    """Python twin of the Spot.distance SQL expression (miles)"""
+    return math.sqrt(
+        (MILES_PER_DEGREE * (spot_latitude - latitude)) ** 2
+        + (MILES_PER_DEGREE * (spot_longitude - longitude) * math.cos(spot_latitude / DEGREES_PER_RADIAN)) ** 2
+    )
@@ -0,0 +1,162 @@
+import html
+import re
+
+from sqlalchemy import func, union
+
+from app.helpers.normalize_text import normalize_text
+from app.models import Review, Spot, db
+
+TEXT_SEARCH_CONFIG = "english"
+# A spot's rank is its own document's rank plus this share of its best matching review's
+REVIEW_RANK_WEIGHT = 0.5
+# ts_headline copies the source text through unescaped, so hits are marked with private use
+# characters and marked_headline swaps them for <mark> after escaping everything else
+MARK_START = "\ue000"
+MARK_STOP = "\ue001"
+HEADLINE_OPTIONS = f"StartSel={MARK_START}, StopSel={MARK_STOP}, MaxWords=30, MinWords=10, MaxFragments=2"
+# Postgres' default ts_rank weights for the D, C, B and A labels, used by the fallback
+LABEL_WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2}
+SNIPPET_CONTEXT = 60
+
+
+def fulltext_search(term, limit=20, offset=0):
+    """[{spot, rank, highlight, review_matches}] for spots whose own text or public reviews match term"""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return _pg_fulltext_search(term, limit, offset)
+    return _fallback_fulltext_search(term, limit, offset)
+
+
+def _pg_fulltext_search(term, limit, offset):
+    """Both candidate sets come from the GIN indexes; headlines are only built for the page"""
+    tsquery = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, term)
+    public_reviews = Review.query.filter(Review.search_vector.op("@@")(tsquery), Review.is_private.isnot(True))
+    candidates = union(
+        db.session.query(Spot.id.label("spot_id")).filter(Spot.search_vector.op("@@")(tsquery)),
+        public_reviews.with_entities(Review.beach_id.label("spot_id")),
+    ).subquery()
+    review_ranks = (
+        public_reviews.with_entities(
+            Review.beach_id.label("spot_id"),
+            func.max(func.ts_rank_cd(Review.search_vector, tsquery)).label("rank"),
+            func.count(Review.id).label("matches"),
+        )
+        .group_by(Review.beach_id)
+        .subquery()
+    )
+    rank = (
+        func.ts_rank_cd(func.coalesce(Spot.search_vector, ""), tsquery)
+        + REVIEW_RANK_WEIGHT * func.coalesce(review_ranks.c.rank, 0)
+    ).label("rank")
+    rows = (
+        db.session.query(Spot, rank, func.coalesce(review_ranks.c.matches, 0))
+        .join(candidates, candidates.c.spot_id == Spot.id)
+        .outerjoin(review_ranks, review_ranks.c.spot_id == Spot.id)
+        .filter(Spot.is_verified.isnot(False), Spot.is_deleted.isnot(True))
+        .order_by(rank.desc(), Spot.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        return []
+
+    page = [spot.id for spot, _, _ in rows]
+    spot_headlines = dict(
+        db.session.query(
+            Spot.id,
+            func.ts_headline(TEXT_SEARCH_CONFIG, func.coalesce(Spot.description, ""), tsquery, HEADLINE_OPTIONS),
+        ).filter(Spot.id.in_(page), Spot.search_vector.op("@@")(tsquery))
+    )
+    # DISTINCT ON keeps each spot's best matching review
+    review_headlines = dict(
+        public_reviews.with_entities(
+            Review.beach_id,
+            func.ts_headline(TEXT_SEARCH_CONFIG, func.coalesce(Review.text, ""), tsquery, HEADLINE_OPTIONS),
+        )
+        .filter(Review.beach_id.in_(page))
+        .distinct(Review.beach_id)
+        .order_by(Review.beach_id, func.ts_rank_cd(Review.search_vector, tsquery).desc())
+    )
+    return [
+        {
+            "spot": spot,
+            "rank": float(spot_rank),
+            "highlight": marked_headline(spot_headlines.get(spot.id) or review_headlines.get(spot.id)),
+            "review_matches": int(review_matches),
+        }
+        for spot, spot_rank, review_matches in rows
+    ]
+
+
+def _document_score(words, fields):
+    """Weighted count of query word hits across (text, label) fields, or 0 unless every word is present"""
+    normalized = [(normalize_text(text), LABEL_WEIGHTS[label]) for text, label in fields]
+    if not all(any(word in text for text, _ in normalized) for word in words):
+        return 0.0
+    return sum(weight * text.count(word) for word in words for text, weight in normalized)
+
+
+def marked_headline(headline):
+    """HTML-escaped ts_headline output with the MARK_START/MARK_STOP hits wrapped in <mark>"""
+    if not headline:
+        return None
+    return html.escape(headline).replace(MARK_START, "<mark>").replace(MARK_STOP, "</mark>")
+
+
+def highlight(text, words):
+    """HTML-escaped window of text around the first query word hit, with every hit wrapped in <mark>"""
+    if not text:
+        return None
+    pattern = re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+    match = pattern.search(text)
+    if not match:
+        return None
+    start = max(0, match.start() - SNIPPET_CONTEXT)
+    end = min(len(text), match.end() + SNIPPET_CONTEXT)
+    window = text[start:end]
+    parts = []
+    position = 0
+    for hit in pattern.finditer(window):
+        parts.append(html.escape(window[position : hit.start()]))
+        parts.append(f"<mark>{html.escape(hit.group(0))}</mark>")
+        position = hit.end()
+    parts.append(html.escape(window[position:]))
+    return "".join(parts)
+
+
+def _fallback_fulltext_search(term, limit, offset):
+    """Substring matching for databases without tsvector (SQLite in tests)
+
+    Every query word has to appear in the document, and hits are weighted like the tsvector
+    labels. There is no stemming, so "turtle" finds "turtles" but not the other way round.
+    """
+    words = normalize_text(term).split()
+    if not words:
+        return []
+    results = {}
+    for spot in Spot.query.filter(Spot.is_verified.isnot(False), Spot.is_deleted.isnot(True)):
+        score = _document_score(words, [(spot.name, "A"), (spot.location_city, "B"), (spot.description, "C")])
+        results[spot.id] = {
+            "spot": spot,
+            "rank": score,
+            "highlight": highlight(spot.description, words) if score else None,
+            "review_matches": 0,
+            "review_rank": 0.0,
+        }
+    for review in Review.query.filter(Review.is_private.isnot(True)):
+        result = results.get(review.beach_id)
+        score = _document_score(words, [(review.title, "A"), (review.text, "B")])
+        if result is None or not score:
+            continue
+        result["review_matches"] += 1
+        if score > result["review_rank"]:
+            result["review_rank"] = score
+            if not result["rank"]:
+                result["highlight"] = highlight(review.text, words)
+    matched = []
+    for result in results.values():
+        if result["rank"] or result["review_matches"]:
+            result["rank"] += REVIEW_RANK_WEIGHT * result.pop("review_rank")
+            matched.append(result)
+    matched.sort(key=lambda result: (-result["rank"], result["spot"].id))
+    return matched[offset : offset + limit]
@@ -0,0 +1,100 @@
+import re
+
+from sqlalchemy import func, literal, or_
+
+from app.models import Spot, db
+
+# How much a match in each field counts towards a spot's relevance
+FIELD_WEIGHTS = (("name", 1.0), ("location_city", 0.6), ("description", 0.3))
+# pg_trgm's default pg_trgm.word_similarity_threshold; a field has to reach it to match
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+
+def trigrams(text):
+    """pg_trgm's trigram set: lowercased alphanumeric words padded with two spaces before, one after"""
+    result = set()
+    for word in re.findall(r"[^\W_]+", (text or "").lower()):
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def word_similarity(term, text):
+    """Python twin of pg_trgm word_similarity(term, text)
+
+    The share of the term's trigrams found in the best-matching run of consecutive words in
+    text. pg_trgm scans trigram extents rather than whole words, so scores can differ slightly
+    at the edges, but exact and near-miss word matches score the same.
+    """
+    term_grams = trigrams(term)
+    if not term_grams:
+        return 0.0
+    words = re.findall(r"[^\W_]+", (text or "").lower())
+    span = max(1, len(re.findall(r"[^\W_]+", term)))
+    best = 0
+    for start in range(len(words)):
+        for end in range(start + 1, min(len(words), start + span + 1) + 1):
+            best = max(best, len(term_grams & trigrams(" ".join(words[start:end]))))
+    return best / len(term_grams)
+
+
+def _pg_relevance(term):
+    return sum(
+        weight * func.coalesce(func.word_similarity(term, getattr(Spot, field)), 0.0) for field, weight in FIELD_WEIGHTS
+    )
+
+
+def _pg_matches(term):
+    pattern = f"%{term}%"
+    return or_(
+        *(
+            or_(literal(term).op("<%")(getattr(Spot, field)), getattr(Spot, field).ilike(pattern))
+            for field, _ in FIELD_WEIGHTS
+        )
+    )
+
+
+def _fallback_scores(query, term):
+    """Sorted (-score, spot id) for spots from query matching term, scored in Python"""
+    lowered = term.lower()
+    scored = []
+    for row in query.with_entities(Spot.id, Spot.name, Spot.location_city, Spot.description):
+        fields = [(getattr(row, field) or "", weight) for field, weight in FIELD_WEIGHTS]
+        similarities = [word_similarity(term, text) for text, _ in fields]
+        if any(similarity >= WORD_SIMILARITY_THRESHOLD for similarity in similarities) or any(
+            lowered in text.lower() for text, _ in fields
+        ):
+            score = sum(similarity * weight for similarity, (_, weight) in zip(similarities, fields))
+            scored.append((-score, row.id))
+    return sorted(scored)
+
+
+def fuzzy_search_spots(query, term, limit=50, offset=0):
+    """Spots from query whose name, city or description matches term, most relevant first
+
+    On Postgres, fields match with pg_trgm's word-similarity operator (served by the trigram
+    GIN indexes, typo tolerant) or a plain substring and are ranked by the weighted
+    word_similarity across fields. Elsewhere (SQLite in tests) the same scoring runs in Python
+    over the narrow columns, then only the requested page of spots is loaded.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        return (
+            query.filter(_pg_matches(term))
+            .order_by(_pg_relevance(term).desc(), Spot.id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    page = [spot_id for _, spot_id in _fallback_scores(query, term)[offset : offset + limit]]
+    if not page:
+        return []
+    spots = {spot.id: spot for spot in Spot.query.filter(Spot.id.in_(page))}
+    return [spots[spot_id] for spot_id in page if spot_id in spots]
+
+
+def fuzzy_match_ids(query, term):
+    """Ids of every spot from query that fuzzy_search_spots would return, unordered"""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return [spot_id for (spot_id,) in query.filter(_pg_matches(term)).with_entities(Spot.id)]
+    return [spot_id for _, spot_id in _fallback_scores(query, term)]
@@ -0,0 +1,78 @@
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Stored precision: 9 characters is a ~5m x 5m cell, well below anything a nearby query cares about
+GEOHASH_PRECISION = 9
+# More prefixes than this turns one index range scan per prefix into more work than it saves
+MAX_COVERING_PREFIXES = 16
+
+
+def _cell_bits(precision):
+    """(latitude bits, longitude bits) of a geohash with precision characters"""
+    bits = 5 * precision
+    return bits // 2, bits - bits // 2
+
+
+def _cell_index(value, lower, upper, bits):
+    index = int((value - lower) / (upper - lower) * (1 << bits))
+    return min(max(index, 0), (1 << bits) - 1)
+
+
+def encode_cell(lat_index, lng_index, precision):
+    """Geohash of the cell at (lat_index, lng_index) in the precision-character grid"""
+    lat_bits, lng_bits = _cell_bits(precision)
+    chars = []
+    char = 0
+    for bit in range(5 * precision):
+        # Bits alternate longitude/latitude, longitude first, most significant first
+        if bit % 2 == 0:
+            lng_bits -= 1
+            char = (char << 1) | ((lng_index >> lng_bits) & 1)
+        else:
+            lat_bits -= 1
+            char = (char << 1) | ((lat_index >> lat_bits) & 1)
+        if bit % 5 == 4:
+            chars.append(BASE32[char])
+            char = 0
+    return "".join(chars)
+
+
+def cell(latitude, longitude, precision):
+    """(lat_index, lng_index) of the precision-character geohash cell holding a lat/lng"""
+    lat_bits, lng_bits = _cell_bits(precision)
+    return (
+        _cell_index(latitude, -90.0, 90.0, lat_bits),
+        _cell_index(longitude, -180.0, 180.0, lng_bits),
+    )
+
+
+def cell_ranges(min_lat, max_lat, min_lng, max_lng, precision):
+    """Ranges of lat and lng cell indexes at precision that a lat/lng box touches"""
+    lat_lo, lng_lo = cell(max(min_lat, -90.0), max(min_lng, -180.0), precision)
+    lat_hi, lng_hi = cell(min(max_lat, 90.0), min(max_lng, 180.0), precision)
+    return range(lat_lo, lat_hi + 1), range(lng_lo, lng_hi + 1)
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a lat/lng, or None when either is missing"""
+    if latitude is None or longitude is None:
+        return None
+    return encode_cell(*cell(latitude, longitude, precision), precision)
+
+
+def covering_prefixes(min_lat, max_lat, min_lng=None, max_lng=None, max_prefixes=MAX_COVERING_PREFIXES):
+    """Geohash prefixes whose cells together cover a lat/lng box
+
+    Picks the longest prefix length that needs at most max_prefixes cells. Longitude bounds of
+    None mean the box spans every longitude. Returns None when even single-character prefixes
+    can't cover the box within max_prefixes, i.e. a prefix filter wouldn't narrow anything.
+    """
+    if min_lng is None or max_lng is None:
+        min_lng, max_lng = -180.0, 180.0
+
+    best = None
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_range, lng_range = cell_ranges(min_lat, max_lat, min_lng, max_lng, precision)
+        if len(lat_range) * len(lng_range) > max_prefixes:
+            break
+        best = sorted(encode_cell(i, j, precision) for i in lat_range for j in lng_range)
+    return best
@@ -1,26 +1,28 @@
+from flask import current_app
 from sqlalchemy import and_
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import joinedload
 
+from app.helpers.nearby import nearest
 from app.models import Spot
+from app.services.spatial_index import spot_index
 
 
 def get_nearby_spots(latitude, longitude, limit=25, spot_id=None):
     limit = limit if limit else 25
+    if current_app.config.get("SPATIAL_INDEX_ENABLED", True):
+        spots = get_nearby_spots_from_index(latitude, longitude, limit, spot_id)
+        if spots is not None:
+            return spots
     try:
-        query = (
-            Spot.query.filter(
-                and_(
-                    Spot.is_verified,
-                    Spot.is_deleted.is_not(True),
-                    Spot.id != spot_id,
-                )
+        query = Spot.query.filter(
+            and_(
+                Spot.is_verified,
+                Spot.is_deleted.is_not(True),
+                Spot.id != spot_id,
             )
-            .options(joinedload("locality"))
-            .order_by(Spot.distance(latitude, longitude))
-            .limit(limit)
-        )
-        return query.all()
+        ).options(joinedload("locality"))
+        return nearest(query, Spot, latitude, longitude, limit)
     except OperationalError as e:
         if "no such function: sqrt" in str(e).lower():
             query = (
@@ -40,3 +42,38 @@ def get_nearby_spots(latitude, longitude, limit=25, spot_id=None):
             raise e
     except Exception as e:
         raise e
+
+
+def get_nearby_spots_from_index(latitude, longitude, limit, spot_id=None):
+    """Answer get_nearby_spots from the in-process spatial index
+
+    Returns None whenever the index can't reproduce the SQL ordering exactly (its first build
+    is still running, not enough located spots, or an id that changed since the last refresh)
+    so the caller falls back.
+    """
+    try:
+        latitude, longitude, limit = float(latitude), float(longitude), int(limit)
+        exclude_id = int(spot_id) if spot_id is not None else None
+    except (TypeError, ValueError):
+        return None
+    spot_index.refresh(max_age=current_app.config.get("SPATIAL_INDEX_REFRESH_SECONDS", 60), background=True)
+    if not spot_index.ready:
+        return None
+    ids = [spot_id for _, spot_id in spot_index.nearest(latitude, longitude, limit, exclude_id)]
+    if len(ids) < limit:
+        return None
+    spots = (
+        Spot.query.filter(
+            and_(
+                Spot.id.in_(ids),
+                Spot.is_verified,
+                Spot.is_deleted.is_not(True),
+            )
+        )
+        .options(joinedload("locality"))
+        .all()
+    )
+    if len(spots) != len(ids):
+        return None
+    spots_by_id = {spot.id: spot for spot in spots}
+    return [spots_by_id[id] for id in ids]
@@ -0,0 +1,68 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import abort
+from sqlalchemy import literal, tuple_
+
+from app.models import Review
+
+# Served by ix_review_beach_id_date_posted_id and ix_review_date_posted_id
+REVIEWS_NEWEST_FIRST = [("date_posted", Review.date_posted, True), ("id", Review.id, True)]
+
+
+def encode_cursor(labels, values):
+    """Opaque cursor for the row with these sort key values"""
+    payload = {
+        "k": labels,
+        "v": [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, labels):
+    """Sort key values from a cursor, aborting with 400 if it is malformed or for another sort"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = [datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value for value in payload["v"]]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        abort(400, "Invalid cursor")
+    if payload.get("k") != labels or len(values) != len(labels):
+        abort(400, "Cursor is for a different sort order")
+    return values
+
+
+def seek(keys, values):
+    """Rows strictly after values in keys' order
+
+    A row-value comparison, which Postgres answers with one range scan of an index on the same
+    expressions (scanned backwards for descending keys).
+    """
+    expressions = [expression for _, expression, _ in keys]
+    bound = tuple_(*[literal(value, type_=expression.type) for expression, value in zip(expressions, values)])
+    return tuple_(*expressions) < bound if keys[0][2] else tuple_(*expressions) > bound
+
+
+def keyset_page(query, keys, limit, cursor=None, offset=0):
+    """(rows, next_cursor) for one page of query in keys' order
+
+    keys is [(label, expression, descending)], all in the same direction, and must end with a
+    unique column (the id) so the order is total; expressions should never be NULL (coalesce
+    nullable columns) and should match an index. With a cursor the page starts right after the row it was made from,
+    otherwise at offset. next_cursor is None on the last page.
+    """
+    if len({descending for _, _, descending in keys}) != 1:
+        raise ValueError("Keyset keys must all sort in the same direction")
+    limit = max(int(limit), 1)
+    labels = [label for label, _, _ in keys]
+    query = query.add_columns(*[expression for _, expression, _ in keys]).order_by(
+        *[expression.desc() if descending else expression.asc() for _, expression, descending in keys]
+    )
+    if cursor:
+        query = query.filter(seek(keys, decode_cursor(cursor, labels)))
+    elif offset:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(labels, list(rows[limit - 1][1:])) if len(rows) > limit else None
+    return [row[0] for row in rows[:limit]], next_cursor
@@ -1,5 +1,6 @@
 from app import db
 from app.models import AreaOne, AreaTwo, Locality, Spot
+from app.services.cache_tags import purge_tags, spot_tags
 
 
 def merge_area_one(stable_id, remove_id):
@@ -21,4 +22,5 @@ def merge_area_one(stable_id, remove_id):
 
     AreaOne.query.filter_by(id=remove_id).delete()
     db.session.commit()
+    purge_tags(*{tag for spot in spots for tag in spot_tags(spot)})
     return results
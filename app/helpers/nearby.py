@@ -0,0 +1,91 @@
+import math
+
+from sqlalchemy import or_
+
+from app.helpers.distance import DEGREES_PER_RADIAN, MILES_PER_DEGREE, spot_distance
+from app.helpers.geohash import covering_prefixes
+
+# First box for a k-nearest query is this many miles for k=25, scaled by sqrt(k)
+DEFAULT_RADIUS_MILES = 25
+# Each miss multiplies the radius by this, so even an empty table stops after a handful of queries
+RADIUS_GROWTH = 4
+# Float slack so rows sitting exactly on the box edge aren't dropped
+BOX_PADDING = 1.0001
+
+
+def bounding_box(latitude, longitude, radius):
+    """Lat/lng box holding every row within radius miles of the origin
+
+    Mirrors the ``distance`` hybrids, which scale longitude by cos of the *row's* latitude, so
+    the longitude span is sized for the highest latitude the box reaches. Returns
+    (min_lat, max_lat, min_lng, max_lng); the longitude bounds are None once the box reaches
+    close enough to a pole that longitude no longer constrains anything, and the whole tuple
+    is None once the box covers the globe.
+    """
+    lat_span = BOX_PADDING * radius / MILES_PER_DEGREE
+    min_lat, max_lat = latitude - lat_span, latitude + lat_span
+    cos_bound = math.cos(min(90.0, max(abs(min_lat), abs(max_lat))) / DEGREES_PER_RADIAN)
+    lng_span = BOX_PADDING * radius / (MILES_PER_DEGREE * cos_bound) if cos_bound > 0 else None
+    if lng_span is not None and lng_span >= 360:
+        lng_span = None
+    if lng_span is None:
+        if min_lat <= -90 and max_lat >= 90:
+            return None
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, longitude - lng_span, longitude + lng_span
+
+
+def filter_bounding_box(query, model, box):
+    """Filter query to rows inside box
+
+    The geohash prefixes are the indexed first cut (one prefix range scan each); the lat/lng
+    comparisons then trim the parts of those cells that stick out past the box.
+    """
+    min_lat, max_lat, min_lng, max_lng = box
+    prefixes = covering_prefixes(min_lat, max_lat, min_lng, max_lng)
+    if prefixes:
+        query = query.filter(or_(*[model.geohash.startswith(prefix) for prefix in prefixes]))
+    query = query.filter(model.latitude.between(min_lat, max_lat))
+    if min_lng is not None:
+        query = query.filter(model.longitude.between(min_lng, max_lng))
+    return query
+
+
+def filter_within_radius(query, model, latitude, longitude, radius):
+    """Restrict query to rows within radius miles, letting the geohash index do the first cut"""
+    try:
+        box = bounding_box(float(latitude), float(longitude), float(radius))
+    except (TypeError, ValueError):
+        box = None
+    if box is not None:
+        query = filter_bounding_box(query, model, box)
+    return query.filter(model.distance(latitude, longitude) < radius)
+
+
+def nearest(query, model, latitude, longitude, limit=25):
+    """Return the limit rows of query closest to the origin, closest first
+
+    Same rows and order as ``query.order_by(model.distance(...)).limit(limit)``, but each
+    attempt only scores rows inside a bounding box. The box widens until it holds limit rows
+    and the farthest of them is inside the radius the box was built for, which guarantees
+    nothing outside the box could have ranked higher.
+    """
+    try:
+        origin_lat, origin_lng, limit = float(latitude), float(longitude), int(limit)
+    except (TypeError, ValueError):
+        return query.order_by(model.distance(latitude, longitude)).limit(limit).all()
+
+    radius = DEFAULT_RADIUS_MILES * math.sqrt(max(limit, 1) / 25)
+    while True:
+        box = bounding_box(origin_lat, origin_lng, radius)
+        if box is None:
+            # Rows without a location still sort last in the plain query, so let it run as-is
+            return query.order_by(model.distance(origin_lat, origin_lng)).limit(limit).all()
+        rows = (
+            filter_bounding_box(query, model, box).order_by(model.distance(origin_lat, origin_lng)).limit(limit).all()
+        )
+        if len(rows) == limit and (
+            not rows or spot_distance(origin_lat, origin_lng, rows[-1].latitude, rows[-1].longitude) <= radius
+        ):
+            return rows
+        radius *= RADIUS_GROWTH
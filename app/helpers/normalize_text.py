@@ -0,0 +1,15 @@
+import re
+import unicodedata
+
+# Characters NFKD doesn't split into a base letter plus accents
+_FOLDS = str.maketrans({"ß": "ss", "æ": "ae", "ø": "o", "œ": "oe", "ł": "l", "đ": "d", "ð": "d", "þ": "th", "ı": "i"})
+
+
+def normalize_text(text):
+    """Lowercase, unaccent and collapse punctuation/whitespace to single spaces, for search matching"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text.lower().translate(_FOLDS))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"['’]", "", text)  # "Molokini's" matches "molokinis"
+    return re.sub(r"[\W_]+", " ", text).strip()
@@ -1,58 +1,210 @@
-import boto3
+import time
+from datetime import datetime, timedelta
 
-from app.models import User
+from app import db
+from app.helpers.email_scheduler import send_slack_notification
+from app.helpers.nearby import filter_within_radius
+from app.models import NotificationJob, User
+from app.services.pinpoint import get_application_id, get_pinpoint_client
+
+# Pinpoint accepts at most 100 addresses per send_messages request
+BATCH_SIZE = 100
+# Inline retries for throttled/temporarily failed addresses within one run
+SEND_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1
+# After this many failed runs a job is marked failed instead of being rescheduled
+MAX_JOB_ATTEMPTS = 5
+RETRYABLE_STATUSES = {"THROTTLED", "TEMPORARY_FAILURE", "UNKNOWN_FAILURE", "TIMEOUT"}
+# "processing" jobs are due again once their claim lease runs out
+CLAIMABLE_STATUSES = ("pending", "processing")
+# A claimed job is pushed this far into the future, so a run that dies part way releases it
+CLAIM_LEASE = timedelta(minutes=15)
+
+
+def queue_notification(latitude, longitude, title, message, radius=50):
+    """Queue a push notification to everyone near a location for the background job"""
+    job = NotificationJob(
+        latitude=latitude,
+        longitude=longitude,
+        radius=radius,
+        title=title,
+        message=message,
+        scheduled_for=datetime.utcnow(),
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
 
 
 def send_notification(latitude, longitude, title, message):
-    nearby_users = User.query.filter(User.distance(latitude, longitude) < 50).all()
-    for user in nearby_users:
-        if user.push_token:
-            send_push_notification(user.push_token, title, message)
-        send_email(user.email, message)
-    return nearby_users
+    """Queue a notification and deliver it right away (used by the send_push test route)"""
+    job = queue_notification(latitude, longitude, title, message)
+    if claim_notification_job(job):
+        process_notification_job(job)
+    return job.get_dict()
 
 
 def send_email(email, message):
     return email, message
 
 
-def send_push_notification(push_token, title, message):
-    response = boto3.client("pinpoint").send_messages(
-        ApplicationId="268df0f0464b49609f26f711a800aecd",
-        MessageRequest={
-            "Addresses": {
-                f"{push_token}": {
-                    "ChannelType": "APNS",
-                }
-            },
-            "MessageConfiguration": {
-                "APNSMessage": {
-                    "APNSPushType": "alert",
-                    "Action": "OPEN_APP",  # | 'DEEP_LINK' | 'URL',
-                    "Badge": 1,
-                    "Body": message,
-                    # 'Category': 'string',
-                    # 'CollapseId': 'string',
-                    # 'Data': {
-                    #     'string': 'string'
-                    # },
-                    # 'MediaUrl': 'string',
-                    # 'PreferredAuthenticationMethod': 'string',
-                    # 'Priority': 'string',
-                    # 'RawContent': 'string',
-                    # 'SilentPush': True | False,
-                    # 'Sound': 'string',
-                    # 'Substitutions': {
-                    #     'string': [
-                    #         'string',
-                    #     ]
-                    # },
-                    # 'ThreadId': 'string',
-                    # 'TimeToLive': 123,
-                    "Title": title,
-                    # 'Url': 'string'
-                },
+def build_message_request(push_tokens, title, message):
+    return {
+        "Addresses": {f"{push_token}": {"ChannelType": "APNS"} for push_token in push_tokens},
+        "MessageConfiguration": {
+            "APNSMessage": {
+                "APNSPushType": "alert",
+                "Action": "OPEN_APP",  # | 'DEEP_LINK' | 'URL',
+                "Badge": 1,
+                "Body": message,
+                "Title": title,
             },
         },
+    }
+
+
+def send_push_notifications(push_tokens, title, message, client=None):
+    """Send one multi-address Pinpoint request, retrying addresses that failed transiently
+
+    Returns (undelivered, rejected): the addresses that still failed transiently after
+    SEND_RETRIES attempts, and those Pinpoint refused for good (opted out, bad token), which
+    are never retried.
+    """
+    client = client or get_pinpoint_client()
+    pending = list(push_tokens)
+    rejected = []
+    for attempt in range(SEND_RETRIES):
+        if attempt:
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        try:
+            response = client.send_messages(
+                ApplicationId=get_application_id(),
+                MessageRequest=build_message_request(pending, title, message),
+            )
+        except Exception as e:
+            print(f"Pinpoint send_messages failed: {e}")
+            continue
+        results = response.get("MessageResponse", {}).get("Result", {})
+        retry = []
+        for push_token in pending:
+            status = results.get(push_token, {}).get("DeliveryStatus")
+            if status in RETRYABLE_STATUSES:
+                retry.append(push_token)
+            elif status != "SUCCESSFUL":
+                rejected.append(push_token)
+        pending = retry
+        if not pending:
+            break
+    return pending, rejected
+
+
+def send_push_notification(push_token, title, message):
+    return send_push_notifications([push_token], title, message)
+
+
+def claim_notification_job(job):
+    """Take a due job for this run, unless an overlapping run already has it
+
+    One conditional UPDATE moves the job to "processing" and leases it for CLAIM_LEASE, so
+    two runs can't both send it. A run that dies mid-job leaves the lease to run out, after
+    which the job is due again and resumes from its saved progress.
+    """
+    now = datetime.utcnow()
+    claimed = NotificationJob.query.filter(
+        NotificationJob.id == job.id,
+        NotificationJob.status.in_(CLAIMABLE_STATUSES),
+        NotificationJob.scheduled_for <= now,
+    ).update({"status": "processing", "scheduled_for": now + CLAIM_LEASE}, synchronize_session=False)
+    db.session.commit()
+    db.session.refresh(job)
+    return claimed == 1
+
+
+def process_notification_job(job, client=None):
+    """Fan a claimed job out to nearby users in BATCH_SIZE chunks, in user id order
+
+    Progress is committed after every chunk, so a job that stops part way resumes after the
+    last user it reached. Addresses that stayed undelivered are kept on the job and are the
+    only ones retried on its next run; rejected ones only count towards recipients_failed.
+    """
+    client = client or get_pinpoint_client()
+    job.attempts += 1
+    failed = []
+
+    retry_tokens = job.pending_tokens or []
+    for start in range(0, len(retry_tokens), BATCH_SIZE):
+        chunk = retry_tokens[start : start + BATCH_SIZE]
+        undelivered, rejected = send_push_notifications(chunk, job.title, job.message, client=client)
+        failed.extend(undelivered)
+        job.recipients_sent += len(chunk) - len(undelivered) - len(rejected)
+        job.recipients_failed += len(rejected)
+
+    recipients = filter_within_radius(
+        db.session.query(User.id, User.push_token),
+        User,
+        job.latitude,
+        job.longitude,
+        job.radius,
+    ).filter(User.push_token.is_not(None))
+    while True:
+        chunk = recipients.filter(User.id > job.last_user_id).order_by(User.id).limit(BATCH_SIZE).all()
+        if not chunk:
+            break
+        push_tokens = list(dict.fromkeys(row.push_token for row in chunk))
+        undelivered, rejected = send_push_notifications(push_tokens, job.title, job.message, client=client)
+        failed.extend(undelivered)
+        job.last_user_id = chunk[-1].id
+        job.recipients_sent += len(push_tokens) - len(undelivered) - len(rejected)
+        job.recipients_failed += len(rejected)
+        job.pending_tokens = list(failed)
+        job.scheduled_for = datetime.utcnow() + CLAIM_LEASE
+        db.session.commit()
+
+    job.pending_tokens = failed
+    if not failed:
+        job.status = "sent"
+        job.sent_at = datetime.utcnow()
+        job.last_error = None
+    elif job.attempts < MAX_JOB_ATTEMPTS:
+        job.status = "pending"
+        job.last_error = f"{len(failed)} addresses undelivered"
+        job.scheduled_for = datetime.utcnow() + timedelta(minutes=2**job.attempts)
+    else:
+        job.status = "failed"
+        job.last_error = f"{len(failed)} addresses undelivered after {job.attempts} attempts"
+    db.session.commit()
+    return job.status == "sent"
+
+
+def process_notification_jobs():
+    """Process all notification jobs that are due, skipping any an overlapping run claimed"""
+    now = datetime.utcnow()
+    due_jobs = (
+        NotificationJob.query.filter(
+            NotificationJob.status.in_(CLAIMABLE_STATUSES),
+            NotificationJob.scheduled_for <= now,
+        )
+        .order_by(NotificationJob.scheduled_for)
+        .all()
     )
-    print(f"Pinpoint send_messages response: {response}")
+
+    sent_count = 0
+    failed_count = 0
+    processed = 0
+    for job in due_jobs:
+        try:
+            if not claim_notification_job(job):
+                continue
+            processed += 1
+            if process_notification_job(job):
+                sent_count += 1
+            elif job.status == "failed":
+                failed_count += 1
+        except Exception as e:
+            db.session.rollback()
+            error_msg = f"Error processing notification job {job.id}: {e}"
+            print(error_msg)
+            send_slack_notification(f"❌ Notification job failed: {error_msg}")
+            failed_count += 1
+
+    return {"sent": sent_count, "failed": failed_count, "total_processed": processed}
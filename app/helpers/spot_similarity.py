@@ -0,0 +1,98 @@
+import numpy as np
+from scipy import sparse
+from sqlalchemy import distinct, func
+
+from app import db
+from app.models import Review, Spot, SpotSimilarity
+
+# Neighbors stored per spot
+SIMILAR_SPOTS = 10
+# Pairs reviewed together by fewer people than this are too noisy to call similar
+MIN_CO_REVIEWERS = 2
+# Accounts with more reviews than this (bulk imports) would add a dense block of pairs
+# to the co-review matrix without saying much about taste, so they are left out
+MAX_REVIEWS_PER_USER = 500
+INSERT_BATCH_SIZE = 1000
+
+
+def co_review_matrix(pairs):
+    """Binary users x spots matrix from (author_id, beach_id) pairs, plus the spot id per column"""
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    spot_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float64), (rows, columns)), shape=(len(user_ids), len(spot_ids))
+    )
+    # Several reviews of one spot by one user count once
+    matrix.data[:] = 1.0
+    return matrix, spot_ids
+
+
+def similar_spots(pairs, k=SIMILAR_SPOTS, min_co_reviewers=MIN_CO_REVIEWERS):
+    """{spot_id: [(similar_spot_id, score, co_reviewers)]}, best first
+
+    Score is the cosine similarity of two spots' reviewer sets: reviewers in common divided by
+    the geometric mean of each spot's reviewer count. The spots x spots product is sparse, so
+    only pairs that share a reviewer are ever materialized.
+    """
+    if len(pairs) == 0:
+        return {}
+    matrix, spot_ids = co_review_matrix(pairs)
+    co_reviews = (matrix.T @ matrix).tocsr()
+    reviewers = co_reviews.diagonal()
+    co_reviews.setdiag(0)
+    co_reviews.data[co_reviews.data < min_co_reviewers] = 0
+    co_reviews.eliminate_zeros()
+
+    neighbors = {}
+    for column in range(co_reviews.shape[0]):
+        start, end = co_reviews.indptr[column], co_reviews.indptr[column + 1]
+        if start == end:
+            continue
+        others = co_reviews.indices[start:end]
+        counts = co_reviews.data[start:end]
+        scores = counts / np.sqrt(reviewers[column] * reviewers[others])
+        # Highest score first, more shared reviewers then lower spot id breaking ties
+        order = np.lexsort((spot_ids[others], -counts, -scores))[:k]
+        neighbors[int(spot_ids[column])] = [(int(spot_ids[others[i]]), float(scores[i]), int(counts[i])) for i in order]
+    return neighbors
+
+
+def build_similar_spots(k=SIMILAR_SPOTS, min_co_reviewers=MIN_CO_REVIEWERS):
+    """Recompute the SpotSimilarity table from all reviews of live spots, in one transaction"""
+    heavy_reviewers = (
+        db.session.query(Review.author_id)
+        .filter(Review.author_id.is_not(None))
+        .group_by(Review.author_id)
+        .having(func.count(distinct(Review.beach_id)) > MAX_REVIEWS_PER_USER)
+    )
+    pairs = (
+        db.session.query(Review.author_id, Review.beach_id)
+        .join(Spot, Spot.id == Review.beach_id)
+        .filter(
+            Review.author_id.is_not(None),
+            Review.author_id.not_in(heavy_reviewers),
+            Spot.is_verified.is_not(False),
+            Spot.is_deleted.is_not(True),
+        )
+        .distinct()
+        .all()
+    )
+    neighbors = similar_spots(pairs, k, min_co_reviewers)
+
+    SpotSimilarity.query.delete()
+    rows = [
+        {
+            "spot_id": spot_id,
+            "similar_spot_id": similar_spot_id,
+            "rank": rank,
+            "score": score,
+            "co_reviewers": co_reviewers,
+        }
+        for spot_id, similar in neighbors.items()
+        for rank, (similar_spot_id, score, co_reviewers) in enumerate(similar, start=1)
+    ]
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.bulk_insert_mappings(SpotSimilarity, rows[start : start + INSERT_BATCH_SIZE])
+    db.session.commit()
+    return {"spots": len(neighbors), "pairs": len(rows), "reviews": len(pairs)}
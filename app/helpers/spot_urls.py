@@ -0,0 +1,35 @@
+from app.models import GeographicNode, Spot, db
+
+
+def node_paths():
+    """{node id: "country/area/..." short name path from the root}, from one narrow query
+
+    Lets bulk jobs build Spot.get_url for every spot without loading a GeographicNode per level.
+    """
+    nodes = {
+        id: (parent_id, short_name)
+        for id, parent_id, short_name in db.session.query(
+            GeographicNode.id, GeographicNode.parent_id, GeographicNode.short_name
+        )
+    }
+    paths = {}
+    for id in nodes:
+        chain = []
+        current = id
+        while current in nodes and current not in paths and current not in chain:
+            chain.append(current)
+            current = nodes[current][0]
+        prefix = paths.get(current)
+        for node_id in reversed(chain):
+            short_name = nodes[node_id][1]
+            prefix = short_name if prefix is None else f"{prefix}/{short_name}"
+            paths[node_id] = prefix
+    return paths
+
+
+def spot_url(spot, paths):
+    """Spot.get_url, with the geographic part taken from node_paths()"""
+    path = paths.get(spot.geographic_node_id)
+    if path is None:
+        return Spot.create_legacy_url(spot.id, spot.name)
+    return f"/loc/{path}/{spot.get_beach_name_for_url()}-{spot.id}"
@@ -0,0 +1,112 @@
+from datetime import datetime, timezone
+
+from app import db
+from app.models import Spot
+
+# A review's contribution to a spot's trending score halves every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = 72
+REVIEW_WEIGHT = 1.0
+IMAGE_WEIGHT = 0.25
+# Scores that have decayed below this are zeroed so the set of trending spots stays small
+MIN_TRENDING_SCORE = 0.01
+DECAY_BATCH_SIZE = 1000
+
+
+def naive_utc(value):
+    """value as a naive UTC datetime, like the stored timestamps (clients may send "...Z" times)"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def decay_factor(since, now):
+    """Fraction of a score left after decaying from since to now"""
+    if since is None:
+        return 1.0
+    since, now = naive_utc(since), naive_utc(now)
+    hours = max((now - since).total_seconds(), 0) / 3600
+    return 0.5 ** (hours / TRENDING_HALF_LIFE_HOURS)
+
+
+def current_score(score, updated, now=None):
+    """A stored trending score decayed to now (stored scores are only ever too high, never too low)"""
+    if not score:
+        return 0.0
+    return score * decay_factor(updated, now or datetime.utcnow())
+
+
+def bump_trending(spot, weight, at=None, now=None):
+    """Add weight of activity that happened at ``at`` (default now) to a spot's trending score
+
+    O(1): the stored score is decayed to now, the (decayed) weight is added and the timestamp
+    moves to now. A negative weight removes activity, e.g. a deleted review at its posting time.
+    """
+    now = now or datetime.utcnow()
+    score = current_score(spot.trending_score, spot.trending_updated, now)
+    score += weight * decay_factor(at, now) if at is not None else weight
+    spot.trending_score = score if score >= MIN_TRENDING_SCORE else 0.0
+    spot.trending_updated = now
+
+
+def decay_trending_scores(now=None):
+    """Decay every non-zero trending score to now, in id-ordered batches
+
+    Between runs, stored scores overstate spots that haven't had activity since; this keeps
+    them close to their current value so /spots/trending reads few extra candidates.
+    """
+    now = now or datetime.utcnow()
+    last_id = 0
+    updated = 0
+    zeroed = 0
+    while True:
+        rows = (
+            db.session.query(Spot.id, Spot.trending_score, Spot.trending_updated, Spot.updated)
+            .filter(Spot.trending_score > 0, Spot.id > last_id)
+            .order_by(Spot.id)
+            .limit(DECAY_BATCH_SIZE)
+            .all()
+        )
+        if not rows:
+            break
+        mappings = []
+        for row in rows:
+            score = current_score(row.trending_score, row.trending_updated, now)
+            if score < MIN_TRENDING_SCORE:
+                score = 0.0
+                zeroed += 1
+            # Passing updated through stops its onupdate from marking every decayed spot as edited
+            mappings.append({"id": row.id, "trending_score": score, "trending_updated": now, "updated": row.updated})
+        db.session.bulk_update_mappings(Spot, mappings)
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+    return {"updated": updated, "zeroed": zeroed}
+
+
+def get_trending_spots(limit=25, offset=0, now=None):
+    """[(current score, spot)] highest first
+
+    Spots are read in stored-score order, which is an upper bound on their current score, so
+    reading stops once the next stored score can't beat the last spot on the requested page.
+    """
+    now = now or datetime.utcnow()
+    needed = offset + limit
+    query = (
+        Spot.query.filter(Spot.trending_score > 0)
+        .filter(Spot.is_verified.isnot(False))
+        .filter(Spot.is_deleted.isnot(True))
+        .order_by(Spot.trending_score.desc(), Spot.id)
+    )
+    batch_size = max(needed * 2, 50)
+    ranked = []
+    start = 0
+    while True:
+        batch = query.offset(start).limit(batch_size).all()
+        ranked.extend((current_score(spot.trending_score, spot.trending_updated, now), spot) for spot in batch)
+        ranked.sort(key=lambda item: (-item[0], item[1].id))
+        if len(batch) < batch_size:
+            break
+        if len(ranked) >= needed and batch[-1].trending_score <= ranked[needed - 1][0]:
+            break
+        start += batch_size
+    return ranked[offset:needed]
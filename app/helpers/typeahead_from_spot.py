@@ -1,11 +1,11 @@
 from app.models import DiveShop
 
 
-def typeahead_from_spot(spot):
+def typeahead_from_spot(spot, url=None):
     return {
         "id": spot.id,
         "text": spot.name,
-        "url": spot.get_url(),
+        "url": url or spot.get_url(),
         "type": "site",
         "subtext": spot.location_city,
         "data": {
@@ -1,13 +1,20 @@
 from datetime import datetime, timedelta
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
+from sqlalchemy import event, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.hybrid import hybrid_method
 
 from app.helpers.demicrosoft import demicrosoft
+from app.helpers.geohash import encode as encode_geohash
+from app.helpers.normalize_text import normalize_text
 
 db = SQLAlchemy()
 
+# Column type for stored full-text documents: tsvector on Postgres (kept current by triggers from
+# the add_search_vectors migration), plain text on SQLite where it stays empty
+SearchVector = db.Text().with_variant(TSVECTOR(), "postgresql")
+
 tags = db.Table(
     "tags",
     db.Column("tag_id", db.Integer, db.ForeignKey("tag.id"), primary_key=True),
@@ -258,6 +265,7 @@ class User(db.Model):
     bio = db.Column(db.String)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String)
     has_pro = db.Column(db.Boolean, default=False)
     push_token = db.Column(db.String)
     phone = db.Column(db.String)
@@ -276,6 +284,11 @@ class User(db.Model):
     )
     images = db.relationship("Image")
 
+    __table_args__ = (
+        db.Index("ix_user_latitude_longitude", "latitude", "longitude"),
+        db.Index("ix_user_geohash", "geohash", postgresql_ops={"geohash": "varchar_pattern_ops"}),
+    )
+
     def get_dict(self):
         data = {}
         # Get all column names from the model
@@ -289,6 +302,7 @@ class User(db.Model):
                 "is_fake",
                 "latitude",
                 "longitude",
+                "geohash",
                 "push_token",
             ]:
                 continue
@@ -337,6 +351,7 @@ class User(db.Model):
 class Spot(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
+    name_normalized = db.Column(db.String)  # normalize_text(name), see set_name_normalized
     hero_img = db.Column(db.String)
     location_google = db.Column(db.String)
     location_city = db.Column(db.String)
@@ -353,12 +368,16 @@ class Spot(db.Model):
     google_place_id = db.Column(db.String)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String)
     difficulty = db.Column(db.String)
     locality_id = db.Column(db.Integer, db.ForeignKey("locality.id"), nullable=True)
     area_two_id = db.Column(db.Integer, db.ForeignKey("area_two.id"), nullable=True)
     area_one_id = db.Column(db.Integer, db.ForeignKey("area_one.id"), nullable=True)
     country_id = db.Column(db.Integer, db.ForeignKey("country.id"), nullable=True)
     noaa_station_id = db.Column(db.String)
+    # Exponentially decayed review activity as of trending_updated, see app/helpers/trending.py
+    trending_score = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+    trending_updated = db.Column(db.DateTime)
     created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated = db.Column(
         db.DateTime,
@@ -367,6 +386,7 @@ class Spot(db.Model):
         onupdate=func.current_timestamp(),
     )
     geographic_node_id = db.Column(db.Integer, db.ForeignKey("geographic_node.id"), nullable=True)
+    search_vector = db.deferred(db.Column(SearchVector))  # name (A), location_city (B), description (C)
 
     reviews = db.relationship("Review", backref="spot")
     images = db.relationship("Image", backref="spot")
@@ -381,6 +401,39 @@ class Spot(db.Model):
         db.Index("ix_spot_num_reviews", "num_reviews"),
         db.Index("ix_spot_rating", "rating"),
         db.Index("ix_spot_last_review_date", "last_review_date"),
+        # Keyset pagination of /loc listings, expressions match SPOT_ORDERS in routes/geography.py
+        db.Index("ix_spot_num_reviews_id", db.text("coalesce(num_reviews, 0)"), "id"),
+        db.Index(
+            "ix_spot_num_reviews_rating_id",
+            db.text("coalesce(num_reviews, 0)"),
+            db.text("coalesce(CAST(rating AS FLOAT), -1.0)"),
+            "id",
+        ),
+        db.Index("ix_spot_last_review_date_id", db.text("coalesce(last_review_date, '1970-01-01 00:00:00')"), "id"),
+        db.Index("ix_spot_trending_score", "trending_score"),
+        db.Index("ix_spot_search_vector", "search_vector", postgresql_using="gin"),
+        db.Index("ix_spot_latitude_longitude", "latitude", "longitude"),
+        db.Index("ix_spot_geohash", "geohash", postgresql_ops={"geohash": "varchar_pattern_ops"}),
+        db.Index("ix_spot_name_normalized", "name_normalized"),
+        db.Index(
+            "ix_spot_name_normalized_trgm",
+            "name_normalized",
+            postgresql_using="gin",
+            postgresql_ops={"name_normalized": "gin_trgm_ops"},
+        ),
+        db.Index("ix_spot_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        db.Index(
+            "ix_spot_location_city_trgm",
+            "location_city",
+            postgresql_using="gin",
+            postgresql_ops={"location_city": "gin_trgm_ops"},
+        ),
+        db.Index(
+            "ix_spot_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
     )
 
     def get_simple_dict(self):
@@ -403,6 +456,8 @@ class Spot(db.Model):
         # Get all column names from the model
         for column in self.__table__.columns:
             column_name = column.name
+            if column_name == "search_vector":
+                continue
             # Get the value for this column
             value = getattr(self, column_name)
             data[column_name] = value
@@ -565,11 +620,21 @@ class Review(db.Model):
         server_default=func.now(),
         onupdate=func.current_timestamp(),
     )
+    search_vector = db.deferred(db.Column(SearchVector))  # title (A), text (B)
 
     dive_shop = db.relationship("DiveShop", backref="reviews", uselist=False)
     images = db.relationship("Image", backref=db.backref("review", lazy=True))
     shorediving_data = db.relationship("ShoreDivingReview", back_populates="review", uselist=False)
 
+    __table_args__ = (
+        db.Index("ix_review_search_vector", "search_vector", postgresql_using="gin"),
+        # Keyset pagination, newest first, per spot and across all spots
+        db.Index("ix_review_beach_id_date_posted_id", "beach_id", "date_posted", "id"),
+        db.Index("ix_review_date_posted_id", "date_posted", "id"),
+        # Recommendations version: one index-only lookup of a user's review count and last change
+        db.Index("ix_review_author_id_updated", "author_id", "updated"),
+    )
+
     def get_simple_dict(self):
         keys = [
             "id",
@@ -591,6 +656,8 @@ class Review(db.Model):
         # Get all column names from the model
         for column in self.__table__.columns:
             column_name = column.name
+            if column_name == "search_vector":
+                continue
             # Get the value for this column
             value = getattr(self, column_name)
             data[column_name] = value
@@ -633,6 +700,7 @@ class Locality(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     google_name = db.Column(db.String)
     name = db.Column(db.String, nullable=False)
+    name_normalized = db.Column(db.String)  # normalize_text(name), see set_name_normalized
     short_name = db.Column(db.String, nullable=False)
     area_two_id = db.Column(db.Integer, db.ForeignKey("area_two.id"))
     area_one_id = db.Column(db.Integer, db.ForeignKey("area_one.id"))
@@ -640,6 +708,22 @@ class Locality(db.Model):
     description = db.Column(db.String)
     url = db.Column(db.String, unique=True)
     map_image_url = db.Column(db.String)
+    updated = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.current_timestamp(),
+    )
+
+    __table_args__ = (
+        db.Index("ix_locality_name_normalized", "name_normalized"),
+        db.Index(
+            "ix_locality_name_normalized_trgm",
+            "name_normalized",
+            postgresql_using="gin",
+            postgresql_ops={"name_normalized": "gin_trgm_ops"},
+        ),
+    )
 
     spots = db.relationship("Spot", backref="locality", lazy=True)
     shops = db.relationship("DiveShop", backref="locality", lazy=True)
@@ -688,12 +772,29 @@ class AreaTwo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     google_name = db.Column(db.String)
     name = db.Column(db.String, nullable=False)
+    name_normalized = db.Column(db.String)  # normalize_text(name), see set_name_normalized
     short_name = db.Column(db.String, nullable=False)
     area_one_id = db.Column(db.Integer, db.ForeignKey("area_one.id"))
     country_id = db.Column(db.Integer, db.ForeignKey("country.id"))
     description = db.Column(db.String)
     url = db.Column(db.String, unique=True)
     map_image_url = db.Column(db.String)
+    updated = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.current_timestamp(),
+    )
+
+    __table_args__ = (
+        db.Index("ix_area_two_name_normalized", "name_normalized"),
+        db.Index(
+            "ix_area_two_name_normalized_trgm",
+            "name_normalized",
+            postgresql_using="gin",
+            postgresql_ops={"name_normalized": "gin_trgm_ops"},
+        ),
+    )
 
     localities = db.relationship("Locality", backref="area_two", lazy=True)
     spots = db.relationship("Spot", backref="area_two", lazy=True)
@@ -734,11 +835,28 @@ class AreaOne(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     google_name = db.Column(db.String)
     name = db.Column(db.String, nullable=False)
+    name_normalized = db.Column(db.String)  # normalize_text(name), see set_name_normalized
     short_name = db.Column(db.String, nullable=False)
     country_id = db.Column(db.Integer, db.ForeignKey("country.id"))
     description = db.Column(db.String)
     url = db.Column(db.String, unique=True, nullable=False)
     map_image_url = db.Column(db.String)
+    updated = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.current_timestamp(),
+    )
+
+    __table_args__ = (
+        db.Index("ix_area_one_name_normalized", "name_normalized"),
+        db.Index(
+            "ix_area_one_name_normalized_trgm",
+            "name_normalized",
+            postgresql_using="gin",
+            postgresql_ops={"name_normalized": "gin_trgm_ops"},
+        ),
+    )
 
     area_twos = db.relationship("AreaTwo", backref="area_one", lazy=True)
     localities = db.relationship("Locality", backref="area_one", lazy=True)
@@ -778,10 +896,27 @@ class AreaOne(db.Model):
 class Country(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
+    name_normalized = db.Column(db.String)  # normalize_text(name), see set_name_normalized
     short_name = db.Column(db.String, nullable=False, unique=True)
     description = db.Column(db.String)
     url = db.Column(db.String, unique=True)
     map_image_url = db.Column(db.String)
+    updated = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.current_timestamp(),
+    )
+
+    __table_args__ = (
+        db.Index("ix_country_name_normalized", "name_normalized"),
+        db.Index(
+            "ix_country_name_normalized_trgm",
+            "name_normalized",
+            postgresql_using="gin",
+            postgresql_ops={"name_normalized": "gin_trgm_ops"},
+        ),
+    )
 
     area_ones = db.relationship("AreaOne", backref="country", lazy=True)
     area_twos = db.relationship("AreaTwo", backref="country", lazy=True)
@@ -842,6 +977,7 @@ class DiveShop(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     padi_store_id = db.Column(db.String, unique=True)
     name = db.Column(db.String)
+    name_normalized = db.Column(db.String)  # normalize_text(name), see set_name_normalized
     description = db.Column(db.String)
     auto_description = db.Column(db.String)
     description_v2 = db.Column(db.String)
@@ -858,6 +994,7 @@ class DiveShop(db.Model):
     hero_img = db.Column(db.String)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String)
     email = db.Column(db.String)
     phone = db.Column(db.String)
     location_google = db.Column(db.String)
@@ -885,9 +1022,27 @@ class DiveShop(db.Model):
 
     __table_args__ = (
         db.Index("ix_dive_shop_geographic_node_id", "geographic_node_id"),
+        db.Index("ix_dive_shop_name_normalized", "name_normalized"),
+        db.Index(
+            "ix_dive_shop_name_normalized_trgm",
+            "name_normalized",
+            postgresql_using="gin",
+            postgresql_ops={"name_normalized": "gin_trgm_ops"},
+        ),
         db.Index("ix_dive_shop_rating", "rating"),
         db.Index("ix_dive_shop_num_reviews", "num_reviews"),
         db.Index("ix_dive_shop_created", "created"),
+        # Keyset pagination of /loc listings, expressions match SHOP_ORDERS in routes/geography.py
+        db.Index(
+            "ix_dive_shop_rating_num_reviews_id",
+            db.text("coalesce(rating, 0)"),
+            db.text("coalesce(num_reviews, 0)"),
+            "id",
+        ),
+        db.Index("ix_dive_shop_num_reviews_id", db.text("coalesce(num_reviews, 0)"), "id"),
+        db.Index("ix_dive_shop_created_id", "created", "id"),
+        db.Index("ix_dive_shop_latitude_longitude", "latitude", "longitude"),
+        db.Index("ix_dive_shop_geohash", "geohash", postgresql_ops={"geohash": "varchar_pattern_ops"}),
     )
 
     def get_typeahead_dict(self):
@@ -1051,6 +1206,8 @@ class DivePartnerAd(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     country = db.relationship("Country", backref="dive_partner_ad")
     area_one = db.relationship("AreaOne", backref="dive_partner_ad")
@@ -1059,12 +1216,41 @@ class DivePartnerAd(db.Model):
 
     user = db.relationship("User", backref="dive_partner_ad")
 
+    __table_args__ = (
+        db.Index("ix_dive_partner_ad_geohash", "geohash", postgresql_ops={"geohash": "varchar_pattern_ops"}),
+    )
+
     def get_dict(self):
         data = self.__dict__.copy()
         if data.get("_sa_instance_state"):
             data.pop("_sa_instance_state", None)
         return data
 
+    @hybrid_method
+    def distance(self, latitude, longitude):
+        import math
+
+        return math.sqrt(
+            (
+                69.1 * (self.latitude - latitude) ** 2
+                + ((69.1 * (self.longitude - longitude) * math.cos(self.latitude / 57.3)) ** 2)
+            )
+        )
+
+    @distance.expression
+    def distance(self, latitude, longitude):
+        return func.sqrt(
+            (
+                func.pow(69.1 * (self.latitude - latitude), 2)
+                + (
+                    func.pow(
+                        69.1 * (self.longitude - longitude) * func.cos(self.latitude / 57.3),
+                        2,
+                    )
+                )
+            )
+        )
+
 
 class ScheduledEmail(db.Model):
     """Model to track scheduled emails for Pro subscription automation"""
@@ -1097,3 +1283,108 @@ class ScheduledEmail(db.Model):
             "dynamic_template_data": self.dynamic_template_data,
             "created": self.created.isoformat() if self.created else None,
         }
+
+
+class NotificationJob(db.Model):
+    """Queued push notification fan-out to users near a location"""
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String, nullable=False)
+    message = db.Column(db.String, nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    radius = db.Column(db.Float, nullable=False, default=50)
+    status = db.Column(db.String, nullable=False, default="pending")  # 'pending', 'processing', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    scheduled_for = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_user_id = db.Column(db.Integer, nullable=False, default=0)  # recipients are sent in user id order
+    recipients_sent = db.Column(db.Integer, nullable=False, default=0)
+    recipients_failed = db.Column(db.Integer, nullable=False, default=0)  # addresses Pinpoint rejected for good
+    pending_tokens = db.Column(db.JSON, nullable=True)  # undelivered addresses to retry on the next run
+    last_error = db.Column(db.String, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.current_timestamp(),
+    )
+
+    __table_args__ = (db.Index("ix_notification_job_status_scheduled_for", "status", "scheduled_for"),)
+
+    def get_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "message": self.message,
+            "status": self.status,
+            "attempts": self.attempts,
+            "recipients_sent": self.recipients_sent,
+            "recipients_failed": self.recipients_failed,
+            "last_error": self.last_error,
+            "scheduled_for": self.scheduled_for.isoformat() if self.scheduled_for else None,
+            "sent_at": self.sent_at.isoformat() if self.sent_at else None,
+            "created": self.created.isoformat() if self.created else None,
+        }
+
+
+class SpotSimilarity(db.Model):
+    """Precomputed item-to-item neighbors from co-reviews, rebuilt by ``flask build-similar-spots``"""
+
+    id = db.Column(db.Integer, primary_key=True)
+    spot_id = db.Column(db.Integer, db.ForeignKey("spot.id", ondelete="CASCADE"), nullable=False)
+    similar_spot_id = db.Column(db.Integer, db.ForeignKey("spot.id", ondelete="CASCADE"), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)  # 1 is the most similar
+    score = db.Column(db.Float, nullable=False)  # cosine similarity of the two spots' reviewer sets
+    co_reviewers = db.Column(db.Integer, nullable=False)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    similar_spot = db.relationship("Spot", foreign_keys=[similar_spot_id], lazy="joined")
+
+    __table_args__ = (db.Index("ix_spot_similarity_spot_id_rank", "spot_id", "rank", unique=True),)
+
+
+class SearchQuery(db.Model):
+    """One typeahead or search request, written in batches by app.services.search_log"""
+
+    id = db.Column(db.Integer, primary_key=True)
+    endpoint = db.Column(db.String, nullable=False)  # 'typeahead', 'autocomplete', 'fulltext', 'spots', 'shops'
+    text = db.Column(db.String, nullable=False)  # as typed, truncated to search_log.MAX_TEXT_LENGTH
+    normalized = db.Column(db.String, nullable=False)  # normalize_text(text), what zero-result reports group on
+    shape = db.Column(db.String, nullable=False)  # word and length buckets, see search_log.query_shape
+    result_count = db.Column(db.Integer, nullable=False)
+    latency_ms = db.Column(db.Float, nullable=False)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.Index("ix_search_query_created", "created"),)
+
+
+@event.listens_for(User, "before_insert")
+@event.listens_for(User, "before_update")
+@event.listens_for(Spot, "before_insert")
+@event.listens_for(Spot, "before_update")
+@event.listens_for(DiveShop, "before_insert")
+@event.listens_for(DiveShop, "before_update")
+@event.listens_for(DivePartnerAd, "before_insert")
+@event.listens_for(DivePartnerAd, "before_update")
+def set_geohash(mapper, connection, target):
+    """Keep the geohash column in step with latitude/longitude"""
+    target.geohash = encode_geohash(target.latitude, target.longitude)
+
+
+@event.listens_for(Country, "before_insert")
+@event.listens_for(Country, "before_update")
+@event.listens_for(AreaOne, "before_insert")
+@event.listens_for(AreaOne, "before_update")
+@event.listens_for(AreaTwo, "before_insert")
+@event.listens_for(AreaTwo, "before_update")
+@event.listens_for(Locality, "before_insert")
+@event.listens_for(Locality, "before_update")
+@event.listens_for(Spot, "before_insert")
+@event.listens_for(Spot, "before_update")
+@event.listens_for(DiveShop, "before_insert")
+@event.listens_for(DiveShop, "before_update")
+def set_name_normalized(mapper, connection, target):
+    """Keep name_normalized in step with name, so lookups can ignore case, accents and punctuation"""
+    target.name_normalized = normalize_text(target.name) or None
@@ -1,7 +1,7 @@
 import os
 
 from amplitude import Amplitude, BaseEvent
-from flask import Blueprint, request
+from flask import Blueprint, abort, request
 from flask_jwt_extended import get_current_user, jwt_required
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
@@ -10,6 +10,7 @@ from sqlalchemy.orm import joinedload
 
 from app import db
 from app.models import DivePartnerAd, User
+from app.services.buddy_search import BuddySearchService
 
 bp = Blueprint("buddy", __name__, url_prefix="/buddy")
 
@@ -45,12 +46,37 @@ def get_buddies():
     area_two_id = request.args.get("area_two")
     country_id = request.args.get("country")
     locality_id = request.args.get("locality")
+    latitude = request.args.get("latitude")
+    longitude = request.args.get("longitude")
+    limit = request.args.get("limit") if request.args.get("limit") else 10
+    offset = request.args.get("offset") if request.args.get("offset") else 0
+
+    if latitude and longitude:
+        try:
+            results = BuddySearchService.search(
+                latitude,
+                longitude,
+                request.args.get("radius"),
+                limit,
+                offset,
+                include_users=False,
+            )
+        except (TypeError, ValueError):
+            abort(422, "Invalid latitude, longitude, radius, limit or offset")
+        partners = []
+        for result in results:
+            partner_dict = result.user.get_dict()
+            partner_dict["distance"] = round(result.distance, 1)
+            partners.append(partner_dict)
+        return {"data": partners}
 
     if not area_one_id and not area_two_id and not country_id and not locality_id:
         dive_partners = (
             User.query.join(DivePartnerAd)
             .filter(User.id == DivePartnerAd.user_id)
-            .limit(10)
+            .order_by(DivePartnerAd.created.desc())
+            .limit(limit)
+            .offset(offset)
             .all()
         )
         partners = []
@@ -59,7 +85,7 @@ def get_buddies():
             partners.append(partner_dict)
         return {"data": partners}
 
-    dive_partners = (
+    query = (
         DivePartnerAd.query.options(joinedload("user"))
         .filter(
             or_(
@@ -81,8 +107,11 @@ def get_buddies():
                 DivePartnerAd.country_id == country_id if country_id else sql.false(),
             )
         )
-        .all()
+        .order_by(DivePartnerAd.created.desc())
     )
+    if request.args.get("limit"):
+        query = query.limit(limit).offset(offset)
+    dive_partners = query.all()
     partners = []
     for partner in dive_partners:
         partner_dict = partner.user.get_dict()
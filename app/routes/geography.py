@@ -1,10 +1,12 @@
 import re
+from datetime import datetime
 
 from flask import Blueprint, abort, jsonify, request
-from sqlalchemy import and_, func, text
+from sqlalchemy import and_, cast, func, text
 from sqlalchemy.orm import joinedload
 
-from app import cache, db
+from app import db
+from app.helpers.keyset import keyset_page
 from app.models import (
     AreaOne,
     AreaTwo,
@@ -14,10 +16,39 @@ from app.models import (
     Locality,
     Spot,
 )
+from app.services.cache_tags import add_cache_tags, cached_with_tags
+from app.services.geo_arrays import sort_by_confidence
 from app.services.url_mapping import URLMappingService
 
 bp = Blueprint("geography", __name__, url_prefix="/loc")
 
+# Nulls sort last, so they're coalesced to values below any real one to keep keyset keys non-null
+NEVER_REVIEWED = datetime(1970, 1, 1)
+# Sort keys per ?sort=, each served by an index of the same expressions (see the models)
+SPOT_ORDERS = {
+    # Pages follow the database order; the confidence re-sort only reorders within a page
+    "top": [
+        ("num_reviews", func.coalesce(Spot.num_reviews, 0), True),
+        ("rating", func.coalesce(cast(Spot.rating, db.Float), -1.0), True),
+        ("id", Spot.id, True),
+    ],
+    "latest": [
+        ("last_review_date", func.coalesce(Spot.last_review_date, NEVER_REVIEWED), True),
+        ("id", Spot.id, True),
+    ],
+    "most_reviewed": [("num_reviews", func.coalesce(Spot.num_reviews, 0), True), ("id", Spot.id, True)],
+}
+SHOP_ORDERS = {
+    "top": [
+        ("rating", func.coalesce(DiveShop.rating, 0), True),
+        ("num_reviews", func.coalesce(DiveShop.num_reviews, 0), True),
+        ("id", DiveShop.id, True),
+    ],
+    "latest": [("created", DiveShop.created, True), ("id", DiveShop.id, True)],
+    "most_reviewed": [("num_reviews", func.coalesce(DiveShop.num_reviews, 0), True), ("id", DiveShop.id, True)],
+    "rating": [("rating", func.coalesce(DiveShop.rating, 0), True), ("id", DiveShop.id, True)],
+}
+
 
 def get_descendant_node_ids(node_id):
     """Get all descendant node IDs using a recursive CTE for better performance"""
@@ -47,7 +78,7 @@ def get_descendant_node_ids(node_id):
 
 
 @bp.route("/<path:geographic_path>")
-@cache.cached(query_string=True)
+@cached_with_tags(query_string=True, grace=300)
 def get_geographic_area(geographic_path):
     """Handle geographic paths like /loc/us/ca/san-diego"""
 
@@ -69,6 +100,9 @@ def get_geographic_area(geographic_path):
 
         abort(404, description="Geographic area not found")
 
+    # Spot and shop writes purge the nodes they sit under, and their ancestors
+    add_cache_tags(f"node:{node.id}")
+
     # Get descendant node IDs efficiently using CTE
     descendant_node_ids = get_descendant_node_ids(node.id)
 
@@ -77,9 +111,11 @@ def get_geographic_area(geographic_path):
     if content_type not in ["spots", "shops", "all"]:
         content_type = "spots"
 
-    # Get limit and offset for pagination
+    # Get limit and offset or cursor for pagination
     limit = request.args.get("limit", 50, type=int)
     offset = request.args.get("offset", 0, type=int)
+    # A cursor pages one listing, so type=all only supports offsets
+    cursor = request.args.get("cursor") if content_type != "all" else None
 
     # Get sort parameter
     sort = request.args.get("sort", "top")
@@ -98,26 +134,11 @@ def get_geographic_area(geographic_path):
         spots_query = spots_query.filter(Spot.is_verified.isnot(False))
         spots_query = spots_query.filter(Spot.is_deleted.isnot(True))
 
-        # Apply sorting at database level
-        if sort == "top":
-            # For now, use a simple sort by reviews and rating
-            # We'll apply the confidence score sorting in Python to avoid PostgreSQL issues
-            spots_query = spots_query.order_by(
-                func.coalesce(Spot.num_reviews, 0).desc(),
-                func.cast(Spot.rating, db.Float).desc().nullslast(),
-            )
-        elif sort == "latest":
-            spots_query = spots_query.order_by(Spot.last_review_date.desc().nullslast())
-        elif sort == "most_reviewed":
-            spots_query = spots_query.order_by(Spot.num_reviews.desc().nullslast())
+        # Cursor pages skip the count, clients have the total from the first page
+        if cursor:
+            total_spots = None
         else:
-            spots_query = spots_query.order_by(Spot.num_reviews.desc().nullslast())
-
-        # Get total count for pagination
-        total_spots = spots_query.count()
-
-        # Apply pagination
-        spots_query = spots_query.offset(offset).limit(limit)
+            total_spots = spots_query.count()
 
         # Eager load relationships to avoid N+1 queries
         spots_query = spots_query.options(
@@ -126,15 +147,20 @@ def get_geographic_area(geographic_path):
             joinedload(Spot.images),
         )
 
-        spots = spots_query.all()
+        spots, next_cursor = keyset_page(
+            spots_query, SPOT_ORDERS.get(sort, SPOT_ORDERS["most_reviewed"]), limit, cursor, offset
+        )
 
         # Apply confidence score sorting in Python if needed
         if sort == "top":
-            spots.sort(key=lambda spot: spot.get_confidence_score(), reverse=True)
+            spots = sort_by_confidence(spots)
 
         response_data["spots"] = [spot.get_dict() for spot in spots]
-        response_data["total_spots"] = total_spots
-        response_data["pagination"]["total"] = total_spots
+        if content_type != "all":
+            response_data["pagination"]["next_cursor"] = next_cursor
+        if total_spots is not None:
+            response_data["total_spots"] = total_spots
+            response_data["pagination"]["total"] = total_spots
 
     # Get dive shops if requested
     if content_type in ["shops", "all"]:
@@ -142,41 +168,32 @@ def get_geographic_area(geographic_path):
             DiveShop.geographic_node_id.in_(descendant_node_ids)
         )
 
-        # Apply sorting at database level
-        if sort == "top":
-            shops_query = shops_query.order_by(
-                func.coalesce(DiveShop.rating, 0).desc(),
-                func.coalesce(DiveShop.num_reviews, 0).desc(),
-            )
-        elif sort == "latest":
-            shops_query = shops_query.order_by(DiveShop.created.desc())
-        elif sort == "most_reviewed":
-            shops_query = shops_query.order_by(DiveShop.num_reviews.desc().nullslast())
+        if cursor:
+            total_shops = None
         else:
-            shops_query = shops_query.order_by(DiveShop.rating.desc().nullslast())
-
-        # Get total count for pagination
-        total_shops = shops_query.count()
-
-        # Apply pagination
-        shops_query = shops_query.offset(offset).limit(limit)
+            total_shops = shops_query.count()
 
         # Eager load relationships
         shops_query = shops_query.options(
             joinedload(DiveShop.geographic_node), joinedload(DiveShop.reviews)
         )
 
-        dive_shops = shops_query.all()
+        dive_shops, next_cursor = keyset_page(
+            shops_query, SHOP_ORDERS.get(sort, SHOP_ORDERS["rating"]), limit, cursor, offset
+        )
 
         response_data["dive_shops"] = [shop.get_dict() for shop in dive_shops]
-        response_data["total_shops"] = total_shops
-        response_data["pagination"]["total"] = total_shops
+        if content_type != "all":
+            response_data["pagination"]["next_cursor"] = next_cursor
+        if total_shops is not None:
+            response_data["total_shops"] = total_shops
+            response_data["pagination"]["total"] = total_shops
 
     return response_data
 
 
 @bp.route("/<path:geographic_path>/<int:spot_id>")
-@cache.cached()
+@cached_with_tags()
 def get_spot_by_geographic_path(geographic_path, spot_id):
     """Handle spot URLs like /loc/us/ca/san-diego/la-jolla-cove-123"""
 
@@ -191,6 +208,7 @@ def get_spot_by_geographic_path(geographic_path, spot_id):
         .filter_by(id=spot_id)
         .first_or_404()
     )
+    add_cache_tags(f"spot:{spot_id}")
 
     # Verify the geographic path matches the spot's location
     if spot.geographic_node:
@@ -211,7 +229,7 @@ def get_spot_by_geographic_path(geographic_path, spot_id):
 
 
 @bp.route("/<path:geographic_path>/<spot_name_id>")
-@cache.cached()
+@cached_with_tags()
 def get_spot_by_name_id(geographic_path, spot_name_id):
     """Handle spot URLs like /loc/us/ca/san-diego/la-jolla-cove-123"""
 
@@ -232,7 +250,7 @@ def get_spot_by_name_id(geographic_path, spot_name_id):
 
 
 @bp.route("/<path:geographic_path>/stats")
-@cache.cached()
+@cached_with_tags()
 def get_geographic_stats(geographic_path):
     """Get statistics for a geographic area"""
 
@@ -244,6 +262,7 @@ def get_geographic_stats(geographic_path):
 
     if not node:
         abort(404, description="Geographic area not found")
+    add_cache_tags(f"node:{node.id}")
 
     # Get descendant node IDs efficiently
     descendant_node_ids = get_descendant_node_ids(node.id)
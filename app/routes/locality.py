@@ -6,6 +6,7 @@ from app import cache, db
 from app.helpers.get_limit import get_limit
 from app.helpers.merge_area_one import merge_area_one
 from app.models import AreaOne, AreaTwo, Country, DiveShop, Locality, Spot
+from app.services.cache_tags import cached_with_tags
 
 bp = Blueprint("locality", __name__, url_prefix="/locality")
 
@@ -169,7 +170,7 @@ def get_area_one():
 
 
 @bp.route("/country")
-@cache.cached()
+@cached_with_tags(timeout=300, query_string=True, grace=300)
 def get_country():
     limit = get_limit(request.args.get("limit"), 100)
     table = Spot
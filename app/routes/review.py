@@ -15,10 +15,13 @@ from sqlalchemy.orm import joinedload
 
 from app import db, get_summary_reviews_helper
 from app.helpers.demicrosoft import demicrosoft
+from app.helpers.keyset import REVIEWS_NEWEST_FIRST, keyset_page
 from app.helpers.parse_uddf import parse_uddf
-from app.helpers.send_notifications import send_notification
+from app.helpers.send_notifications import queue_notification
+from app.helpers.trending import IMAGE_WEIGHT, REVIEW_WEIGHT, bump_trending
 from app.helpers.validate_email_format import validate_email_format
 from app.models import Image, Review, ShoreDivingData, ShoreDivingReview, Spot, User
+from app.services.cache_tags import purge_tags, spot_tags
 
 bp = Blueprint("review", __name__, url_prefix="/review")
 
@@ -174,7 +177,9 @@ def add_review():
         spot.hero_img = images[0]
     if visibility and (not spot.last_review_date or date_dived > spot.last_review_date):
         spot.last_review_viz = visibility
+    bump_trending(spot, REVIEW_WEIGHT + IMAGE_WEIGHT * len(review.images))
     db.session.commit()
+    purge_tags(*spot_tags(spot))
 
     if not os.environ.get("FLASK_DEBUG"):
         try:
@@ -207,13 +212,13 @@ def add_review():
     event = BaseEvent(event_type="review__submitted", user_id=f"{user_id}")
     client.track(event)
     if spot.latitude and text.strip():
-        notif_receivers = send_notification(
+        notification_job = queue_notification(
             spot.latitude,
             spot.longitude,
             f"New activity at {spot.name}!",
             f"{user.display_name} said '{text}'",
         )
-        print(f"Review notification receivers: {notif_receivers}")
+        print(f"Review notification queued: {notification_job.id}")
     return {"review": review.get_dict(), "spot": spot.get_dict()}, 200
 
 
@@ -267,19 +272,19 @@ def get_review():
         beach_id = request.args.get("beach_id")
         limit = request.args.get("limit")
         offset = int(request.args.get("offset")) if request.args.get("offset") else 0
+        cursor = request.args.get("cursor")
 
         query = (
             Review.query.options(joinedload("user"))
             .options(joinedload("shorediving_data"))
             .options(joinedload("images"))
-            .order_by(Review.date_posted.desc())
             .filter_by(beach_id=beach_id)
         )
+        next_cursor = None
         if limit:
-            query = query.limit(limit)
-        if offset:
-            query = query.offset(offset)
-        reviews = query.all()
+            reviews, next_cursor = keyset_page(query, REVIEWS_NEWEST_FIRST, limit, cursor, offset)
+        else:
+            reviews = query.order_by(Review.date_posted.desc(), Review.id.desc()).offset(offset).all()
         output = []
         for review in reviews:
             data = review.get_dict()
@@ -296,7 +301,7 @@ def get_review():
             data["images"] = image_data
             data["signedUrls"] = signedUrls
             output.append(data)
-        return {"data": output, "next_offset": offset + len(output)}
+        return {"data": output, "next_offset": offset + len(output), "next_cursor": next_cursor}
 
 
 # returns count for each rating for individual beach/area ["1"] ["2"] ["3"], etc
@@ -418,6 +423,7 @@ def patch_review():
     for key in updates.keys():
         setattr(review, key, updates.get(key))
     db.session.commit()
+    purge_tags(*spot_tags(review.spot))
     review.id
 
     review_data = review.get_dict()
@@ -486,6 +492,8 @@ def delete_review():
     if review.author_id != user.id and not user.admin:
         abort(403, "You are not allowed to do that")
     beach_id = review.beach_id
+    date_posted = review.date_posted
+    activity = REVIEW_WEIGHT + (0 if keep_images else IMAGE_WEIGHT * len(review.images))
     for image in review.images:
         if not keep_images:
             Image.query.filter_by(id=image.id).delete()
@@ -509,7 +517,9 @@ def delete_review():
         spot.rating = total / num_reviews
     else:
         spot.rating = None
+    bump_trending(spot, -activity, at=date_posted)
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     return {}
 
 
@@ -638,8 +648,9 @@ def add_shore_review():
     if visibility and (not spot.last_review_date or date_dived > spot.last_review_date):
         spot.last_review_date = date_dived
         spot.last_review_viz = visibility
+    bump_trending(spot, REVIEW_WEIGHT, at=date_posted)
     db.session.commit()
-    review.id
+    purge_tags(*spot_tags(spot))
     return {"msg": "all done"}, 200
 
 
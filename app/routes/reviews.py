@@ -8,8 +8,13 @@ from sendgrid.helpers.mail import Mail
 from sqlalchemy import and_, func
 from sqlalchemy.orm import joinedload
 
-from app import cache, db
-from app.models import Review, ShoreDivingReview, Spot
+from app import db
+from app.helpers.conditional_get import conditional_get
+from app.helpers.keyset import REVIEWS_NEWEST_FIRST, keyset_page
+from app.helpers.nearby import filter_within_radius
+from app.helpers.trending import IMAGE_WEIGHT, REVIEW_WEIGHT, bump_trending
+from app.models import Review, ShoreDivingReview, Spot, User
+from app.services.cache_tags import add_cache_tags, cached_with_tags, purge_tags, spot_tags
 
 bp = Blueprint("reviews", __name__, url_prefix="/reviews")
 
@@ -35,8 +40,7 @@ def get_recent_reviews():
     reviews = Review.query.options(joinedload("spot")).options(joinedload("user"))
     if request.args.get("type") == "nearby" and latitude:
         nearby_spots = (
-            db.session.query(Spot.id)
-            .filter(Spot.distance(latitude, longitude) < 50)
+            filter_within_radius(db.session.query(Spot.id), Spot, latitude, longitude, 50)
             .filter(Spot.is_deleted.is_not(True))
             .subquery()
         )
@@ -48,12 +52,8 @@ def get_recent_reviews():
             )
         )
 
-    reviews = (
-        reviews.filter(Review.beach_id != 19)
-        .order_by(Review.date_posted.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
+    reviews, next_cursor = keyset_page(
+        reviews.filter(Review.beach_id != 19), REVIEWS_NEWEST_FIRST, limit, request.args.get("cursor"), int(offset)
     )
     data = []
     for review in reviews:
@@ -61,11 +61,25 @@ def get_recent_reviews():
         review_data["spot"] = review.spot.get_dict()
         review_data["user"] = review.user.get_dict()
         data.append(review_data)
-    return {"data": data}
+    return {"data": data, "next_cursor": next_cursor}
+
+
+def reviews_versions():
+    """Last update of a spot's reviews and their authors; shorediving lookups aren't validated"""
+    beach_id = request.args.get("beach_id")
+    if request.args.get("sd_review_id") or not beach_id:
+        return None
+    return (
+        db.session.query(func.max(Review.updated), func.count(Review.id), func.max(User.updated))
+        .join(User, Review.author_id == User.id)
+        .filter(Review.beach_id == beach_id)
+        .one()
+    )
 
 
 @bp.route("/get")
-@cache.cached(query_string=True)
+@conditional_get(reviews_versions)
+@cached_with_tags(query_string=True)
 def get_reviews():
     """Get Reviews
     ---
@@ -88,6 +102,11 @@ def get_reviews():
               description: offset to start if paginating through reviews
               type: integer
               required: false
+            - name: cursor
+              in: body
+              description: next_cursor from the previous page, used instead of offset
+              type: string
+              required: false
         responses:
             200:
                 description: Returns review object
@@ -101,25 +120,27 @@ def get_reviews():
             Review.shorediving_data.has(shorediving_id=sd_id)
         ).first()
         if review:
+            add_cache_tags(f"spot:{review.beach_id}")
             data = review.get_dict()
             data["user"] = review.user.get_dict()
             return {"data": [data]}
     beach_id = request.args.get("beach_id")
+    add_cache_tags(f"spot:{beach_id}")
     limit = request.args.get("limit")
     offset = int(request.args.get("offset")) if request.args.get("offset") else 0
+    cursor = request.args.get("cursor")
 
     query = (
         Review.query.options(joinedload("user"))
         .options(joinedload("shorediving_data"))
         .options(joinedload("images"))
-        .order_by(Review.date_posted.desc())
         .filter_by(beach_id=beach_id)
     )
+    next_cursor = None
     if limit:
-        query = query.limit(limit)
-    if offset:
-        query = query.offset(offset)
-    reviews = query.all()
+        reviews, next_cursor = keyset_page(query, REVIEWS_NEWEST_FIRST, limit, cursor, offset)
+    else:
+        reviews = query.order_by(Review.date_posted.desc(), Review.id.desc()).offset(offset).all()
     output = []
     for review in reviews:
         data = review.get_dict()
@@ -136,7 +157,7 @@ def get_reviews():
         data["images"] = image_data
         data["signedUrls"] = signedUrls
         output.append(data)
-    return {"data": output, "next_offset": offset + len(output)}
+    return {"data": output, "next_offset": offset + len(output), "next_cursor": next_cursor}
 
 
 @bp.route("/delete", methods=["POST"])
@@ -148,9 +169,12 @@ def delete_shore_diving_ids():
     id = request.json.get("id")
     sd_review = ShoreDivingReview.query.filter_by(shorediving_id=id).first_or_404()
     review = sd_review.review
+    stale_tags = spot_tags(review.spot)
+    bump_trending(review.spot, -(REVIEW_WEIGHT + IMAGE_WEIGHT * len(review.images)), at=review.date_posted)
     db.session.delete(sd_review)
     db.session.delete(review)
     db.session.commit()
+    purge_tags(*stale_tags)
     return "ok"
 
 
@@ -1,20 +1,20 @@
 import os
+import time
 
 import newrelic.agent
 import requests
-from flask import Blueprint, request
-from sqlalchemy import func, or_
-from sqlalchemy.sql.functions import ReturnTypeFromArgs
+from flask import Blueprint, abort, current_app, request
+from flask_jwt_extended import get_current_user, jwt_required
 
 from app import cache
+from app.helpers.fulltext_search import fulltext_search
 from app.helpers.get_nearby_spots import get_nearby_spots
-from app.helpers.typeahead_from_spot import typeahead_from_shop, typeahead_from_spot
-from app.models import AreaOne, AreaTwo, Country, DiveShop, Locality, Spot
-
-
-class unaccent(ReturnTypeFromArgs):
-    pass
-
+from app.helpers.normalize_text import normalize_text
+from app.helpers.typeahead_from_spot import typeahead_from_spot
+from app.services.autocomplete_index import DEFAULT_PATH, autocomplete_index, live_search
+from app.services.search_log import search_log, search_report
+from app.services.typeahead_cache import typeahead_cache
+from app.services.typeahead_index import live_typeahead, typeahead_index
 
 bp = Blueprint("search", __name__, url_prefix="/search")
 
@@ -36,25 +36,22 @@ def search_location():
 
 @bp.route("/autocomplete")
 def search_autocomplete():
-    search_term = request.args.get("q").lower()
-    spots = (
-        Spot.query.filter(func.lower(Spot.name).like("%" + search_term + "%"))
-        .limit(5)
-        .all()
-    )
+    started = time.perf_counter()
+    snapshot = autocomplete_index.get(current_app.config.get("AUTOCOMPLETE_INDEX_PATH", DEFAULT_PATH))
+    search = snapshot.search if snapshot is not None else live_search
     output = []
-    for spot in spots:
+    for _, label, url in search(request.args.get("q", ""), limit=5):
         spot_data = {
-            "label": spot.name,
+            "label": label,
             "type": "spot",
-            "url": spot.get_url(),
+            "url": url,
         }
         output.append(spot_data)
+    search_log.record("autocomplete", request.args.get("q"), len(output), started)
     return {"data": output}
 
 
 @bp.route("/typeahead")
-@cache.cached(query_string=True)
 def get_typeahead():
     """Search Typeahead
     ---
@@ -66,12 +63,24 @@ def get_typeahead():
               in: query
               description: query
               type: string
-              required: true
+              required: false
             - name: beach_only
               in: query
               description: should only return beach spots. ie ?beach_only=True
               type: string
               required: false
+            - name: latitude
+              in: query
+              description: >
+                with longitude, ranks spots and shops near this point higher. Without a query,
+                returns the nearest spots
+              type: number
+              required: false
+            - name: longitude
+              in: query
+              description: see latitude
+              type: number
+              required: false
         responses:
             200:
                 description: Returns list of typeahead objects
@@ -80,165 +89,118 @@ def get_typeahead():
                     schema: TypeAheadSchema
     """
     newrelic.agent.capture_request_params()
-    query = request.args.get("query").lower()
+    started = time.perf_counter()
+    query = request.args.get("query")
     beach_only = request.args.get("beach_only")
-    results = []
-    spots = (
-        Spot.query.filter(
-            or_(
-                Spot.name.ilike("%" + query + "%"),
-                Spot.location_city.ilike("%" + query + "%"),
-            )
-        )
-        .filter(Spot.is_deleted.is_not(True))
-        .limit(25)
-        .all()
-    )
-    for spot in spots:
-        result = typeahead_from_spot(spot)
-        results.append(result)
-    if beach_only:
-        return {"data": results}
-
-    dive_shops = (
-        DiveShop.query.filter(DiveShop.name.ilike("%" + query + "%")).limit(10).all()
-    )
-    for shop in dive_shops:
-        result = typeahead_from_shop(shop)
-        results.append(result)
-
-    countries = (
-        Country.query.filter(unaccent(Country.name).ilike("%" + query + "%"))
-        .limit(10)
-        .all()
-    )
-    area_ones = (
-        AreaOne.query.filter(unaccent(AreaOne.name).ilike("%" + query + "%"))
-        .limit(10)
-        .all()
-    )
-    area_twos = (
-        AreaTwo.query.filter(unaccent(AreaTwo.name).ilike("%" + query + "%"))
-        .limit(10)
-        .all()
-    )
-    localities = (
-        Locality.query.filter(unaccent(Locality.name).ilike("%" + query + "%"))
-        .limit(10)
-        .all()
-    )
-    for loc in countries:
-        url = loc.get_url()
-        segments = url.split("/")
-        country = segments[2]
-        area_one = None
-        area_two = None
-        locality = None
-        if len(segments) > 3:
-            area_one = segments[3]
-        if len(segments) > 4:
-            area_two = segments[4]
-        if len(segments) > 5:
-            locality = segments[5]
-        result = {
-            "id": loc.id,
-            "text": loc.name,
-            "url": url,
-            "type": "location",
-            "subtext": loc.name,
-            "data": {
-                "country": country,
-                "area_one": area_one,
-                "area_two": area_two,
-                "locality": locality,
-            },
-        }
-        results.append(result)
-    for loc in area_ones:
-        url = loc.get_url(loc.country)
-        segments = url.split("/")
-        country = segments[2]
-        area_one = None
-        area_two = None
-        locality = None
-        if len(segments) > 3:
-            area_one = segments[3]
-        if len(segments) > 4:
-            area_two = segments[4]
-        if len(segments) > 5:
-            locality = segments[5]
-        result = {
-            "id": loc.id,
-            "text": loc.name,
-            "url": url,
-            "type": "location",
-            "subtext": loc.country.name,
-            "data": {
-                "country": country,
-                "area_one": area_one,
-                "area_two": area_two,
-                "locality": locality,
-            },
-        }
-        results.append(result)
-    for loc in area_twos:
-        url = loc.get_url(loc.country, loc.area_one)
-        segments = url.split("/")
-        country = segments[2]
-        area_one = None
-        area_two = None
-        locality = None
-        if len(segments) > 3:
-            area_one = segments[3]
-        if len(segments) > 4:
-            area_two = segments[4]
-        if len(segments) > 5:
-            locality = segments[5]
-        result = {
-            "id": loc.id,
-            "text": loc.name,
-            "url": url,
-            "type": "location",
-            "subtext": loc.country.name,
-            "data": {
-                "country": country,
-                "area_one": area_one,
-                "area_two": area_two,
-                "locality": locality,
-            },
-        }
-        results.append(result)
-    for loc in localities:
-        url = loc.get_url(loc.country, loc.area_one, loc.area_two)
-        segments = url.split("/")
-        country = segments[2]
-        area_one = None
-        area_two = None
-        locality = None
-        if len(segments) > 3:
-            area_one = segments[3]
-        if len(segments) > 4:
-            area_two = segments[4]
-        if len(segments) > 5:
-            locality = segments[5]
-        result = {
-            "id": loc.id,
-            "text": loc.name,
-            "url": url,
-            "type": "location",
-            "subtext": loc.country.name,
-            "data": {
-                "country": country,
-                "area_one": area_one,
-                "area_two": area_two,
-                "locality": locality,
-            },
-        }
-        results.append(result)
-    results.reverse()
+    latitude = request.args.get("latitude", type=float)
+    longitude = request.args.get("longitude", type=float)
+    origin = (latitude, longitude) if latitude is not None and longitude is not None else None
+    if origin and not normalize_text(query):
+        # Before the first keystroke, what /typeahead/nearby returns
+        spots = get_nearby_spots(latitude, longitude, request.args.get("limit", 10, type=int), None)
+        search_log.record("typeahead", query, len(spots), started)
+        return {"data": [typeahead_from_spot(spot) for spot in spots]}
+    typeahead_index.refresh(max_age=current_app.config.get("TYPEAHEAD_INDEX_REFRESH_SECONDS", 60), background=True)
+    if typeahead_index.ready:
+        results, outcome = typeahead_cache.search(query, beach_only=bool(beach_only), origin=origin)
+    else:
+        # This worker's first build is still running
+        results, outcome = live_typeahead(query, beach_only=bool(beach_only), origin=origin), "live"
+    newrelic.agent.add_custom_attribute("typeahead_cache", outcome)
+    newrelic.agent.add_custom_attribute("typeahead_query_length", len(query or ""))
+    search_log.record("typeahead", query, len(results), started)
     return {"data": results}
 
 
+@bp.route("/typeahead/stats")
+@jwt_required()
+def get_typeahead_stats():
+    """Typeahead cache hit and miss counts per query length, for this worker"""
+    if not get_current_user().admin:
+        abort(403, "You must be an admin to that")
+    return {"data": typeahead_cache.stats()}
+
+
+@bp.route("/analytics")
+@jwt_required()
+def get_search_analytics():
+    """Search Analytics
+    ---
+    get:
+        summary: Top zero-result queries and slowest query shapes
+        description: >
+            Admin only. Aggregated from logged typeahead and search requests; this worker's
+            buffered rows are written first, other workers' within their flush interval
+        parameters:
+            - name: days
+              in: query
+              description: how far back to look (default 7)
+              type: int
+              required: false
+            - name: limit
+              in: query
+              description: the max number of rows in each list (default 25)
+              type: int
+              required: false
+        responses:
+            200:
+                description: Returns zero_results and slowest_shapes
+    """
+    if not get_current_user().admin:
+        abort(403, "You must be an admin to that")
+    search_log.flush()
+    return {"data": search_report(request.args.get("days", 7, type=int), request.args.get("limit", 25, type=int))}
+
+
+@bp.route("/fulltext")
+@search_log.logged("fulltext", "q")
+@cache.cached(query_string=True)
+def search_fulltext():
+    """Full Text Search
+    ---
+    get:
+        summary: Search dive sites and their reviews
+        description: >
+            Dive sites whose name, location or description, or whose public reviews, match the
+            query ("manta", "turtles night dive"), best match first, with a highlighted snippet
+        parameters:
+            - name: q
+              in: query
+              description: search terms
+              type: string
+              required: true
+            - name: limit
+              in: query
+              description: the max number of results in the response (default 20)
+              type: int
+              required: false
+            - name: offset
+              in: query
+              description: offset in order to paginate the results
+              type: int
+              required: false
+        responses:
+            200:
+                description: Returns list of beach objects with rank, highlight and review_matches
+                content:
+                  application/json:
+                    schema: BeachSchema
+    """
+    term = request.args.get("q")
+    if not term:
+        abort(422, "Please include a search query")
+    limit = request.args.get("limit", 20, type=int)
+    offset = request.args.get("offset", 0, type=int)
+    data = []
+    for result in fulltext_search(term, limit, offset):
+        spot_data = result["spot"].get_dict()
+        spot_data["rank"] = result["rank"]
+        spot_data["highlight"] = result["highlight"]
+        spot_data["review_matches"] = result["review_matches"]
+        data.append(spot_data)
+    return {"data": data}
+
+
 @bp.route("/typeahead/nearby")
 @cache.cached(query_string=True)
 def get_typeahead_nearby():
@@ -10,8 +10,13 @@ from sqlalchemy import and_, exc, or_, sql
 from sqlalchemy.orm import joinedload
 
 from app import cache, db
+from app.helpers.conditional_get import conditional_get
 from app.helpers.get_localities import get_localities
+from app.helpers.nearby import nearest
+from app.helpers.normalize_text import normalize_text
 from app.models import AreaOne, AreaTwo, Country, DiveShop, Locality, Review, Spot
+from app.services.cache_tags import add_cache_tags, cached_with_tags, purge_tags, shop_tags
+from app.services.search_log import search_log
 
 bp = Blueprint("shop", __name__, url_prefix="/shop")
 
@@ -29,7 +34,7 @@ def fetch_dive_shops():
 
 
 @bp.route("/loc")
-@cache.cached(query_string=True)
+@cached_with_tags(query_string=True)
 def get_spots():
     """Get Dive Sites/Beaches
     ---
@@ -89,6 +94,7 @@ def get_spots():
                 description: Wrong password.
     """
     newrelic.agent.capture_request_params()
+    add_cache_tags("shops")
     area = None
     spot = None
 
@@ -207,8 +213,20 @@ def get_spots():
     return resp
 
 
+def shop_versions(id):
+    """The shop's last update and review count, or None if it doesn't exist"""
+    return (
+        db.session.query(DiveShop.updated, db.func.count(Review.id))
+        .outerjoin(Review, Review.dive_shop_id == DiveShop.id)
+        .filter(DiveShop.id == id)
+        .group_by(DiveShop.id)
+        .first()
+    )
+
+
 @bp.route("<int:id>", methods=["GET"])
 @bp.route("/get/<int:id>", methods=["GET"])
+@conditional_get(shop_versions)
 def fetch_dive_shop(id):
     sq = (
         db.session.query(Review.dive_shop_id, db.func.count(Review.id).label("count"))
@@ -325,6 +343,7 @@ def create_dive_shop():
         db.session.commit()
     except exc.IntegrityError:
         abort(409, "Dive shop already exists")
+    purge_tags(*shop_tags(dive_shop))
 
     return {"data": dive_shop.get_dict()}
 
@@ -339,10 +358,12 @@ def update_dive_shop(id):
     if dive_shop.owner_user_id != user.id and not user.admin:
         abort(403, "Only shop owner and admin can perform this action")
 
+    stale_tags = shop_tags(dive_shop)
     updates = request.json
     for key in updates.keys():
         setattr(dive_shop, key, updates.get(key))
     db.session.commit()
+    purge_tags(*stale_tags, *shop_tags(dive_shop))
     data = dive_shop.get_dict()
 
     return {"data": data}
@@ -352,10 +373,12 @@ def update_dive_shop(id):
 def update_padi_dive_shop(id):
     dive_shop = DiveShop.query.filter_by(padi_store_id=f"{id}").first_or_404()
 
+    stale_tags = shop_tags(dive_shop)
     updates = request.json
     for key in updates.keys():
         setattr(dive_shop, key, updates.get(key))
     db.session.commit()
+    purge_tags(*stale_tags, *shop_tags(dive_shop))
     data = dive_shop.get_dict()
 
     return {"data": data}
@@ -402,19 +425,24 @@ def upload(id):
     dive_shop = DiveShop.query.get_or_404(id)
     setattr(dive_shop, "logo_img", s3_url)
     db.session.commit()
+    purge_tags(*shop_tags(dive_shop))
 
     return {"msg": "dive shop successfully updated"}
 
 
 @bp.route("/typeahead")
+@search_log.logged("shops", "query")
 @cache.cached(query_string=True)
 def get_typeahead():
     query = request.args.get("query")
     limit = request.args.get("limit") if request.args.get("limit") else 25
+    if not normalize_text(query):
+        # Punctuation-only queries normalize to "", which would LIKE-match every shop
+        return {"data": []}
     dive_shops = (
         DiveShop.query.filter(
             or_(
-                DiveShop.name.ilike("%" + query + "%"),
+                DiveShop.name_normalized.like("%" + normalize_text(query) + "%"),
                 DiveShop.city.ilike("%" + query + "%"),
                 DiveShop.state.ilike("%" + query + "%"),
             )
@@ -481,13 +509,8 @@ def nearby_locations():
 
     results = []
     try:
-        query = (
-            DiveShop.query.filter(DiveShop.id != shop_id)
-            .options(joinedload("locality"))
-            .order_by(DiveShop.distance(startlat, startlng))
-            .limit(limit)
-        )
-        results = query.all()
+        query = DiveShop.query.filter(DiveShop.id != shop_id).options(joinedload("locality"))
+        results = nearest(query, DiveShop, startlat, startlng, limit)
     except Exception as e:
         newrelic.agent.record_exception(e)
         return {"msg": str(e)}, 500
@@ -509,8 +532,7 @@ def get_typeahea_nearby():
     limit = request.args.get("limit") if request.args.get("limit") else 25
     results = []
     try:
-        query = DiveShop.query.order_by(DiveShop.distance(latitude, longitude)).limit(limit)
-        results = query.all()
+        results = nearest(DiveShop.query, DiveShop, latitude, longitude, limit)
     except Exception as e:
         newrelic.agent.record_exception(e)
         return {"msg": str(e)}, 500
@@ -535,11 +557,13 @@ def geocode(beach_id):
         address_components = response.get("results")[0].get("address_components")
         locality, area_2, area_1, country = get_localities(address_components)
         if country:
+            stale_tags = shop_tags(spot)
             spot.locality = locality
             spot.area_one = area_1
             spot.area_two = area_2
             spot.country = country
             db.session.add(spot)
             db.session.commit()
+            purge_tags(*stale_tags, *shop_tags(spot))
             spot.id
     return spot.get_dict()
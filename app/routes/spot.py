@@ -2,17 +2,32 @@ import os
 
 import requests
 from flask import Blueprint, request
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 
 from app import cache, db, get_summary_reviews_helper
+from app.helpers.conditional_get import conditional_get
 from app.helpers.get_localities import get_localities
-from app.models import Spot
+from app.models import Review, Spot, SpotSimilarity
+from app.services.cache_tags import add_cache_tags, cached_with_tags, purge_tags, spot_tags
 
 bp = Blueprint("spot", __name__, url_prefix="/spot")
 
 
+def spot_versions(beach_id):
+    """The spot's and its reviews' (which feed its ratings) last update, or None if it doesn't exist"""
+    return (
+        db.session.query(Spot.updated, func.max(Review.updated), func.count(Review.id))
+        .outerjoin(Review, Review.beach_id == Spot.id)
+        .filter(Spot.id == beach_id)
+        .group_by(Spot.id)
+        .first()
+    )
+
+
 @bp.route("/<int:beach_id>")
-@cache.cached()
+@conditional_get(spot_versions)
+@cached_with_tags()
 def get_spot(beach_id):
     spot = (
         Spot.query.options(joinedload("locality"))
@@ -23,6 +38,7 @@ def get_spot(beach_id):
         .filter_by(id=beach_id)
         .first_or_404()
     )
+    add_cache_tags(f"spot:{beach_id}")
     spot_data = spot.get_dict()
     if spot.locality:
         spot_data["locality"] = spot.locality.get_dict(
@@ -44,6 +60,28 @@ def get_spot(beach_id):
     return {"data": spot_data}
 
 
+@bp.route("/<int:beach_id>/similar")
+@cache.cached(query_string=True)
+def get_similar_spots(beach_id):
+    """Spots most often reviewed by the same people, precomputed by ``flask build-similar-spots``"""
+    limit = request.args.get("limit", 10, type=int)
+    similar = (
+        SpotSimilarity.query.join(Spot, Spot.id == SpotSimilarity.similar_spot_id)
+        .filter(SpotSimilarity.spot_id == beach_id)
+        .filter(Spot.is_verified.isnot(False))
+        .filter(Spot.is_deleted.isnot(True))
+        .order_by(SpotSimilarity.rank)
+        .limit(limit)
+        .all()
+    )
+    data = []
+    for row in similar:
+        spot_data = row.similar_spot.get_dict()
+        spot_data["similarity"] = row.score
+        data.append(spot_data)
+    return {"data": data}
+
+
 @bp.route("/recalc", methods=["GET"])
 def recalc_spot_rating():
     beach_id = request.args.get("beach_id")
@@ -60,6 +98,7 @@ def recalc_spot_rating():
     else:
         spot.rating = None
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     spot.id
     return {"data": spot.get_dict()}
 
@@ -71,6 +110,7 @@ def add_station_id():
     spot = Spot.query.filter_by(id=spot_id).first_or_404()
     spot.noaa_station_id = station_id
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     spot.id
     return {"data": spot.get_dict()}
 
@@ -106,6 +146,7 @@ def geocode(beach_id):
             address_components
         )
         if country:
+            stale_tags = spot_tags(spot)
             spot.locality = locality
             spot.area_one = area_1
             spot.area_two = area_2
@@ -113,5 +154,6 @@ def geocode(beach_id):
             spot.geographic_node = geographic_node
             db.session.add(spot)
             db.session.commit()
+            purge_tags(*stale_tags, *spot_tags(spot))
             spot.id
     return spot.get_dict()
@@ -1,8 +1,9 @@
 import os
+import time
 
 import newrelic.agent
 import requests
-from flask import Blueprint, abort, request
+from flask import Blueprint, abort, current_app, request
 from flask_jwt_extended import get_current_user, get_jwt_identity, jwt_required
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
@@ -10,8 +11,12 @@ from sqlalchemy import and_, or_, sql
 from sqlalchemy.orm import joinedload
 
 from app import cache, db, get_summary_reviews_helper
+from app.helpers.fuzzy_search import fuzzy_match_ids, fuzzy_search_spots
 from app.helpers.get_localities import get_localities
 from app.helpers.get_nearby_spots import get_nearby_spots
+from app.helpers.keyset import keyset_page
+from app.helpers.normalize_text import normalize_text
+from app.helpers.trending import get_trending_spots
 from app.models import (
     AreaOne,
     AreaTwo,
@@ -21,16 +26,37 @@ from app.models import (
     Review,
     ShoreDivingData,
     Spot,
+    SpotSimilarity,
     Tag,
     WannaDiveData,
     tags,
 )
+from app.services.cache_tags import add_cache_tags, cached_with_tags, purge_tags, spot_tags
+from app.services.geo_arrays import sort_by_confidence
+from app.services.map_clusters import MAX_CLUSTER_ZOOM, map_clusters
+from app.services.recommendations import recommend_spot_ids
+from app.services.search_log import search_log
+from app.services.spot_facets import spot_facets
 
 bp = Blueprint("spots", __name__, url_prefix="/spots")
 
+# Substring matches have no relevance, so pages are in id order (the primary key index)
+SEARCH_ORDER = [("id", Spot.id, False)]
+
+
+def facets_ready():
+    """Refresh the facet index, building it in the background; False until this worker's first build lands"""
+    spot_facets.refresh(max_age=current_app.config.get("FACET_INDEX_REFRESH_SECONDS", 60), background=True)
+    return spot_facets.ready
+
+
+def facet_counts(spot_ids, **selected):
+    """Facet value counts over spot_ids, with the facet filters the request applied"""
+    return spot_facets.counts(spot_ids, selected)
+
 
 @bp.route("/get")
-@cache.cached(query_string=True)
+@cached_with_tags(query_string=True)
 def get_spots():
     """Get Dive Sites/Beaches
     ---
@@ -73,6 +99,14 @@ def get_spots():
               description: limit on number of results returned (default 15)
               type: string
               required: false
+            - name: facets
+              in: query
+              description: >
+                include "facets", the number of matching spots per difficulty, entry, max_depth,
+                rating and activity value. Left out while this server is still building its facet
+                index
+              type: string
+              required: false
         responses:
             200:
                 description: Returns singular beach object or list of beach objects
@@ -161,6 +195,7 @@ def get_spots():
             if spot.country:
                 spot_data["country"] = spot.country.get_dict()
         beach_id = spot.id
+        add_cache_tags(f"spot:{beach_id}")
         if not spot.location_google and spot.latitude and spot.longitude:
             spot_data["location_google"] = "http://maps.google.com/maps?q=%(latitude)f,%(longitude)f" % {
                 "latitude": spot.latitude,
@@ -168,6 +203,7 @@ def get_spots():
             }
         spot_data["ratings"] = get_summary_reviews_helper(beach_id)
         return {"data": spot_data}
+    add_cache_tags("spots")
     query = Spot.query
     if request.args.get("unverified"):
         query = query.filter(Spot.is_verified.isnot(True))
@@ -251,6 +287,7 @@ def get_spots():
     elif country_name:
         query = query.filter(Spot.country.has(short_name=country_name))
         area = Country.query.filter_by(short_name=country_name).first_or_404()
+    facet_query = query
     difficulty_filter = request.args.get("difficulty")
     if difficulty_filter:
         query = query.filter(Spot.difficulty == difficulty_filter)
@@ -272,7 +309,7 @@ def get_spots():
     query = query.options(joinedload(Spot.shorediving_data))
     spots = query.all()
     if sort_param == "top":
-        spots.sort(reverse=True, key=lambda spot: spot.get_confidence_score())
+        spots = sort_by_confidence(spots)
     output = []
     for spot in spots:
         spot_data = spot.get_dict()
@@ -287,6 +324,12 @@ def get_spots():
             }
         output.append(spot_data)
     resp = {"data": output}
+    if request.args.get("facets") and facets_ready():
+        resp["facets"] = facet_counts(
+            [spot_id for (spot_id,) in facet_query.with_entities(Spot.id)],
+            difficulty=difficulty_filter,
+            entry=access_filter,
+        )
     if area:
         area_data = area.get_dict()
 
@@ -360,6 +403,13 @@ def search_spots():
               description: sort either "rating" or "popularity"
               type: string
               required: false
+            - name: mode
+              in: query
+              description: >
+                "fuzzy" to tolerate typos and rank by trigram similarity across name, city and
+                description instead of exact substring matching in no particular order
+              type: string
+              required: false
             - name: limit
               in: query
               description: the max number of results in the response (default 50)
@@ -370,13 +420,29 @@ def search_spots():
               description: offset in order to paginate the results
               type: int
               required: false
+            - name: cursor
+              in: query
+              description: next_cursor from the previous page, used instead of offset (not with mode=fuzzy)
+              type: string
+              required: false
+            - name: facets
+              in: query
+              description: >
+                include "facets", the number of matching spots per difficulty, entry, max_depth,
+                rating and activity value. Left out while this server is still building its facet
+                index
+              type: string
+              required: false
         responses:
             200:
                 description: Returns singular beach object or list of beach objects
                 content:
                   application/json:
                     schema: BeachSchema
+            400:
+                description: cursor was combined with mode=fuzzy
     """
+    started = time.perf_counter()
     search_term = request.args.get("query")
     limit = request.args.get("limit") if request.args.get("limit") else 50
     offset = int(request.args.get("offset")) if request.args.get("offset") else 0
@@ -396,29 +462,48 @@ def search_spots():
         entry_query = Spot.tags.any(short_name=entry)
     # if activity:
     # activity_query = Spot.
-    spots = (
-        Spot.query.filter(
-            and_(
-                or_(
-                    Spot.name.ilike("%" + search_term + "%"),
-                    Spot.location_city.ilike("%" + search_term + "%"),
-                    Spot.description.ilike("%" + search_term + "%"),
-                ),
-                Spot.is_verified.isnot(False),
-                Spot.is_deleted.isnot(True),
-            ),
-            difficulty_query,
-            entry_query,
+    if not normalize_text(search_term):
+        # Punctuation-only terms normalize to "", which would LIKE-match every spot
+        return {"data": [], "next_cursor": None}
+    live_spots = Spot.query.filter(Spot.is_verified.isnot(False), Spot.is_deleted.isnot(True))
+    if request.args.get("mode") == "fuzzy":
+        if request.args.get("cursor"):
+            abort(400, "cursor isn't supported with mode=fuzzy, use offset")
+        spots = fuzzy_search_spots(
+            live_spots.filter(difficulty_query, entry_query),
+            search_term,
+            int(limit),
+            offset,
+        )
+        resp = {"data": [spot.get_dict() for spot in spots]}
+        if request.args.get("facets") and facets_ready():
+            resp["facets"] = facet_counts(fuzzy_match_ids(live_spots, search_term), difficulty=difficulty, entry=entry)
+        if not offset:
+            search_log.record("spots_fuzzy", search_term, len(spots), started)
+        return resp
+    matches = live_spots.filter(
+        or_(
+            Spot.name_normalized.like("%" + normalize_text(search_term) + "%"),
+            Spot.location_city.ilike("%" + search_term + "%"),
+            Spot.description.ilike("%" + search_term + "%"),
         )
-        .offset(offset)
-        .limit(limit)
-        .all()
+    )
+    spots, next_cursor = keyset_page(
+        matches.filter(difficulty_query, entry_query), SEARCH_ORDER, limit, request.args.get("cursor"), offset
     )
     output = []
     for spot in spots:
         spot_data = spot.get_dict()
         output.append(spot_data)
-    return {"data": output}
+    resp = {"data": output, "next_cursor": next_cursor}
+    if request.args.get("facets") and facets_ready():
+        resp["facets"] = facet_counts(
+            [spot_id for (spot_id,) in matches.with_entities(Spot.id)], difficulty=difficulty, entry=entry
+        )
+    if not offset and not request.args.get("cursor"):
+        # Later pages of the same search aren't new queries
+        search_log.record("spots", search_term, len(output), started)
+    return resp
 
 
 @bp.route("/add/script", methods=["POST"])
@@ -476,6 +561,7 @@ def add_spot_script():
 
     db.session.add(sd_data)
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     spot.id  # need this to get data loaded, not sure why
     return {"data": spot.get_dict()}
 
@@ -533,6 +619,7 @@ def add_spot_wdscript():
     db.session.add(spot)
     db.session.add(sd_data)
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     spot.id  # need this to get data loaded, not sure why
     return {"data": spot.get_dict()}
 
@@ -557,6 +644,7 @@ def add_spot_tags():
 
     db.session.add(spot)
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     spot.id  # need this to get data loaded, not sure why
     return {"data": spot.get_dict()}
 
@@ -689,6 +777,7 @@ def add_spot():
     spot.country = country
     db.session.add(spot)
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     spot.id  # need this to get data loaded, not sure why
     if not user or not user.admin:
         message = Mail(
@@ -743,6 +832,7 @@ def approve_spot():
         return {"data": spot_data, "status": "already verified"}
     spot.is_verified = True
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     spot.id
     user = spot.submitter
     if user:
@@ -799,6 +889,8 @@ def patch_spot():
         abort(401, "Only admins can do that")
     beach_id = request.json.get("id")
     spot = Spot.query.filter_by(id=beach_id).first_or_404()
+    # Includes the areas the spot is leaving, if the update moves it
+    stale_tags = spot_tags(spot)
     updates = request.json
     updates.pop("id", None)
     for key in updates.keys():
@@ -840,6 +932,7 @@ def patch_spot():
             latitude=latitude, longitude=longitude
         )
     db.session.commit()
+    purge_tags(*stale_tags, *spot_tags(spot))
     spot.id
     spot_data = spot.get_dict()
     return spot_data, 200
@@ -850,6 +943,7 @@ def delete_spot():
     id = request.args.get("id")
 
     beach = Spot.query.filter_by(id=id).options(joinedload(Spot.images)).first_or_404()
+    stale_tags = spot_tags(beach)
     for image in beach.images:
         Image.query.filter_by(id=image.id).delete()
     for review in beach.reviews:
@@ -858,8 +952,12 @@ def delete_spot():
     if beach.shorediving_data:
         ShoreDivingData.query.filter_by(id=beach.shorediving_data.id).delete()
 
+    SpotSimilarity.query.filter(
+        or_(SpotSimilarity.spot_id == beach.id, SpotSimilarity.similar_spot_id == beach.id)
+    ).delete(synchronize_session=False)
     Spot.query.filter_by(id=id).delete()
     db.session.commit()
+    purge_tags(*stale_tags)
     return {}
 
 
@@ -870,7 +968,9 @@ def get_recs():
     ---
     get:
         summary: Recommended Sites
-        description: Recommended sites for a specific user based on where they have already visited
+        description: Recommended sites for a specific user, ranked by popularity, confidence and
+            distance from lat/lng (else their home location, else the sites they have reviewed),
+            leaving out sites they have already reviewed
         parameters:
             - name: lat
               in: query
@@ -888,30 +988,55 @@ def get_recs():
                 content:
                   application/json:
                     schema: BeachSchema
+            422:
+                description: lat or lng is not a number
     """
     user_id = get_jwt_identity()
     if not user_id:
         return {"data": {}}, 401
-    # (SELECT * FROM SPOT a LEFT JOIN REVIEW b ON a.id = b.beach_id WHERE b.author_id = user_id) as my_spots
-    # SELECT * FROM SPOT A LEFT JOIN my_spots B ON A.id = B.id WHERE b.id IS NULL
-    spots_been_to = (
-        db.session.query(Spot.id)
-        .join(Review, Spot.id == Review.beach_id, isouter=True)
-        .filter(Review.author_id == user_id)
-        .subquery()
-    )
-    spots = (
-        Spot.query.filter(Spot.id.not_in(spots_been_to))
-        .filter(Spot.is_verified.isnot(False))
-        .filter(Spot.is_deleted.isnot(True))
-        .order_by(Spot.num_reviews.desc().nullslast(), Spot.rating.desc())
-        .limit(25)
-        .all()
-    )
+    try:
+        latitude = float(request.args["lat"]) if request.args.get("lat") else None
+        longitude = float(request.args["lng"]) if request.args.get("lng") else None
+    except ValueError:
+        abort(422, "lat and lng must be numbers")
+    ids = recommend_spot_ids(user_id, latitude, longitude)
+    spots = {spot.id: spot for spot in Spot.query.filter(Spot.id.in_(ids)).all()} if ids else {}
+    return {"data": [spots[id].get_dict() for id in ids if id in spots]}
+
+
+@bp.route("/trending")
+@cache.cached(timeout=60, query_string=True)
+def get_trending():
+    """Trending Sites
+    ---
+    get:
+        summary: Trending Sites
+        description: Sites with the most recent review activity, weighted so newer reviews count more
+        parameters:
+            - name: limit
+              in: query
+              description: number of sites to return
+              type: int
+              required: false
+            - name: offset
+              in: query
+              description: number of sites to skip
+              type: int
+              required: false
+        responses:
+            200:
+                description: Returns array of beaches/dive sites
+                content:
+                  application/json:
+                    schema: BeachSchema
+    """
+    limit = request.args.get("limit", 25, type=int)
+    offset = request.args.get("offset", 0, type=int)
     data = []
-    for spot in spots:
-        data.append(spot.get_dict())
-
+    for score, spot in get_trending_spots(limit, offset):
+        spot_data = spot.get_dict()
+        spot_data["trending_score"] = score
+        data.append(spot_data)
     return {"data": data}
 
 
@@ -994,19 +1119,57 @@ def nearby_locations():
     return {"data": data}
 
 
+@bp.route("/map")
+def map_spots():
+    """Map Viewport
+    ---
+    get:
+        summary: Spots or spot clusters inside a map viewport
+        description: Clusters (count, centroid, top rated spot) up to zoom 11, individual spots above
+        parameters:
+            - name: bbox
+              in: query
+              description: west,south,east,north
+              type: string
+              required: true
+            - name: zoom
+              in: query
+              description: map zoom level
+              type: integer
+              required: true
+        responses:
+            200:
+                description: Returns {type, data} where type is clusters or points
+            503:
+                description: This worker is still building its map index
+    """
+    try:
+        west, south, east, north = [float(value) for value in request.args.get("bbox").split(",")]
+        zoom = int(float(request.args.get("zoom")))
+    except (AttributeError, TypeError, ValueError):
+        abort(422, "Include a bbox=west,south,east,north and a zoom")
+
+    map_clusters.refresh(max_age=current_app.config.get("SPATIAL_INDEX_REFRESH_SECONDS", 60), background=True)
+    if not map_clusters.ready:
+        abort(503, "The map is still loading, try again in a few seconds")
+    if zoom <= MAX_CLUSTER_ZOOM:
+        return {"type": "clusters", "data": map_clusters.clusters(west, south, east, north, zoom)}
+    return {"type": "points", "data": map_clusters.points(west, south, east, north)}
+
+
 @bp.route("/location")
 def get_location_spots():
     type = request.args.get("type")
     name = request.args.get("name")
     locality = None
     if type == "locality":
-        locality = Locality.query.filter_by(name=name).first_or_404()
+        locality = Locality.query.filter_by(name_normalized=normalize_text(name)).first_or_404()
     if type == "area_one":
-        locality = AreaOne.query.filter_by(name=name).first_or_404()
+        locality = AreaOne.query.filter_by(name_normalized=normalize_text(name)).first_or_404()
     if type == "area_two":
-        locality = AreaTwo.query.filter_by(name=name).first_or_404()
+        locality = AreaTwo.query.filter_by(name_normalized=normalize_text(name)).first_or_404()
     if type == "country":
-        locality = Country.query.filter_by(name=name).first_or_404()
+        locality = Country.query.filter_by(name_normalized=normalize_text(name)).first_or_404()
     data = []
     for spot in locality.spots:
         data.append(spot.get_dict())
@@ -1038,6 +1201,7 @@ def add_place_id():
                 spot.country = country
                 db.session.add(spot)
                 db.session.commit()
+                purge_tags(*spot_tags(spot))
                 spot.id
             else:
                 skipped.append({"name": spot.name})
@@ -1057,6 +1221,7 @@ def add_shorediving_pic():
     else:
         abort(401, "Location already has a hero image")
     db.session.commit()
+    purge_tags(*spot_tags(shorediving.spot))
     shorediving.spot.id
     return {"data": shorediving.spot.get_dict()}
 
@@ -1072,6 +1237,7 @@ def add_shorediving_to_existing():
     )
     db.session.add(sd_data)
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     sd_data.id
     return {"data": sd_data.get_dict()}
 
@@ -1107,6 +1273,7 @@ def backfill_shorediving_to_existing():
     )
     db.session.add(sd_data)
     db.session.commit()
+    purge_tags(*spot_tags(spot))
     sd_data.id
     return {"data": sd_data.get_dict()}
 
@@ -1136,5 +1303,6 @@ def merge_spot():
             orig.tags.append(tag)
     dupe.is_deleted = True
     db.session.commit()
+    purge_tags(*spot_tags(orig), *spot_tags(dupe))
     orig.id
     return {"data": orig.get_dict()}
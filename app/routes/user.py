@@ -24,12 +24,13 @@ from sqlalchemy import func, or_
 from sqlalchemy.orm import joinedload
 
 from app import db
+from app.helpers.conditional_get import conditional_get
 from app.helpers.create_account import create_account
 from app.helpers.get_localities import format_localities
 from app.helpers.login import login
 from app.helpers.phone_validation import format_phone_to_e164, validate_phone_format
 from app.helpers.send_notifications import send_notification
-from app.models import Review, User
+from app.models import DiveShop, Review, Spot, User
 
 bp = Blueprint("user", __name__, url_prefix="/user")
 
@@ -578,8 +579,35 @@ def get_me():
     return resp
 
 
+def user_versions():
+    """Last update of the profile /user/get would return, its reviews and their spots and shops"""
+    username = request.args.get("username")
+    user_id = request.args.get("user_id")
+    query = db.session.query(User.id, User.updated)
+    user = None
+    if username and username not in ("null", "undefined"):
+        user = query.filter(func.lower(User.username) == username.lower()).first()
+    if not user and user_id:
+        user = query.filter(User.id == user_id).first()
+    if not user and not username and not user_id and get_current_user():
+        user = query.filter(User.id == get_current_user().id).first()
+    if not user:
+        return None
+    reviews = (
+        db.session.query(
+            func.max(Review.updated), func.count(Review.id), func.max(Spot.updated), func.max(DiveShop.updated)
+        )
+        .join(Spot, Review.beach_id == Spot.id)
+        .outerjoin(DiveShop, Review.dive_shop_id == DiveShop.id)
+        .filter(Review.author_id == user.id)
+        .one()
+    )
+    return [user.id, user.updated, reviews]
+
+
 @bp.route("/get")
 @jwt_required(optional=True)
+@conditional_get(user_versions)
 def get_user():
     """Get User
     ---
@@ -1,8 +1,9 @@
-from flask import Blueprint, request
+from flask import Blueprint, abort, request
 from sqlalchemy import and_, not_
 
 from app import cache, db
 from app.models import Review, User
+from app.services.buddy_search import BuddySearchService
 
 bp = Blueprint("users", __name__, url_prefix="/users")
 
@@ -11,13 +12,18 @@ bp = Blueprint("users", __name__, url_prefix="/users")
 def users_nearby():
     latitude = request.args.get("latitude")
     longitude = request.args.get("longitude")
-    query = (
-        User.query.filter(User.latitude.is_not(None))
-        .order_by(User.distance(latitude, longitude))
-        .limit(10)
-    )
-    results = query.all()
-    return {"data": [result.get_dict() for result in results]}
+    limit = request.args.get("limit") if request.args.get("limit") else 10
+    offset = request.args.get("offset") if request.args.get("offset") else 0
+    try:
+        results = BuddySearchService.search(latitude, longitude, request.args.get("radius"), limit, offset)
+    except (TypeError, ValueError):
+        abort(422, "Include a latitude and longitude")
+    data = []
+    for result in results:
+        user_data = result.user.get_dict()
+        user_data["distance"] = round(result.distance, 1)
+        data.append(user_data)
+    return {"data": data}
 
 
 @bp.route("/all")
@@ -0,0 +1,329 @@
+import fcntl
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+
+import newrelic.agent
+import numpy as np
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import lazyload
+
+from app.helpers.normalize_text import normalize_text
+from app.helpers.spot_urls import node_paths, spot_url
+from app.models import Spot, db
+
+DEFAULT_PATH = "/tmp/snorkel-autocomplete.idx"
+MAGIC = b"ZACX"
+VERSION = 1
+# magic, version, key count, entry count, key bytes, label bytes, url bytes, built at (unix time)
+HEADER = struct.Struct("<4sIIIIIId")
+# Key kinds, also their rank: a whole name beats an alias beats a later word of the name
+NAME, ALIAS, WORD = 0, 1, 2
+# Snapshots older than this are rebuilt in the background
+REBUILD_INTERVAL = 3600
+# Written by add_spot_wdscript: "<name> is also known as <alternative>."
+ALIAS_PATTERN = re.compile(r"is also known as (.+?)\.(?:\s|$)")
+
+
+def aliases(description):
+    """ "Also known as" names from a spot description, split on commas and "or" """
+    names = []
+    for match in ALIAS_PATTERN.finditer(description or ""):
+        names.extend(name.strip() for name in re.split(r",|\bor\b", match.group(1)) if name.strip())
+    return names
+
+
+def spot_keys(name, alternative_names=()):
+    """(normalized key, kind) for a spot: its name, each later word onwards, and its aliases"""
+    keys = {}
+    normalized = normalize_text(name)
+    if normalized:
+        keys[normalized] = NAME
+        words = normalized.split()
+        for i in range(1, len(words)):
+            keys.setdefault(" ".join(words[i:]), WORD)
+    for alias in alternative_names:
+        normalized = normalize_text(alias)
+        if normalized and keys.get(normalized, WORD) > ALIAS:
+            keys[normalized] = ALIAS
+    return keys.items()
+
+
+def _blob(strings):
+    encoded = [string.encode() for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+def _pad(data):
+    return data + b"\0" * (-len(data) % 8)
+
+
+def write_snapshot(path, entries):
+    """Serialize [(spot_id, weight, label, url, keys)] to path, atomically
+
+    Layout after the header, each section padded to 8 bytes: key offsets, key entry indexes,
+    key kinds, entry ids, entry weights, label offsets, url offsets, then the key, label and
+    url UTF-8 blobs. Keys are sorted by their UTF-8 bytes, which is code point order, so a
+    prefix is one contiguous range.
+    """
+    keys = sorted((key.encode(), kind, position) for position, entry in enumerate(entries) for key, kind in entry[4])
+    key_blob = b"".join(key for key, _, _ in keys)
+    key_offsets = np.zeros(len(keys) + 1, dtype=np.uint32)
+    np.cumsum([len(key) for key, _, _ in keys], out=key_offsets[1:])
+    label_blob, label_offsets = _blob(entry[2] for entry in entries)
+    url_blob, url_offsets = _blob(entry[3] for entry in entries)
+    sections = [
+        key_offsets,
+        np.array([position for _, _, position in keys], dtype=np.uint32),
+        np.array([kind for _, kind, _ in keys], dtype=np.uint8),
+        np.array([entry[0] for entry in entries], dtype=np.uint32),
+        np.array([entry[1] for entry in entries], dtype=np.uint32),
+        label_offsets,
+        url_offsets,
+    ]
+    header = HEADER.pack(
+        MAGIC, VERSION, len(keys), len(entries), len(key_blob), len(label_blob), len(url_blob), time.time()
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".autocomplete-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_pad(header))
+            for section in sections:
+                f.write(_pad(section.tobytes()))
+            f.write(_pad(key_blob))
+            f.write(_pad(label_blob))
+            f.write(url_blob)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(keys)
+
+
+def build_snapshot(path):
+    """Write the autocomplete snapshot for every live spot"""
+    paths = node_paths()
+    spots = Spot.query.options(lazyload(Spot.tags)).filter(Spot.is_deleted.isnot(True)).order_by(Spot.id)
+    entries = [
+        (
+            spot.id,
+            spot.num_reviews or 0,
+            spot.name,
+            spot_url(spot, paths),
+            spot_keys(spot.name, aliases(spot.description)),
+        )
+        for spot in spots.yield_per(1000)
+    ]
+    return {"spots": len(entries), "keys": write_snapshot(path, entries)}
+
+
+class AutocompleteSnapshot:
+    """Read-only view of a snapshot file through mmap
+
+    The arrays are numpy views straight onto the mapping, so every worker on a host shares the
+    same page-cache copy instead of holding its own.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, key_count, entry_count, key_bytes, label_bytes, url_bytes, built_at = HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} autocomplete snapshot")
+        self.built_at = built_at
+        offset = len(_pad(b"\0" * HEADER.size))
+
+        def section(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+            offset += len(_pad(b"\0" * array.nbytes))
+            return array
+
+        self.key_offsets = section(np.uint32, key_count + 1)
+        self.key_entries = section(np.uint32, key_count)
+        self.key_kinds = section(np.uint8, key_count)
+        self.ids = section(np.uint32, entry_count)
+        self.weights = section(np.uint32, entry_count)
+        self.label_offsets = section(np.uint32, entry_count + 1)
+        self.url_offsets = section(np.uint32, entry_count + 1)
+        self._keys_at = offset
+        self._labels_at = self._keys_at + len(_pad(b"\0" * key_bytes))
+        self._urls_at = self._labels_at + len(_pad(b"\0" * label_bytes))
+
+    def __len__(self):
+        return len(self.key_entries)
+
+    def key(self, i):
+        return self._mmap[self._keys_at + int(self.key_offsets[i]) : self._keys_at + int(self.key_offsets[i + 1])]
+
+    def _string(self, start, offsets, i):
+        return self._mmap[start + int(offsets[i]) : start + int(offsets[i + 1])].decode()
+
+    def _lower_bound(self, target):
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _matching_keys(self, prefix):
+        start = self._lower_bound(prefix)
+        # 0xff never occurs in UTF-8, so this is the first key past every key with the prefix
+        return start, self._lower_bound(prefix + b"\xff")
+
+    def search(self, query, limit=5):
+        """[(spot_id, label, url)] for spots where every query word starts a word of the name or an alias
+
+        Candidates are the keys starting with the longest query word, ranked in bulk with numpy:
+        an exact name or alias first, then names over aliases over later words, then popularity.
+        With several words, candidates are checked in rank order until limit of them match.
+        """
+        normalized = normalize_text(query)
+        words = normalized.split()
+        if not words:
+            return []
+        start, end = self._matching_keys(max(words, key=len).encode())
+        # Keys equal to the whole query sort first among the keys it prefixes
+        exact = []
+        i = self._lower_bound(normalized.encode())
+        while i < len(self) and self.key(i) == normalized.encode():
+            exact.append(i)
+            i += 1
+        key_indexes = np.concatenate([np.arange(start, end), [i for i in exact if not start <= i < end]])
+        key_indexes = key_indexes.astype(np.int64)
+        if not len(key_indexes):
+            return []
+        positions = self.key_entries[key_indexes].astype(np.int64)
+        kinds = self.key_kinds[key_indexes].astype(np.int64)
+        kinds[np.isin(key_indexes, exact)] = -1
+        # Each spot's best key: sort by spot then kind and keep the first row per spot
+        order = np.lexsort((kinds, positions))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = positions[order][1:] != positions[order][:-1]
+        best = order[first]
+        ranked = best[np.lexsort((positions[best], -self.weights[positions[best]].astype(np.int64), kinds[best]))]
+
+        results = []
+        for i in ranked:
+            position = int(positions[i])
+            label = self._string(self._labels_at, self.label_offsets, position)
+            if len(words) > 1:
+                spot_words = set(normalize_text(label).split()) | set(self.key(key_indexes[i]).decode().split())
+                if not all(any(spot_word.startswith(word) for spot_word in spot_words) for word in words):
+                    continue
+            results.append((int(self.ids[position]), label, self._string(self._urls_at, self.url_offsets, position)))
+            if len(results) == limit:
+                break
+        return results
+
+
+def live_search(query, limit=5):
+    """AutocompleteSnapshot.search straight from the spot table, for while no snapshot exists"""
+    words = normalize_text(query).split()
+    if not words:
+        return []
+    spots = Spot.query.options(lazyload(Spot.tags)).filter(Spot.is_deleted.isnot(True))
+    for word in words:
+        spots = spots.filter(or_(Spot.name_normalized.like(f"{word}%"), Spot.name_normalized.like(f"% {word}%")))
+    spots = spots.order_by(Spot.num_reviews.desc().nullslast(), Spot.id).limit(limit)
+    return [(spot.id, spot.name, spot.get_url()) for spot in spots]
+
+
+class AutocompleteIndex:
+    """Process-wide handle on the snapshot file, reopened when a rebuild replaces it
+
+    A missing or stale snapshot is rebuilt on a background thread, so no request waits on the
+    full scan and a failed build only leaves the previous file (or the live query) in use. An
+    flock on ``<path>.lock`` keeps the workers sharing a host from building it at the same time.
+    """
+
+    def __init__(self, rebuild_interval=REBUILD_INTERVAL):
+        self.rebuild_interval = rebuild_interval
+        self._snapshot = None
+        self._mtime = None
+        self._checked_at = None
+        self._build_started_at = None
+        self._build_thread = None
+        self._lock = threading.Lock()
+
+    def get(self, path, max_age=60):
+        """The current snapshot, or None until a readable one has been built"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < max_age:
+            return self._snapshot
+        with self._lock:
+            mtime = os.stat(path).st_mtime if os.path.exists(path) else None
+            if mtime is None or time.time() - mtime >= self.rebuild_interval:
+                self._start_build(path, max_age)
+            if mtime is not None and (self._snapshot is None or mtime != self._mtime):
+                try:
+                    self._snapshot = AutocompleteSnapshot(path)
+                    self._mtime = mtime
+                except (ValueError, struct.error):
+                    # Written with another VERSION (e.g. before a deploy) or truncated
+                    self._start_build(path, max_age)
+            self._checked_at = now
+            return self._snapshot
+
+    def _needs_build(self, path):
+        """Whether the file at path is missing, stale or unreadable"""
+        if not os.path.exists(path) or time.time() - os.stat(path).st_mtime >= self.rebuild_interval:
+            return True
+        try:
+            AutocompleteSnapshot(path)
+        except (ValueError, struct.error):
+            return True
+        return False
+
+    def _start_build(self, path, max_age):
+        """Start a build unless one is running or this worker started one in the last max_age seconds"""
+        if self._build_started_at is not None and time.monotonic() - self._build_started_at < max_age:
+            return
+        if self._build_thread is not None and self._build_thread.is_alive():
+            return
+        self._build_started_at = time.monotonic()
+        app = current_app._get_current_object()
+        self._build_thread = threading.Thread(target=self._build_in_background, args=(app, path), daemon=True)
+        self._build_thread.start()
+
+    def _build_in_background(self, app, path):
+        with app.app_context(), open(f"{path}.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                # Another worker may have finished a build while this one waited to start
+                if self._needs_build(path):
+                    build_snapshot(path)
+            except SQLAlchemyError as e:
+                newrelic.agent.record_exception(e)
+            finally:
+                db.session.remove()
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+            self._mtime = None
+            self._checked_at = None
+            self._build_started_at = None
+
+
+autocomplete_index = AutocompleteIndex()
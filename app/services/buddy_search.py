@@ -0,0 +1,94 @@
+import math
+from collections import namedtuple
+
+from sqlalchemy.orm import joinedload
+
+from app.helpers.distance import spot_distance
+from app.helpers.nearby import DEFAULT_RADIUS_MILES, RADIUS_GROWTH, bounding_box, filter_within_radius
+from app.models import DivePartnerAd, User
+
+BuddyResult = namedtuple("BuddyResult", ["distance", "user", "ad"])
+
+
+class BuddySearchService:
+    """Geo search over dive buddies: users' own locations and their dive partner ads"""
+
+    @staticmethod
+    def _rank(distance, ad):
+        """Closest first, then the most recently posted ad, then users without an ad"""
+        if ad is not None and ad.created is not None:
+            return distance, -ad.created.timestamp()
+        return distance, math.inf
+
+    @staticmethod
+    def _closest(query, model, latitude, longitude, radius, limit, *order_by):
+        """The first limit rows of query within radius miles, closest first"""
+        query = filter_within_radius(query, model, latitude, longitude, radius)
+        return query.order_by(model.distance(latitude, longitude), *order_by).limit(limit).all()
+
+    @staticmethod
+    def _candidates(latitude, longitude, radius, include_users, needed):
+        """Best (rank, result) per user, covering at least the needed best users within radius miles
+
+        Ads and users are each read closest first with a LIMIT, so the database only returns the
+        head of the ranking. One user can own several ads, so when a source fills its limit the
+        limit doubles until that source's last row ranks no better than the needed-th user.
+        """
+        needed = fetch = max(needed, 1)
+        while True:
+            best = {}
+            cutoffs = []
+
+            def consider(user, distance, ad):
+                rank = BuddySearchService._rank(distance, ad)
+                if user.id not in best or rank < best[user.id][0]:
+                    best[user.id] = (rank, BuddyResult(distance, user, ad))
+                return rank
+
+            ads = BuddySearchService._closest(
+                DivePartnerAd.query.options(joinedload("user")),
+                DivePartnerAd,
+                latitude,
+                longitude,
+                radius,
+                fetch,
+                DivePartnerAd.created.desc().nullslast(),
+            )
+            for ad in ads:
+                rank = consider(ad.user, spot_distance(latitude, longitude, ad.latitude, ad.longitude), ad)
+            if len(ads) == fetch:
+                cutoffs.append(rank)
+            if include_users:
+                users = BuddySearchService._closest(User.query, User, latitude, longitude, radius, fetch)
+                for user in users:
+                    rank = consider(user, spot_distance(latitude, longitude, user.latitude, user.longitude), None)
+                if len(users) == fetch:
+                    cutoffs.append(rank)
+            ranks = sorted(rank for rank, _ in best.values())
+            if all(len(ranks) >= needed and cutoff >= ranks[needed - 1] for cutoff in cutoffs):
+                return best
+            fetch *= 2
+
+    @staticmethod
+    def search(latitude, longitude, radius=None, limit=10, offset=0, include_users=True):
+        """Rank buddies near a location by distance, then ad recency
+
+        With a radius, only buddies within it are ranked. Without one this is a k-nearest search:
+        the search radius widens until it holds offset + limit buddies, so every page is exact.
+        With ``include_users=False`` only users with a dive partner ad are returned, matched on
+        the ad location.
+        """
+        latitude, longitude = float(latitude), float(longitude)
+        limit, offset = int(limit), int(offset)
+        needed = offset + limit
+        if radius is not None:
+            candidates = BuddySearchService._candidates(latitude, longitude, float(radius), include_users, needed)
+        else:
+            radius = DEFAULT_RADIUS_MILES * math.sqrt(max(needed, 1) / 25)
+            while True:
+                candidates = BuddySearchService._candidates(latitude, longitude, radius, include_users, needed)
+                if len(candidates) >= needed or bounding_box(latitude, longitude, radius) is None:
+                    break
+                radius *= RADIUS_GROWTH
+        ranked = sorted(candidates.values(), key=lambda candidate: candidate[0])
+        return [result for _, result in ranked[offset : offset + limit]]
@@ -0,0 +1,209 @@
+import functools
+import hashlib
+import threading
+import time
+
+from flask import copy_current_request_context, current_app, g, has_request_context, request
+from flask_caching.backends import NullCache, SimpleCache
+
+from app import cache
+
+TAG_PREFIX = "tag:"
+LOCK_PREFIX = "lock/"
+# Tagged responses are purged on write, so with a shared cache they can live much longer than
+# CACHE_DEFAULT_TIMEOUT
+DEFAULT_TIMEOUT = 24 * 60 * 60
+
+
+def add_cache_tags(*tags):
+    """Declare what the response being built depends on, e.g. add_cache_tags(f"spot:{spot.id}")"""
+    if has_request_context():
+        g.setdefault("cache_tags", set()).update(tag for tag in tags if tag)
+
+
+def purge_tags(*tags):
+    """Invalidate every cached response that declared any of tags; call after the write commits"""
+    tags = {tag for tag in tags if tag}
+    if tags:
+        now = time.time()
+        cache.set_many({TAG_PREFIX + tag: now for tag in tags}, timeout=0)
+
+
+def spot_tags(spot):
+    """Tags to purge when a spot changes: the spot, spot listings and every /loc area it is in"""
+    tags = [f"spot:{spot.id}", "spots"]
+    if spot.geographic_node:
+        tags.extend(f"node:{node.id}" for node in spot.geographic_node.get_path_to_root())
+    return tags
+
+
+def shop_tags(shop):
+    """Tags to purge when a dive shop changes, like spot_tags"""
+    tags = [f"shop:{shop.id}", "shops"]
+    if shop.geographic_node:
+        tags.extend(f"node:{node.id}" for node in shop.geographic_node.get_path_to_root())
+    return tags
+
+
+def _tagged_timeout():
+    """CACHE_TAGGED_TIMEOUT, or CACHE_DEFAULT_TIMEOUT when the cache is per worker
+
+    With SimpleCache a purge only reaches the worker that ran the write, so the others keep
+    serving their entries until these expire.
+    """
+    backend = current_app.extensions["cache"][cache]
+    backend = getattr(backend, "l2", backend)
+    if isinstance(backend, (SimpleCache, NullCache)):
+        return current_app.config.get("CACHE_DEFAULT_TIMEOUT", 300)
+    return current_app.config.get("CACHE_TAGGED_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def _register_tags(tags, started):
+    """Give tags without a purge time (never purged, or evicted) the time the request started"""
+    if not tags:
+        return
+    for tag, at in zip(tags, cache.get_many(*[TAG_PREFIX + tag for tag in tags])):
+        # add, so a purge landing between the read and here isn't overwritten with an older time
+        if at is None:
+            cache.add(TAG_PREFIX + tag, started, timeout=0)
+
+
+def _purged_at(entry):
+    """None if no tag of a cached entry was purged since the request that built it started,
+    otherwise when the first such purge happened
+
+    A tag missing from the cache may have been purged and then evicted, so it counts as purged
+    since forever (0).
+    """
+    purged = []
+    if entry["tags"]:
+        for at in cache.get_many(*[TAG_PREFIX + tag for tag in entry["tags"]]):
+            if at is None:
+                return 0
+            if at > entry["started"]:
+                purged.append(at)
+    return min(purged) if purged else None
+
+
+def _is_fresh(entry):
+    """Whether an entry has neither expired nor had a tag purged since it was built"""
+    expires = entry.get("expires")
+    return (expires is None or expires > time.time()) and _purged_at(entry) is None
+
+
+def _acquire(key):
+    """Take the lock for rebuilding key, unless another request (in any worker) holds it"""
+    return cache.add(LOCK_PREFIX + key, True, timeout=current_app.config.get("CACHE_LOCK_TIMEOUT", 30))
+
+
+def _release(key):
+    cache.delete(LOCK_PREFIX + key)
+
+
+def _wait_for(key):
+    """The fresh entry another request is building for key, or None if it isn't ready in time"""
+    deadline = time.monotonic() + current_app.config.get("CACHE_LOCK_WAIT", 5)
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and _is_fresh(entry):
+            return entry
+        if not cache.has(LOCK_PREFIX + key):
+            # The holder gave up (or failed) without storing an entry
+            return None
+    return None
+
+
+def _refresh(rebuild):
+    """Run rebuild off the request thread"""
+    threading.Thread(target=rebuild, name="cache-refresh", daemon=True).start()
+
+
+def _cache_key(view, query_string):
+    key = f"tagged/{view.__module__}.{view.__name__}{request.path}"
+    if query_string:
+        args = sorted((name, value) for name, values in request.args.lists() for value in values)
+        key += "?" + hashlib.md5(repr(args).encode()).hexdigest()
+    return key
+
+
+def cached_with_tags(timeout=None, query_string=False, coalesce=False, grace=0):
+    """Like cache.cached, but entries are dropped by purge_tags of any tag the view declared
+
+    The view calls add_cache_tags (directly or from a cached view it calls) with the ids it read.
+    An entry records those tags and when the request that built it started, and is only served
+    while none of its tags has been purged since, so a write that commits while a response is
+    being built still invalidates it. Serving a hit costs one extra read of the tags' purge
+    times. ``timeout`` defaults to CACHE_TAGGED_TIMEOUT, or CACHE_DEFAULT_TIMEOUT with a per-worker
+    cache.
+
+    For expensive views, ``coalesce`` lets only one request across all workers rebuild a missing
+    or stale entry (holding a lock made with cache.add) while the others wait up to
+    CACHE_LOCK_WAIT seconds for its result. With ``grace`` an entry that expired at most that many
+    seconds ago is still served while one request refreshes it in the background, and one purged
+    at most that many seconds ago is rebuilt by the first request while concurrent ones are served
+    the old response instead of waiting; grace implies coalescing.
+    """
+
+    def decorator(view):
+        def build(key, args, kwargs):
+            ttl = timeout or _tagged_timeout()
+            started = time.time()
+            outer_tags = g.pop("cache_tags", set())
+            try:
+                response = view(*args, **kwargs)
+                tags = sorted(g.get("cache_tags", set()))
+            finally:
+                g.cache_tags = outer_tags
+            add_cache_tags(*tags)
+            _register_tags(tags, started)
+            cache.set(
+                key,
+                {"tags": tags, "started": started, "expires": time.time() + ttl, "response": response},
+                timeout=ttl + grace,
+            )
+            return response
+
+        def build_locked(key, args, kwargs):
+            try:
+                return build(key, args, kwargs)
+            finally:
+                _release(key)
+
+        def serve(entry):
+            add_cache_tags(*entry["tags"])
+            return entry["response"]
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = _cache_key(view, query_string)
+            entry = cache.get(key)
+            if entry is not None:
+                now = time.time()
+                purged = _purged_at(entry)
+                expires = entry.get("expires", float("inf"))
+                if purged is None and expires > now:
+                    return serve(entry)
+                if purged is None and now - expires <= grace:
+                    # Aged out: serve it while one request refreshes it in the background
+                    if _acquire(key):
+                        _refresh(copy_current_request_context(functools.partial(build_locked, key, args, kwargs)))
+                    return serve(entry)
+                if purged is not None and now - purged <= grace:
+                    # Purged by a write: the first request rebuilds it, the others get it meanwhile
+                    if _acquire(key):
+                        return build_locked(key, args, kwargs)
+                    return serve(entry)
+
+            if not (coalesce or grace):
+                return build(key, args, kwargs)
+            if _acquire(key):
+                return build_locked(key, args, kwargs)
+            entry = _wait_for(key)
+            if entry is not None:
+                return serve(entry)
+            return build(key, args, kwargs)
+
+        return wrapper
+
+    return decorator
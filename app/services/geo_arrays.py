@@ -0,0 +1,149 @@
+import threading
+import time
+
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+# Origins per (origins x points) block in min_distances, so memory stays ~ORIGIN_CHUNK * points floats
+ORIGIN_CHUNK = 64
+
+
+def haversine(latitude, longitude, latitudes, longitudes):
+    """Great-circle miles from one origin to every point (degree inputs, array output)"""
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(longitudes, dtype=np.float64)) - np.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_many(origin_latitudes, origin_longitudes, latitudes, longitudes):
+    """Miles from every origin to every point, shape (origins, points)"""
+    origin_lats = np.radians(np.asarray(origin_latitudes, dtype=np.float64))[:, np.newaxis]
+    origin_lngs = np.radians(np.asarray(origin_longitudes, dtype=np.float64))[:, np.newaxis]
+    lats = np.radians(np.asarray(latitudes, dtype=np.float64))[np.newaxis, :]
+    lngs = np.radians(np.asarray(longitudes, dtype=np.float64))[np.newaxis, :]
+    a = (
+        np.sin((lats - origin_lats) / 2) ** 2
+        + np.cos(origin_lats) * np.cos(lats) * np.sin((lngs - origin_lngs) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def min_distances(origin_latitudes, origin_longitudes, latitudes, longitudes):
+    """Miles from each point to its closest origin, inf when there are no origins"""
+    closest = np.full(len(latitudes), np.inf)
+    for start in range(0, len(origin_latitudes), ORIGIN_CHUNK):
+        block = haversine_many(
+            origin_latitudes[start : start + ORIGIN_CHUNK],
+            origin_longitudes[start : start + ORIGIN_CHUNK],
+            latitudes,
+            longitudes,
+        )
+        np.minimum(closest, block.min(axis=0), out=closest)
+    return closest
+
+
+def top_k(values, k, largest=False):
+    """Indexes of the k smallest (or largest) values, in order, via argpartition"""
+    values = np.asarray(values)
+    k = min(k, len(values))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    keyed = -values if largest else values
+    if k < len(values):
+        candidates = np.argpartition(keyed, k - 1)[:k]
+    else:
+        candidates = np.arange(len(values))
+    # lexsort keeps equal values in index order, like a stable sort would
+    return candidates[np.lexsort((candidates, keyed[candidates]))]
+
+
+def confidence_scores(ratings, num_reviews, z=1.645, std_dev=0.50):
+    """Vectorized Spot.get_confidence_score: rating - z * std_dev / sqrt(num_reviews), 0 without reviews"""
+    counts = np.array([count or 0 for count in num_reviews], dtype=np.float64)
+    # Like the model, the rating is only read for reviewed spots, so unreviewed ones may hold anything
+    ratings = np.array([float(rating) if count else 0.0 for rating, count in zip(ratings, counts)], dtype=np.float64)
+    scores = np.zeros(len(counts), dtype=np.float64)
+    reviewed = counts > 0
+    scores[reviewed] = ratings[reviewed] - z * (std_dev / np.sqrt(counts[reviewed]))
+    return scores
+
+
+def sort_by_confidence(spots):
+    """spots ordered by confidence score, highest first (same order as the per-row Python sort)"""
+    if not spots:
+        return spots
+    scores = confidence_scores([spot.rating for spot in spots], [spot.num_reviews for spot in spots])
+    order = np.argsort(-scores, kind="stable")
+    return [spots[i] for i in order]
+
+
+class GeoArrays:
+    """Ids and coordinates of one located table held as float64 arrays
+
+    Rebuilt wholesale every ``max_age`` seconds: a rebuild is one narrow query plus array
+    construction, which is cheaper than tracking changes for tables this size.
+    """
+
+    def __init__(self, query_factory, max_age=300):
+        self.query_factory = query_factory
+        self.max_age = max_age
+        self.ids = np.empty(0, dtype=np.int64)
+        self.latitudes = np.empty(0, dtype=np.float64)
+        self.longitudes = np.empty(0, dtype=np.float64)
+        self._positions = {}
+        self._built_at = None
+        # Bumped on every rebuild, so anything keyed on array positions can tell when they moved
+        self.build = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._built_at is not None and now - self._built_at < self.max_age:
+            return
+        with self._lock:
+            rows = self.query_factory().all()
+            self.ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            self.latitudes = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+            self.longitudes = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+            self._positions = {int(id): position for position, id in enumerate(self.ids)}
+            self._load(rows)
+            self._built_at = now
+            self.build += 1
+
+    def _load(self, rows):
+        """Hook for subclasses that select more than (id, latitude, longitude)"""
+
+    def positions(self, ids):
+        """Array positions of the given ids, skipping ids that aren't loaded"""
+        return np.array([self._positions[id] for id in ids if id in self._positions], dtype=np.intp)
+
+    def distances(self, latitude, longitude, ids=None):
+        """(ids, miles) from one origin to every loaded point, or only to ids"""
+        self.refresh()
+        positions = slice(None) if ids is None else self.positions(ids)
+        return self.ids[positions], haversine(
+            latitude, longitude, self.latitudes[positions], self.longitudes[positions]
+        )
+
+    def nearest(self, latitude, longitude, k=25, ids=None, exclude_ids=()):
+        """[(miles, id)] for the k closest points (optionally among ids), closest first"""
+        candidate_ids, miles = self.distances(latitude, longitude, ids)
+        if exclude_ids:
+            keep = ~np.isin(candidate_ids, list(exclude_ids))
+            candidate_ids, miles = candidate_ids[keep], miles[keep]
+        order = top_k(miles, k)
+        return [(float(miles[i]), int(candidate_ids[i])) for i in order]
+
+    def min_distances(self, origin_latitudes, origin_longitudes, ids=None):
+        """(ids, miles) from each point to its closest origin, e.g. to any of a user's logged spots"""
+        self.refresh()
+        positions = slice(None) if ids is None else self.positions(ids)
+        return self.ids[positions], min_distances(
+            origin_latitudes, origin_longitudes, self.latitudes[positions], self.longitudes[positions]
+        )
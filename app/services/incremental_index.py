@@ -0,0 +1,146 @@
+import copy
+import threading
+import time
+from datetime import timedelta
+from itertools import batched
+
+import newrelic.agent
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import Spot, db
+
+# Postgres stamps ``updated`` with the transaction start time, so a slow transaction can commit
+# rows older than the watermark. Re-reading a short window behind it catches those.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+# Rows handed to _apply_rows at a time, and fetched per round trip during a build
+BATCH_SIZE = 1000
+
+
+class IncrementalIndex:
+    """Base for per-worker in-memory indexes over tables, kept current from their ``updated``
+
+    Subclasses define _reset() (empty structures), _sources() (yielding ``(name, updated
+    column, query)`` per table, in the order they must be applied) and _apply_rows(name, rows).
+    Between full builds, refresh() only reads the rows whose ``updated`` moved past the last one
+    seen in their table. Hard deletes don't bump ``updated``, so the whole index is rebuilt every
+    ``rebuild_interval`` seconds; a build fills fresh structures and swaps them in at the end, so
+    readers keep using the previous ones meanwhile.
+    """
+
+    # Attributes that belong to the live index rather than to one build's structures
+    _unswapped = ("_lock", "_build_thread")
+
+    def __init__(self, rebuild_interval=3600):
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._build_thread = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self._reset()
+        self._watermarks = {}
+        self._built_at = None
+        self._refreshed_at = None
+
+    @property
+    def ready(self):
+        """Whether a build has finished, so lookups reflect the tables"""
+        return self._built_at is not None
+
+    def clear(self):
+        with self._lock:
+            self._reset_state()
+
+    def _build_due(self):
+        return self._built_at is None or time.monotonic() - self._built_at >= self.rebuild_interval
+
+    def refresh(self, max_age=60, force=False, background=False):
+        """Build the index if it is due, otherwise apply rows updated since the last refresh
+
+        With ``background`` (from a request) a due build runs on this worker's build thread and
+        the call returns straight away, so a request never scans the whole tables; until the
+        first build lands the index is empty and not ``ready``.
+        """
+        if self._build_due():
+            if not background:
+                self.build()
+                return
+            self._start_build()
+            if not self.ready:
+                return
+        with self._lock:
+            # Checked under the lock so concurrent requests don't all run the same query
+            if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < max_age:
+                return
+            self._apply_updates()
+            self._refreshed_at = time.monotonic()
+
+    def build(self):
+        """Fill fresh structures from a full scan and swap them in"""
+        started = time.monotonic()
+        shadow = copy.copy(self)
+        shadow._lock = threading.RLock()
+        shadow._reset_state()
+        for name, updated, query in shadow._sources():
+            for rows in batched(query.yield_per(BATCH_SIZE), BATCH_SIZE):
+                shadow._apply(name, rows)
+        shadow._finish_build()
+        with self._lock:
+            for name, value in vars(shadow).items():
+                if name not in self._unswapped:
+                    setattr(self, name, value)
+            self._built_at = self._refreshed_at = started
+
+    def _finish_build(self):
+        """Hook run on the fresh structures, off the request path, before they are swapped in"""
+
+    def _start_build(self):
+        """Start a build on this worker's build thread unless one is already running"""
+        with self._lock:
+            if self._build_thread is not None and self._build_thread.is_alive():
+                return
+            app = current_app._get_current_object()
+            self._build_thread = threading.Thread(target=self._build_in_background, args=(app,), daemon=True)
+            self._build_thread.start()
+
+    def _build_in_background(self, app):
+        with app.app_context():
+            try:
+                self.build()
+            except SQLAlchemyError as e:
+                newrelic.agent.record_exception(e)
+            finally:
+                db.session.remove()
+
+    def _apply_updates(self):
+        for name, updated, query in self._sources():
+            watermark = self._watermarks.get(name)
+            if watermark is not None:
+                # Re-applying a row is idempotent, so overlapping the previous window is safe
+                query = query.filter(updated >= watermark - WATERMARK_OVERLAP)
+            for rows in batched(query.all(), BATCH_SIZE):
+                self._apply(name, rows)
+
+    def _apply(self, name, rows):
+        self._apply_rows(name, rows)
+        watermark = self._watermarks.get(name)
+        for row in rows:
+            if row.updated is not None and (watermark is None or row.updated > watermark):
+                watermark = row.updated
+        self._watermarks[name] = watermark
+
+
+class IncrementalSpotIndex(IncrementalIndex):
+    """IncrementalIndex over one query of Spot rows
+
+    Subclasses define _reset(), _spot_rows() (a query whose rows include ``updated``) and
+    _apply_row(row).
+    """
+
+    def _sources(self):
+        yield "spot", Spot.updated, self._spot_rows()
+
+    def _apply_rows(self, name, rows):
+        for row in rows:
+            self._apply_row(row)
@@ -0,0 +1,180 @@
+from app.helpers.geohash import cell, cell_ranges, encode_cell
+from app.models import Spot, db
+from app.services.incremental_index import IncrementalSpotIndex
+
+# Geohash precision used for clusters up to each map zoom level (inclusive). A precision-p cell is
+# roughly an eighth of the viewport at those zooms, so a screen shows a few dozen clusters at most.
+ZOOM_PRECISIONS = [(2, 1), (4, 2), (7, 3), (9, 4), (11, 5)]
+MAX_CLUSTER_ZOOM = ZOOM_PRECISIONS[-1][0]
+# Points are bucketed by precision-4 cell (~20 x 20 miles) so a zoomed-in viewport touches a handful
+POINT_PRECISION = 4
+
+
+def precision_for_zoom(zoom):
+    for max_zoom, precision in ZOOM_PRECISIONS:
+        if zoom <= max_zoom:
+            return precision
+    return None
+
+
+def rank_key(point):
+    """Sort key for "top rated": rating, then number of reviews, then oldest id"""
+    try:
+        rating = float(point["rating"] or 0)
+    except ValueError:
+        rating = 0.0
+    return rating, point["num_reviews"] or 0, -point["id"]
+
+
+class Cluster:
+    """Running count/centroid/top spot for one geohash cell"""
+
+    __slots__ = ("geohash", "members", "lat_sum", "lng_sum", "_top")
+
+    def __init__(self, geohash):
+        self.geohash = geohash
+        self.members = {}
+        self.lat_sum = 0.0
+        self.lng_sum = 0.0
+        self._top = None
+
+    def add(self, point):
+        self.members[point["id"]] = point
+        self.lat_sum += point["latitude"]
+        self.lng_sum += point["longitude"]
+        if self._top is not None and rank_key(point) > rank_key(self._top):
+            self._top = point
+
+    def remove(self, point):
+        self.members.pop(point["id"], None)
+        self.lat_sum -= point["latitude"]
+        self.lng_sum -= point["longitude"]
+        if self._top is not None and self._top["id"] == point["id"]:
+            self._top = None
+
+    def top(self):
+        if self._top is None and self.members:
+            self._top = max(self.members.values(), key=rank_key)
+        return self._top
+
+    def get_dict(self):
+        count = len(self.members)
+        top = self.top()
+        return {
+            "geohash": self.geohash,
+            "count": count,
+            "latitude": self.lat_sum / count,
+            "longitude": self.lng_sum / count,
+            "top_spot": {key: top[key] for key in ("id", "name", "rating", "url")},
+        }
+
+
+class MapClusterIndex(IncrementalSpotIndex):
+    """Per-zoom spot clusters and point buckets for the map viewport endpoint
+
+    Every cluster level is maintained incrementally: a changed spot is subtracted from the
+    cells it was in and added to its new ones, so refreshing only touches rows whose
+    ``updated`` moved since the last refresh.
+    """
+
+    def _reset(self):
+        self._clusters = {precision: {} for _, precision in ZOOM_PRECISIONS}
+        self._buckets = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def _spot_rows(self):
+        return db.session.query(
+            Spot.id,
+            Spot.name,
+            Spot.latitude,
+            Spot.longitude,
+            Spot.rating,
+            Spot.num_reviews,
+            Spot.is_verified,
+            Spot.is_deleted,
+            Spot.updated,
+        )
+
+    def _apply_row(self, row):
+        spot_id, name, latitude, longitude, rating, num_reviews, is_verified, is_deleted, _ = row
+        self.remove(spot_id)
+        if is_verified and not is_deleted and latitude is not None and longitude is not None:
+            self.add(
+                {
+                    "id": spot_id,
+                    "name": name,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "rating": rating,
+                    "num_reviews": num_reviews or 0,
+                    "url": Spot.create_url(spot_id, name),
+                }
+            )
+
+    def add(self, point):
+        with self._lock:
+            self._points[point["id"]] = point
+            for precision, grid in self._clusters.items():
+                key = cell(point["latitude"], point["longitude"], precision)
+                if key not in grid:
+                    grid[key] = Cluster(encode_cell(*key, precision))
+                grid[key].add(point)
+            key = cell(point["latitude"], point["longitude"], POINT_PRECISION)
+            self._buckets.setdefault(key, {})[point["id"]] = point
+
+    def remove(self, spot_id):
+        with self._lock:
+            point = self._points.pop(spot_id, None)
+            if point is None:
+                return
+            for precision, grid in self._clusters.items():
+                key = cell(point["latitude"], point["longitude"], precision)
+                grid[key].remove(point)
+                if not grid[key].members:
+                    del grid[key]
+            key = cell(point["latitude"], point["longitude"], POINT_PRECISION)
+            self._buckets[key].pop(spot_id, None)
+            if not self._buckets[key]:
+                del self._buckets[key]
+
+    @staticmethod
+    def _in_box(grid, precision, south, north, west, east):
+        """Values of grid whose cells touch the box, enumerating whichever side is smaller"""
+        spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+        for span_west, span_east in spans:
+            lat_range, lng_range = cell_ranges(south, north, span_west, span_east, precision)
+            if len(lat_range) * len(lng_range) <= len(grid):
+                for i in lat_range:
+                    for j in lng_range:
+                        if (i, j) in grid:
+                            yield grid[(i, j)]
+            else:
+                for (i, j), value in grid.items():
+                    if i in lat_range and j in lng_range:
+                        yield value
+
+    def clusters(self, west, south, east, north, zoom):
+        """Cluster dicts for every cell at zoom's precision that the viewport touches"""
+        precision = precision_for_zoom(zoom)
+        with self._lock:
+            grid = self._clusters[precision]
+            return [cluster.get_dict() for cluster in self._in_box(grid, precision, south, north, west, east)]
+
+    def points(self, west, south, east, north):
+        """Lightweight point dicts for every spot inside the viewport"""
+        with self._lock:
+            results = []
+            for bucket in self._in_box(self._buckets, POINT_PRECISION, south, north, west, east):
+                for point in bucket.values():
+                    in_lng = (
+                        west <= point["longitude"] <= east if west <= east else not east < point["longitude"] < west
+                    )
+                    if south <= point["latitude"] <= north and in_lng:
+                        results.append(point)
+            return results
+
+
+map_clusters = MapClusterIndex()
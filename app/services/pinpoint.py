@@ -0,0 +1,42 @@
+import boto3
+from flask import current_app
+
+PINPOINT_APPLICATION_ID = "268df0f0464b49609f26f711a800aecd"
+
+
+class StubPinpointClient:
+    """Offline stand-in for the boto3 Pinpoint client
+
+    Records every send_messages call and answers with a per-address result in the same shape
+    Pinpoint uses. ``failures`` maps an address to the DeliveryStatus it should get back, e.g.
+    ``{"token": "TEMPORARY_FAILURE"}``; each entry is consumed on use so a retry then succeeds.
+    """
+
+    def __init__(self, failures=None):
+        self.calls = []
+        self.failures = dict(failures or {})
+
+    def send_messages(self, ApplicationId, MessageRequest):
+        self.calls.append({"ApplicationId": ApplicationId, "MessageRequest": MessageRequest})
+        result = {}
+        for address in MessageRequest.get("Addresses", {}):
+            status = self.failures.pop(address, "SUCCESSFUL")
+            result[address] = {
+                "DeliveryStatus": status,
+                "StatusCode": 200 if status == "SUCCESSFUL" else 500,
+            }
+        return {"MessageResponse": {"ApplicationId": ApplicationId, "Result": result}}
+
+
+stub_client = StubPinpointClient()
+
+
+def get_pinpoint_client():
+    """Pinpoint client for the current app, the shared stub when PINPOINT_CLIENT is 'stub'"""
+    if current_app.config.get("PINPOINT_CLIENT", "boto3") == "stub":
+        return stub_client
+    return boto3.client("pinpoint")
+
+
+def get_application_id():
+    return current_app.config.get("PINPOINT_APPLICATION_ID") or PINPOINT_APPLICATION_ID
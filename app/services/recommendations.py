@@ -0,0 +1,151 @@
+import threading
+
+import numpy as np
+from cachetools import LRUCache
+from sqlalchemy import func
+
+from app import cache
+from app.models import Review, Spot, User, db
+from app.services.geo_arrays import GeoArrays, confidence_scores, haversine, min_distances, top_k
+
+RECS_LIMIT = 25
+RECS_TIMEOUT = 60 * 60
+# Weights of the popularity, confidence and proximity terms, each normalized to [0, 1]
+POPULARITY_WEIGHT = 0.4
+CONFIDENCE_WEIGHT = 0.3
+PROXIMITY_WEIGHT = 0.3
+# Proximity decays as exp(-miles / scale): ~0.37 at 100 miles, ~0.05 at 300
+PROXIMITY_SCALE_MILES = 100.0
+# Coordinates are rounded to this many decimals (~1km) in cache keys
+ORIGIN_PRECISION = 2
+VISITED_CACHE_SIZE = 4096
+
+
+class SpotFeatures(GeoArrays):
+    """Spot coordinates plus the per-spot ranking terms, rebuilt with the coordinates"""
+
+    def __init__(self, query_factory, max_age=300):
+        super().__init__(query_factory, max_age)
+        self.popularity = np.empty(0, dtype=np.float64)
+        self.confidence = np.empty(0, dtype=np.float64)
+
+    def _load(self, rows):
+        num_reviews = [row[4] or 0 for row in rows]
+        popularity = np.log1p(np.asarray(num_reviews, dtype=np.float64))
+        top = popularity.max() if len(popularity) else 0.0
+        self.popularity = popularity / top if top > 0 else popularity
+        self.confidence = np.clip(confidence_scores([row[3] for row in rows], num_reviews) / 5.0, 0.0, 1.0)
+
+
+spot_features = SpotFeatures(
+    lambda: db.session.query(Spot.id, Spot.latitude, Spot.longitude, Spot.rating, Spot.num_reviews).filter(
+        Spot.is_verified.is_not(False),
+        Spot.is_deleted.is_not(True),
+        Spot.latitude.is_not(None),
+        Spot.longitude.is_not(None),
+    )
+)
+
+# user_id -> (version, features build, packed visited bitset over spot_features positions)
+_visited = LRUCache(maxsize=VISITED_CACHE_SIZE)
+_visited_lock = threading.Lock()
+
+
+def get_version(user_id):
+    """Version of the user's reviews, derived from the database so every worker agrees on it
+
+    Adding or deleting a review changes the count, and moving one to another spot bumps its
+    ``updated``, so cached recommendations never outlive the reviews they were built from.
+    """
+    count, last_updated = (
+        db.session.query(func.count(Review.id), func.max(Review.updated)).filter(Review.author_id == user_id).one()
+    )
+    return f"{count}:{last_updated.isoformat() if last_updated else ''}"
+
+
+def visited_bitset(user_id, version=None):
+    """Packed bitset of the spot_features positions the user has reviewed
+
+    Built with one query of the user's reviewed spot ids and kept until the user's version or
+    the feature arrays change.
+    """
+    spot_features.refresh()
+    version = get_version(user_id) if version is None else version
+    with _visited_lock:
+        entry = _visited.get(user_id)
+    if entry is not None and entry[:2] == (version, spot_features.build):
+        return entry[2]
+    rows = db.session.query(Review.beach_id).filter(Review.author_id == user_id).distinct()
+    mask = np.zeros(len(spot_features), dtype=bool)
+    mask[spot_features.positions(row.beach_id for row in rows)] = True
+    bits = np.packbits(mask)
+    with _visited_lock:
+        _visited[user_id] = (version, spot_features.build, bits)
+    return bits
+
+
+def _visited_mask(bits):
+    return np.unpackbits(bits, count=len(spot_features)).astype(bool)
+
+
+def visited_distances(mask):
+    """Miles from every loaded spot to the closest spot the user has visited, None if they have none
+
+    Unlike the distance to one central point, this keeps spots near each area the user dives in
+    close, e.g. for someone with logs in both Hawaii and Florida.
+    """
+    if not mask.any():
+        return None
+    return min_distances(
+        spot_features.latitudes[mask],
+        spot_features.longitudes[mask],
+        spot_features.latitudes,
+        spot_features.longitudes,
+    )
+
+
+def score_spots(mask, miles=None):
+    """Score every loaded spot, given its miles from the user (if known), -inf for the ones already visited"""
+    weights = POPULARITY_WEIGHT + CONFIDENCE_WEIGHT
+    scores = POPULARITY_WEIGHT * spot_features.popularity + CONFIDENCE_WEIGHT * spot_features.confidence
+    if miles is not None:
+        scores = scores + PROXIMITY_WEIGHT * np.exp(-miles / PROXIMITY_SCALE_MILES)
+        weights += PROXIMITY_WEIGHT
+    scores = scores / weights
+    scores[mask] = -np.inf
+    return scores
+
+
+def recommend_spot_ids(user_id, latitude=None, longitude=None, limit=RECS_LIMIT):
+    """Ids of the best spots the user hasn't reviewed, best first
+
+    Spots are ranked by popularity, confidence and proximity to the given location, else the
+    user's home location, else the closest spot they have reviewed. Results are cached
+    per user, location and review version, so a user's new or deleted reviews show up at once.
+    """
+    version = get_version(user_id)
+    if latitude is not None and longitude is not None:
+        latitude, longitude = round(float(latitude), ORIGIN_PRECISION), round(float(longitude), ORIGIN_PRECISION)
+    else:
+        latitude = longitude = None
+    cache_key = f"recs:{user_id}:{version}:{latitude}:{longitude}:{limit}"
+    ids = cache.get(cache_key)
+    if ids is not None:
+        return ids
+
+    mask = _visited_mask(visited_bitset(user_id, version))
+    origin = (latitude, longitude) if latitude is not None else None
+    if origin is None:
+        user = db.session.query(User.latitude, User.longitude).filter(User.id == user_id).first()
+        if user and user.latitude is not None and user.longitude is not None:
+            origin = (user.latitude, user.longitude)
+    if origin is not None:
+        miles = haversine(origin[0], origin[1], spot_features.latitudes, spot_features.longitudes)
+    else:
+        miles = visited_distances(mask)
+
+    scores = score_spots(mask, miles)
+    order = [i for i in top_k(scores, limit, largest=True) if np.isfinite(scores[i])]
+    ids = [int(spot_features.ids[i]) for i in order]
+    cache.set(cache_key, ids, timeout=RECS_TIMEOUT)
+    return ids
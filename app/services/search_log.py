@@ -0,0 +1,201 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import newrelic.agent
+from flask import Response, current_app, request
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.helpers.normalize_text import normalize_text
+from app.models import SearchQuery, db
+
+MAX_TEXT_LENGTH = 200
+# (label, longest normalized length in the bucket)
+LENGTH_BUCKETS = [("0", 0), ("1-2", 2), ("3-5", 5), ("6-10", 10), ("11-20", 20)]
+# Queries with this many words or more share a shape
+MAX_WORDS = 4
+
+
+def result_count(rv):
+    """Length of the "data" list in a view's return value, whether a dict or a built response"""
+    if isinstance(rv, tuple):
+        rv = rv[0]
+    if isinstance(rv, Response):
+        rv = rv.get_json(silent=True)
+    return len(rv.get("data") or []) if isinstance(rv, dict) else 0
+
+
+def query_shape(normalized):
+    """Coarse shape of a normalized query, such as "2 words, 6-10 chars", to group latencies by"""
+    words = min(len(normalized.split()), MAX_WORDS)
+    words_label = f"{words}{'+' if words == MAX_WORDS else ''} word{'' if words == 1 else 's'}"
+    length_label = next((label for label, high in LENGTH_BUCKETS if len(normalized) <= high), "21+")
+    return f"{words_label}, {length_label} chars"
+
+
+class SearchQueryLog:
+    """Buffered recorder of search requests, so logging a keystroke never waits on the database
+
+    record() only appends to an in-memory buffer. A daemon thread per worker writes the buffer
+    as one multi-row insert every ``flush_interval`` seconds, or as soon as ``batch_size`` rows
+    are waiting. The buffer keeps the newest ``max_buffer`` rows if the database falls behind and
+    counts the rest in ``dropped``. With a flush interval of 0 no thread is started and rows are
+    only written by calling flush().
+    """
+
+    def __init__(self, batch_size=200, max_buffer=10000):
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._buffer = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher_pid = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def record(self, endpoint, query, result_count, started):
+        """Buffer one request; started is its time.perf_counter() at the start of the request"""
+        latency_ms = (time.perf_counter() - started) * 1000
+        if not current_app.config.get("SEARCH_LOG_ENABLED", True):
+            return
+        text = (query or "")[:MAX_TEXT_LENGTH]
+        normalized = normalize_text(text)
+        row = {
+            "endpoint": endpoint,
+            "text": text,
+            "normalized": normalized,
+            "shape": query_shape(normalized),
+            "result_count": result_count,
+            "latency_ms": round(latency_ms, 2),
+            "created": datetime.utcnow(),
+        }
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(row)
+            waiting = len(self._buffer)
+        self._start_flusher(current_app.config.get("SEARCH_LOG_FLUSH_SECONDS", 10))
+        if waiting >= self.batch_size:
+            self._wake.set()
+
+    def logged(self, endpoint, query_arg):
+        """Decorator recording every call of a view under endpoint, with the query from query_arg
+
+        Goes above @cache.cached, so cache hits are recorded too, with the latency the client saw.
+        """
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                rv = view(*args, **kwargs)
+                self.record(endpoint, request.args.get(query_arg), result_count(rv), started)
+                return rv
+
+            return wrapper
+
+        return decorator
+
+    def flush(self):
+        """Write every buffered row in one insert and return how many were written"""
+        with self._lock:
+            rows = list(self._buffer)
+            self._buffer.clear()
+        if not rows:
+            return 0
+        try:
+            db.session.execute(SearchQuery.__table__.insert(), rows)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            newrelic.agent.record_exception(e)
+            with self._lock:
+                self.dropped += len(rows)
+            return 0
+        return len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
+            self.dropped = 0
+
+    def _start_flusher(self, interval):
+        """Start this process's flush thread once (again after a fork, which doesn't copy threads)"""
+        if not interval or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        app = current_app._get_current_object()
+        threading.Thread(target=self._flush_forever, args=(app, interval), daemon=True).start()
+
+    def _flush_forever(self, app, interval):
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            with app.app_context():
+                self.flush()
+                db.session.remove()
+
+
+def search_report(days=7, limit=25):
+    """Top zero-result queries and slowest query shapes over the last ``days`` days"""
+    since = datetime.utcnow() - timedelta(days=days)
+    zero_results = (
+        db.session.query(
+            SearchQuery.endpoint,
+            SearchQuery.normalized,
+            func.count(SearchQuery.id).label("count"),
+            func.max(SearchQuery.created).label("last_seen"),
+        )
+        .filter(SearchQuery.created >= since, SearchQuery.result_count == 0, SearchQuery.normalized != "")
+        .group_by(SearchQuery.endpoint, SearchQuery.normalized)
+        .order_by(func.count(SearchQuery.id).desc(), SearchQuery.normalized)
+        .limit(limit)
+    )
+    slowest_shapes = (
+        db.session.query(
+            SearchQuery.endpoint,
+            SearchQuery.shape,
+            func.count(SearchQuery.id).label("count"),
+            func.avg(SearchQuery.latency_ms).label("avg_ms"),
+            func.max(SearchQuery.latency_ms).label("max_ms"),
+            func.sum(db.case((SearchQuery.result_count == 0, 1), else_=0)).label("zero_results"),
+        )
+        .filter(SearchQuery.created >= since)
+        .group_by(SearchQuery.endpoint, SearchQuery.shape)
+        .order_by(func.avg(SearchQuery.latency_ms).desc())
+        .limit(limit)
+    )
+    return {
+        "since": since.isoformat(),
+        "zero_results": [
+            {
+                "endpoint": row.endpoint,
+                "query": row.normalized,
+                "count": row.count,
+                "last_seen": row.last_seen.isoformat(),
+            }
+            for row in zero_results
+        ],
+        "slowest_shapes": [
+            {
+                "endpoint": row.endpoint,
+                "shape": row.shape,
+                "count": row.count,
+                "avg_ms": round(row.avg_ms, 2),
+                "max_ms": row.max_ms,
+                "zero_result_rate": round(row.zero_results / row.count, 3),
+            }
+            for row in slowest_shapes
+        ],
+    }
+
+
+search_log = SearchQueryLog()
@@ -0,0 +1,253 @@
+import fnmatch
+import threading
+import time
+
+import newrelic.agent
+import redis
+from flask_caching.backends.rediscache import RedisCache
+from redis.exceptions import RedisError
+
+
+def _deadline(seconds):
+    return time.monotonic() + seconds
+
+
+class FakeRedis:
+    """In-process stand-in for a Redis server, for tests and single-process development
+
+    Implements the commands the cache backend uses with Redis' semantics (bytes values, TTLs in
+    seconds, ``nx`` sets). Every app in the process that points at ``fake://`` shares one
+    instance, the way gunicorn workers share one server. Set ``down`` to make every command
+    raise ConnectionError, as an unreachable server would.
+    """
+
+    def __init__(self):
+        self.down = False
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def _check(self):
+        if self.down:
+            raise redis.exceptions.ConnectionError("Fake Redis server is down")
+
+    def _live(self, name):
+        """Drop name if it has expired; whether it exists"""
+        expires = self._expires.get(name)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+        return name in self._data
+
+    def ping(self):
+        self._check()
+        return True
+
+    def get(self, name):
+        with self._lock:
+            self._check()
+            return self._data[name] if self._live(name) else None
+
+    def mget(self, keys, *args):
+        names = [keys, *args] if isinstance(keys, (str, bytes)) else [*keys, *args]
+        return [self.get(name) for name in names]
+
+    def set(self, name, value, ex=None, px=None, nx=False, xx=False):
+        with self._lock:
+            self._check()
+            exists = self._live(name)
+            if (nx and exists) or (xx and not exists):
+                return None
+            self._data[name] = self._encode(value)
+            self._expires.pop(name, None)
+            if ex is not None or px is not None:
+                self._expires[name] = _deadline(ex if ex is not None else px / 1000)
+            return True
+
+    def setex(self, name, time, value):
+        return self.set(name, value, ex=time)
+
+    def setnx(self, name, value):
+        return bool(self.set(name, value, nx=True))
+
+    def expire(self, name, time):
+        with self._lock:
+            self._check()
+            if not self._live(name):
+                return False
+            self._expires[name] = _deadline(time)
+            return True
+
+    def ttl(self, name):
+        with self._lock:
+            self._check()
+            if not self._live(name):
+                return -2
+            expires = self._expires.get(name)
+            return -1 if expires is None else max(round(expires - time.monotonic()), 0)
+
+    def exists(self, *names):
+        with self._lock:
+            self._check()
+            return sum(1 for name in names if self._live(name))
+
+    def delete(self, *names):
+        with self._lock:
+            self._check()
+            deleted = 0
+            for name in names:
+                if self._live(name):
+                    deleted += 1
+                self._data.pop(name, None)
+                self._expires.pop(name, None)
+            return deleted
+
+    unlink = delete
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._check()
+            value = int(self._data[name]) + amount if self._live(name) else amount
+            self._data[name] = self._encode(value)
+            return value
+
+    def keys(self, pattern="*"):
+        with self._lock:
+            self._check()
+            return [name for name in list(self._data) if self._live(name) and fnmatch.fnmatchcase(name, pattern)]
+
+    def flushdb(self):
+        with self._lock:
+            self._check()
+            self._data.clear()
+            self._expires.clear()
+            return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands and runs them in order on execute(), like redis-py's Pipeline"""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+fake_redis = FakeRedis()
+
+
+def redis_client(config):
+    """Client for CACHE_REDIS_URL: the shared FakeRedis for ``fake://``, otherwise a pooled redis.Redis
+
+    The pool blocks for at most CACHE_REDIS_POOL_TIMEOUT seconds when all of a worker's
+    CACHE_REDIS_MAX_CONNECTIONS are busy, and commands time out after
+    CACHE_REDIS_SOCKET_TIMEOUT, so a slow server costs a request a bounded wait.
+    """
+    url = config.get("CACHE_REDIS_URL") or "redis://localhost:6379/0"
+    if url.startswith("fake://"):
+        return fake_redis
+    pool = redis.BlockingConnectionPool.from_url(
+        url,
+        max_connections=config.get("CACHE_REDIS_MAX_CONNECTIONS", 20),
+        timeout=config.get("CACHE_REDIS_POOL_TIMEOUT", 0.5),
+        socket_timeout=config.get("CACHE_REDIS_SOCKET_TIMEOUT", 0.25),
+        socket_connect_timeout=config.get("CACHE_REDIS_CONNECT_TIMEOUT", 0.25),
+        health_check_interval=30,
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+class SharedRedisCache(RedisCache):
+    """Flask-Caching backend on a Redis server shared by every worker, that fails open
+
+    Select it with ``CACHE_TYPE = "app.services.shared_cache.SharedRedisCache"``. With
+    ``fail_open`` a Redis error is recorded and the call answers like a miss (get returns None,
+    set returns False), so @cache.cached routes fall through to the database instead of
+    returning 500s. After an error the server is left alone for ``retry_after`` seconds, so an
+    outage costs one timeout per worker per window rather than one per cache call.
+    """
+
+    def __init__(self, *args, fail_open=True, retry_after=5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_open = fail_open
+        self.retry_after = retry_after
+        self.errors = 0
+        self._down_until = 0
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            host=redis_client(config),
+            key_prefix=config.get("CACHE_KEY_PREFIX"),
+            fail_open=config.get("CACHE_FAIL_OPEN", True),
+            retry_after=config.get("CACHE_REDIS_RETRY_SECONDS", 5),
+        )
+        return cls(*args, **kwargs)
+
+    def _guard(self, default, method, *args, **kwargs):
+        """method(*args, **kwargs), or default if Redis is failing and the cache fails open"""
+        if self.fail_open and time.monotonic() < self._down_until:
+            return default
+        try:
+            return method(*args, **kwargs)
+        except RedisError as e:
+            if not self.fail_open:
+                raise
+            self.errors += 1
+            self._down_until = time.monotonic() + self.retry_after
+            newrelic.agent.record_exception(e)
+            return default
+
+    def get(self, key):
+        return self._guard(None, super().get, key)
+
+    def get_many(self, *keys):
+        return self._guard([None] * len(keys), super().get_many, *keys)
+
+    def set(self, key, value, timeout=None):
+        return self._guard(False, super().set, key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        return self._guard(False, super().add, key, value, timeout)
+
+    def set_many(self, mapping, timeout=None):
+        return self._guard([], super().set_many, mapping, timeout)
+
+    def delete(self, key):
+        return self._guard(False, super().delete, key)
+
+    def delete_many(self, *keys):
+        return self._guard([], super().delete_many, *keys)
+
+    def has(self, key):
+        return self._guard(False, super().has, key)
+
+    def clear(self):
+        return self._guard(False, super().clear)
+
+    def inc(self, key, delta=1):
+        return self._guard(None, super().inc, key, delta)
+
+    def dec(self, key, delta=1):
+        return self._guard(None, super().dec, key, delta)
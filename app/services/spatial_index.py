@@ -0,0 +1,193 @@
+import heapq
+import math
+
+from app.helpers.distance import DEGREES_PER_RADIAN, MILES_PER_DEGREE
+from app.models import Spot, db
+from app.services.incremental_index import IncrementalSpotIndex
+
+
+class SpotSpatialIndex(IncrementalSpotIndex):
+    """In-process lat/lng grid over verified spots for k-nearest and radius lookups
+
+    Kept current from ``updated`` like every IncrementalSpotIndex; ids can still lag a hard
+    delete until the next rebuild, so callers should re-check them against the database.
+    """
+
+    def __init__(self, cell_size=0.5, rebuild_interval=3600):
+        self.cell_size = cell_size
+        super().__init__(rebuild_interval)
+
+    def _reset(self):
+        self._cells = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    @staticmethod
+    def is_indexable(is_verified, is_deleted, latitude, longitude):
+        return bool(is_verified) and not is_deleted and latitude is not None and longitude is not None
+
+    def _cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def add(self, spot_id, latitude, longitude):
+        with self._lock:
+            self.remove(spot_id)
+            cos_lat = math.cos(latitude / DEGREES_PER_RADIAN)
+            cell = self._cell(latitude, longitude)
+            self._cells.setdefault(cell, {})[spot_id] = (latitude, longitude, cos_lat)
+            self._points[spot_id] = cell
+
+    def remove(self, spot_id):
+        with self._lock:
+            cell = self._points.pop(spot_id, None)
+            if cell is None:
+                return
+            members = self._cells.get(cell)
+            members.pop(spot_id, None)
+            if not members:
+                del self._cells[cell]
+
+    def _spot_rows(self):
+        return db.session.query(
+            Spot.id,
+            Spot.latitude,
+            Spot.longitude,
+            Spot.is_verified,
+            Spot.is_deleted,
+            Spot.updated,
+        )
+
+    def _apply_row(self, row):
+        spot_id, latitude, longitude, is_verified, is_deleted, _ = row
+        if self.is_indexable(is_verified, is_deleted, latitude, longitude):
+            self.add(spot_id, latitude, longitude)
+        else:
+            self.remove(spot_id)
+
+    def _row_cos_bound(self, row_lo, row_hi):
+        """Smallest cos(latitude) any point in rows row_lo..row_hi can have"""
+        lat_lo = row_lo * self.cell_size
+        lat_hi = (row_hi + 1) * self.cell_size
+        max_abs = min(90.0, max(abs(lat_lo), abs(lat_hi)))
+        return max(0.0, math.cos(max_abs / DEGREES_PER_RADIAN))
+
+    def _ring_bound(self, row, r):
+        """Lower bound (miles) on the distance to any point outside rings 0..r"""
+        if r == 0:
+            return 0.0
+        cos_bound = self._row_cos_bound(row - r, row + r)
+        return MILES_PER_DEGREE * r * self.cell_size * cos_bound
+
+    def _ring(self, row, col, r):
+        if r == 0:
+            yield (row, col)
+            return
+        for j in range(col - r, col + r + 1):
+            yield (row - r, j)
+            yield (row + r, j)
+        for i in range(row - r + 1, row + r):
+            yield (i, col - r)
+            yield (i, col + r)
+
+    def _cell_bound(self, cell, latitude, longitude):
+        """Lower bound (miles) on the distance from the origin to any point in cell"""
+        row, col = cell
+        lat_lo, lat_hi = row * self.cell_size, (row + 1) * self.cell_size
+        lng_lo, lng_hi = col * self.cell_size, (col + 1) * self.cell_size
+        dlat = max(lat_lo - latitude, 0.0, latitude - lat_hi)
+        dlng = max(lng_lo - longitude, 0.0, longitude - lng_hi)
+        cos_bound = self._row_cos_bound(row, row)
+        return MILES_PER_DEGREE * math.sqrt(dlat**2 + (dlng * cos_bound) ** 2)
+
+    def _scan_cell(self, cell, latitude, longitude, exclude_id, visit):
+        for spot_id, (spot_lat, spot_lng, cos_lat) in self._cells.get(cell, {}).items():
+            if spot_id == exclude_id:
+                continue
+            distance = math.sqrt(
+                (MILES_PER_DEGREE * (spot_lat - latitude)) ** 2
+                + (MILES_PER_DEGREE * (spot_lng - longitude) * cos_lat) ** 2
+            )
+            visit(distance, spot_id)
+
+    def nearest(self, latitude, longitude, k=25, exclude_id=None):
+        """Return [(distance, spot_id)] for the k closest spots, closest first"""
+        with self._lock:
+            if not self._cells or k <= 0:
+                return []
+            heap = []
+
+            def visit(distance, spot_id):
+                if len(heap) < k:
+                    heapq.heappush(heap, (-distance, -spot_id))
+                elif -heap[0][0] > distance:
+                    heapq.heapreplace(heap, (-distance, -spot_id))
+
+            row, col = self._cell(latitude, longitude)
+            visited = set()
+            r = 0
+            while True:
+                # Once the ring covers more cells than are occupied, walking occupied cells is cheaper
+                if (2 * r + 1) ** 2 > len(self._cells):
+                    break
+                for cell in self._ring(row, col, r):
+                    if cell in self._cells:
+                        visited.add(cell)
+                        self._scan_cell(cell, latitude, longitude, exclude_id, visit)
+                if len(visited) == len(self._cells):
+                    return self._sorted(heap)
+                if len(heap) == k and -heap[0][0] <= self._ring_bound(row, r):
+                    return self._sorted(heap)
+                r += 1
+
+            remaining = [
+                (self._cell_bound(cell, latitude, longitude), cell) for cell in self._cells if cell not in visited
+            ]
+            remaining.sort()
+            for bound, cell in remaining:
+                if len(heap) == k and -heap[0][0] <= bound:
+                    break
+                self._scan_cell(cell, latitude, longitude, exclude_id, visit)
+            return self._sorted(heap)
+
+    def within(self, latitude, longitude, radius, exclude_id=None):
+        """Return [(distance, spot_id)] for every spot within radius miles, closest first"""
+        with self._lock:
+            results = []
+
+            def visit(distance, spot_id):
+                if distance <= radius:
+                    results.append((distance, spot_id))
+
+            row, col = self._cell(latitude, longitude)
+            row_span = int(radius / (MILES_PER_DEGREE * self.cell_size)) + 1
+            cos_bound = self._row_cos_bound(row - row_span, row + row_span)
+            if cos_bound > 0:
+                col_span = int(radius / (MILES_PER_DEGREE * self.cell_size * cos_bound)) + 1
+            else:
+                col_span = None
+            if col_span is not None and (2 * row_span + 1) * (2 * col_span + 1) <= len(self._cells):
+                candidates = (
+                    (i, j)
+                    for i in range(row - row_span, row + row_span + 1)
+                    for j in range(col - col_span, col + col_span + 1)
+                    if (i, j) in self._cells
+                )
+            else:
+                candidates = list(self._cells)
+            for cell in candidates:
+                if self._cell_bound(cell, latitude, longitude) <= radius:
+                    self._scan_cell(cell, latitude, longitude, exclude_id, visit)
+            results.sort()
+            return results
+
+    @staticmethod
+    def _sorted(heap):
+        return sorted((-distance, -spot_id) for distance, spot_id in heap)
+
+
+spot_index = SpotSpatialIndex()
@@ -0,0 +1,169 @@
+import re
+
+from app.models import Review, Spot, Tag, db, tags
+from app.services.incremental_index import IncrementalSpotIndex
+
+# (label, lower bound, upper bound) in meters
+DEPTH_BUCKETS = [("0-10m", 0, 10), ("10-20m", 10, 20), ("20-30m", 20, 30), ("30m+", 30, None)]
+# Cumulative, "4+" counts every spot rated 4 or better
+RATING_BUCKETS = [("4+", 4), ("3+", 3), ("2+", 2), ("1+", 1)]
+FACETS = ("difficulty", "entry", "max_depth", "rating", "activity")
+FEET_PER_METER = 3.28084
+DEPTH_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(ft|feet|')?", re.IGNORECASE)
+# Bound parameter lists when reloading tags and review activity for changed spots
+CHUNK_SIZE = 500
+
+
+def bitset(ids):
+    """Int with bit n set for every id n"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for id in ids:
+        buffer[id >> 3] |= 1 << (id & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def depth_bucket(max_depth):
+    """DEPTH_BUCKETS label for a free-text depth such as "18", "18m" or "60 ft", or None"""
+    match = DEPTH_PATTERN.search(max_depth or "")
+    if not match:
+        return None
+    meters = float(match.group(1)) / (FEET_PER_METER if match.group(2) else 1)
+    for label, low, high in DEPTH_BUCKETS:
+        if meters >= low and (high is None or meters < high):
+            return label
+    return None
+
+
+def rating_buckets(rating):
+    try:
+        rating = float(rating)
+    except (TypeError, ValueError):
+        return []
+    return [label for label, low in RATING_BUCKETS if rating >= low]
+
+
+class SpotFacetIndex(IncrementalSpotIndex):
+    """Per-facet-value bitsets over spot ids, for filter counts without a query per value
+
+    A spot is bit ``spot.id`` of every (facet, value) it has: its difficulty, the short names of
+    its tags, its max depth bucket, the rating buckets it clears and the activity types of its
+    public reviews. Counting a value inside a result set is one AND and a popcount. Refreshes
+    reload the spots whose ``updated`` moved (adding or deleting a review bumps it); tag changes
+    don't, so they wait for the periodic rebuild.
+    """
+
+    def _reset(self):
+        self._members = {facet: {} for facet in FACETS}
+        self._bits = {facet: {} for facet in FACETS}
+        # (facet, value) pairs whose bitset is behind _members, rebuilt by _sync_bits
+        self._dirty = set()
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, spot_id, values):
+        """Index a spot under [(facet, value)], replacing what it had"""
+        with self._lock:
+            if self._values.get(spot_id) == values:
+                return
+            self.remove(spot_id)
+            for facet, value in values:
+                self._members[facet].setdefault(value, set()).add(spot_id)
+                self._dirty.add((facet, value))
+            self._values[spot_id] = values
+
+    def remove(self, spot_id):
+        with self._lock:
+            values = self._values.pop(spot_id, None)
+            if values is None:
+                return
+            for facet, value in values:
+                members = self._members[facet][value]
+                members.discard(spot_id)
+                if not members:
+                    del self._members[facet][value]
+                self._dirty.add((facet, value))
+
+    def _sync_bits(self):
+        """Rebuild the bitsets of changed values, each once through bitset()'s bytearray
+
+        Setting bits on the ints one spot at a time would copy the whole int for every change.
+        """
+        for facet, value in self._dirty:
+            members = self._members[facet].get(value)
+            if members:
+                self._bits[facet][value] = bitset(members)
+            else:
+                self._bits[facet].pop(value, None)
+        self._dirty = set()
+
+    def _finish_build(self):
+        # A build marks every value dirty; turn them into bitsets before requests can see them
+        self._sync_bits()
+
+    def counts(self, ids, selected=None):
+        """{facet: {value: count}} over the spots in ids, leaving out zero counts
+
+        selected is the {facet: value} filters the caller already applied to ids' query, minus
+        any facet filters: each facet's counts apply every selected filter except its own, so
+        picking "beginner" still shows how many "advanced" spots there are.
+        """
+        scope = bitset(ids)
+        with self._lock:
+            self._sync_bits()
+            filters = {facet: self._bits[facet].get(value, 0) for facet, value in (selected or {}).items() if value}
+            output = {}
+            for facet in FACETS:
+                facet_scope = scope
+                for other, bits in filters.items():
+                    if other != facet:
+                        facet_scope &= bits
+                output[facet] = {
+                    value: count
+                    for value, bits in self._bits[facet].items()
+                    if (count := (facet_scope & bits).bit_count())
+                }
+        return output
+
+    def _spot_rows(self):
+        return db.session.query(Spot.id, Spot.difficulty, Spot.max_depth, Spot.rating, Spot.updated)
+
+    def _apply_rows(self, name, rows):
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = rows[start : start + CHUNK_SIZE]
+            related = self._related_values([row.id for row in chunk])
+            for row in chunk:
+                values = related.get(row.id, set())
+                if row.difficulty:
+                    values.add(("difficulty", row.difficulty))
+                bucket = depth_bucket(row.max_depth)
+                if bucket:
+                    values.add(("max_depth", bucket))
+                values.update(("rating", label) for label in rating_buckets(row.rating))
+                self.add(row.id, frozenset(values))
+
+    def _related_values(self, spot_ids):
+        """{spot id: {(facet, value)}} for entry tags and review activity types"""
+        values = {}
+        tag_rows = (
+            db.session.query(tags.c.spot_id, Tag.short_name)
+            .join(Tag, Tag.id == tags.c.tag_id)
+            .filter(tags.c.spot_id.in_(spot_ids))
+        )
+        for spot_id, short_name in tag_rows:
+            values.setdefault(spot_id, set()).add(("entry", short_name))
+        activity_rows = (
+            db.session.query(Review.beach_id, Review.activity_type)
+            .filter(Review.beach_id.in_(spot_ids), Review.activity_type.isnot(None), Review.is_private.isnot(True))
+            .distinct()
+        )
+        for spot_id, activity_type in activity_rows:
+            values.setdefault(spot_id, set()).add(("activity", activity_type))
+        return values
+
+
+spot_facets = SpotFacetIndex()
@@ -0,0 +1,163 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask_caching.backends.base import BaseCache
+
+
+class TwoTierCache(BaseCache):
+    """Per-worker LRU (L1) in front of another Flask-Caching backend (L2)
+
+    Reads try the L1 first and fill it from L2 hits; writes and deletes go to both. L1 entries
+    are pickled, so callers never share a mutable object, and live at most ``timeout`` seconds,
+    which bounds how long a write or tag purge made by another worker can go unseen here. The
+    L1 holds at most ``max_entries`` entries and ``max_bytes`` of pickled values, evicting the
+    least recently used. Hot keys such as /loc/us then skip the round trip to a shared L2.
+    """
+
+    def __init__(self, l2, max_entries=2000, max_bytes=32 * 1024 * 1024, timeout=5):
+        super().__init__(default_timeout=l2.default_timeout)
+        self.l2 = l2
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._entries = OrderedDict()  # key -> (expires at, pickled value)
+        self._bytes = 0
+        self._counts = {"l1": {"hits": 0, "misses": 0}, "l2": {"hits": 0, "misses": 0}}
+        self._since = datetime.utcnow()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, l2, config):
+        return cls(
+            l2,
+            max_entries=config.get("CACHE_L1_MAX_ENTRIES", 2000),
+            max_bytes=config.get("CACHE_L1_MAX_BYTES", 32 * 1024 * 1024),
+            timeout=config.get("CACHE_L1_TIMEOUT", 5),
+        )
+
+    def _local_get(self, key):
+        """(found, value) from the L1"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._counts["l1"]["hits"] += 1
+                return True, pickle.loads(entry[1])
+            if entry is not None:
+                self._discard(key)
+            self._counts["l1"]["misses"] += 1
+        return False, None
+
+    def _local_set(self, key, value, timeout=None):
+        timeout = self._normalize_timeout(timeout)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._discard(key)
+            if len(data) > self.max_bytes:
+                return
+            self._entries[key] = (time.monotonic() + min(timeout or self.timeout, self.timeout), data)
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _local_delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._discard(key)
+
+    def _count_l2(self, value):
+        with self._lock:
+            self._counts["l2"]["hits" if value is not None else "misses"] += 1
+
+    def get(self, key):
+        found, value = self._local_get(key)
+        if found:
+            return value
+        value = self.l2.get(key)
+        self._count_l2(value)
+        if value is not None:
+            self._local_set(key, value)
+        return value
+
+    def get_many(self, *keys):
+        values = {}
+        for key in keys:
+            found, value = self._local_get(key)
+            if found:
+                values[key] = value
+        missing = [key for key in keys if key not in values]
+        if missing:
+            for key, value in zip(missing, self.l2.get_many(*missing)):
+                self._count_l2(value)
+                if value is not None:
+                    self._local_set(key, value)
+                values[key] = value
+        return [values[key] for key in keys]
+
+    def has(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return True
+        return self.l2.has(key)
+
+    def set(self, key, value, timeout=None):
+        result = self.l2.set(key, value, timeout)
+        self._local_set(key, value, timeout)
+        return result
+
+    def add(self, key, value, timeout=None):
+        created = self.l2.add(key, value, timeout)
+        if created:
+            self._local_set(key, value, timeout)
+        else:
+            self._local_delete(key)
+        return created
+
+    def set_many(self, mapping, timeout=None):
+        result = self.l2.set_many(mapping, timeout)
+        for key, value in mapping.items():
+            self._local_set(key, value, timeout)
+        return result
+
+    def delete(self, key):
+        self._local_delete(key)
+        return self.l2.delete(key)
+
+    def delete_many(self, *keys):
+        self._local_delete(*keys)
+        return self.l2.delete_many(*keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        return self.l2.clear()
+
+    def inc(self, key, delta=1):
+        # Counters only make sense in the shared tier
+        self._local_delete(key)
+        return self.l2.inc(key, delta)
+
+    def dec(self, key, delta=1):
+        self._local_delete(key)
+        return self.l2.dec(key, delta)
+
+    def stats(self):
+        """Hit and miss counts per tier since the worker started, plus the L1's size"""
+        with self._lock:
+            tiers = {tier: dict(counts) for tier, counts in self._counts.items()}
+            tiers["l1"].update(entries=len(self._entries), bytes=self._bytes)
+        for counts in tiers.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / lookups, 3) if lookups else None
+        return {"since": self._since.isoformat(), "backend": type(self.l2).__name__, **tiers}
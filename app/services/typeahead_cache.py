@@ -0,0 +1,102 @@
+import threading
+from datetime import datetime
+
+from cachetools import LRUCache
+
+from app.helpers.normalize_text import normalize_text
+from app.services.typeahead_index import GRAM_SIZE, rank_entries, typeahead_index
+
+# Queries this long or longer share one stats bucket
+MAX_STATS_LENGTH = 10
+
+
+def can_narrow(prefix, query):
+    """Whether every match for query is also a match for the shorter prefix
+
+    Queries of GRAM_SIZE or more match anywhere in a name, shorter ones only at the start of a
+    word. So "ma" can be answered from "m" and "maui" from "mau", but not "mau" from "ma": "Kamau"
+    matches "mau" and not "ma", because crossing GRAM_SIZE widens the match.
+    """
+    return query.startswith(prefix) and (len(prefix) >= GRAM_SIZE or len(query) < GRAM_SIZE)
+
+
+class TypeaheadCache:
+    """Per-worker cache of ranked typeahead entries that answers longer queries from shorter ones
+
+    Typing "m", "ma", "mau", "maui" makes four requests. When a shorter prefix's cached result
+    was complete (no kind hit its KIND_LIMITS cut), every match for the longer query is in it, so
+    the longer query is answered by re-ranking that list instead of searching the index. Entries
+    carry the index generation they were built from and are ignored once the index changes.
+    """
+
+    def __init__(self, index, maxsize=10000):
+        self.index = index
+        self._results = LRUCache(maxsize=maxsize)
+        self._stats = {}
+        self._since = datetime.utcnow()
+        self._lock = threading.Lock()
+
+    def _cached(self, query, beach_only, generation):
+        """(entries, complete, outcome) from the cache, or None"""
+        with self._lock:
+            cached = self._results.get((beach_only, query))
+            if cached is not None and cached[0] == generation:
+                return cached[1], cached[2], "hit"
+            for length in range(len(query) - 1, 0, -1):
+                prefix = query[:length]
+                if not can_narrow(prefix, query):
+                    continue
+                cached = self._results.get((beach_only, prefix))
+                if cached is not None and cached[0] == generation and cached[2]:
+                    entries, complete = rank_entries(query, [entry for entry in cached[1] if entry.is_candidate(query)])
+                    return entries, complete, "prefix_hit"
+        return None
+
+    def search(self, query, beach_only=False, origin=None):
+        """(results, outcome) for a query, where outcome is "hit", "prefix_hit" or "miss"
+
+        Entries are cached in text order. An origin re-ranks a complete list; a list cut at the
+        per-kind limits may be missing nearby matches, so that goes back to the index.
+        """
+        query = normalize_text(query)
+        if not query:
+            return [], "miss"
+        generation = self.index.generation
+        cached = self._cached(query, beach_only, generation)
+        if cached is None:
+            entries, complete = self.index.ranked(query, beach_only)
+            outcome = "miss"
+        else:
+            entries, complete, outcome = cached
+        if outcome != "hit":
+            with self._lock:
+                self._results[(beach_only, query)] = (generation, entries, complete)
+        if origin is not None:
+            if complete:
+                entries, _ = rank_entries(query, entries, origin)
+            else:
+                entries, _ = self.index.ranked(query, beach_only, origin)
+                outcome = "miss"
+        with self._lock:
+            counts = self._stats.setdefault(min(len(query), MAX_STATS_LENGTH), {"hit": 0, "prefix_hit": 0, "miss": 0})
+            counts[outcome] += 1
+        return [entry.result for entry in entries], outcome
+
+    def stats(self):
+        """Counts and hit rate per query length since the last reset"""
+        with self._lock:
+            stats = {length: dict(counts) for length, counts in sorted(self._stats.items())}
+            since = self._since
+        for counts in stats.values():
+            total = counts["hit"] + counts["prefix_hit"] + counts["miss"]
+            counts["hit_rate"] = round((counts["hit"] + counts["prefix_hit"]) / total, 4)
+        return {"since": since.isoformat(), "entries": len(self._results), "by_length": stats}
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._stats = {}
+            self._since = datetime.utcnow()
+
+
+typeahead_cache = TypeaheadCache(typeahead_index)
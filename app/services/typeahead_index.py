@@ -0,0 +1,375 @@
+from types import SimpleNamespace
+
+import numpy as np
+from sqlalchemy.orm import lazyload
+
+from app.helpers.normalize_text import normalize_text
+from app.helpers.spot_urls import node_paths, spot_url
+from app.helpers.typeahead_from_spot import typeahead_from_shop, typeahead_from_spot
+from app.models import AreaOne, AreaTwo, Country, DiveShop, Locality, Spot
+from app.services.geo_arrays import haversine
+from app.services.incremental_index import IncrementalIndex
+
+GRAM_SIZE = 3
+# Results per entity type, as the ILIKE queries this replaces returned
+KIND_LIMITS = {"spot": 25, "shop": 10, "country": 10, "area_one": 10, "area_two": 10, "locality": 10}
+# Broader places first when two results match equally well
+KIND_PRIORITY = {"country": 0, "area_one": 1, "area_two": 2, "locality": 3, "spot": 4, "shop": 5}
+# With an origin, a spot or shop there moves up by this many match ranks (0 exact ... 4 secondary
+# text), decaying with distance: half of it at PROXIMITY_SCALE_MILES * ln 2, about 35 miles
+PROXIMITY_BOOST = 1.5
+PROXIMITY_SCALE_MILES = 50
+MODELS = {
+    "country": Country,
+    "area_one": AreaOne,
+    "area_two": AreaTwo,
+    "locality": Locality,
+    "spot": Spot,
+    "shop": DiveShop,
+}
+
+
+def grams(text):
+    """Every GRAM_SIZE-long substring of normalized text"""
+    return {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def short_prefixes(text):
+    """Word prefixes shorter than GRAM_SIZE, which is what one and two letter queries match"""
+    return {word[:length] for word in text.split() for length in range(1, min(len(word), GRAM_SIZE - 1) + 1)}
+
+
+def location_result(id, name, url, subtext):
+    segments = url.split("/")
+    return {
+        "id": id,
+        "text": name,
+        "url": url,
+        "type": "location",
+        "subtext": subtext,
+        "data": {
+            "country": segments[2],
+            "area_one": segments[3] if len(segments) > 3 else None,
+            "area_two": segments[4] if len(segments) > 4 else None,
+            "locality": segments[5] if len(segments) > 5 else None,
+        },
+    }
+
+
+class TypeaheadEntry:
+    __slots__ = ("kind", "id", "name", "secondary", "weight", "result", "latitude", "longitude")
+
+    def __init__(self, kind, id, name, result, secondary="", weight=0, latitude=None, longitude=None):
+        self.kind = kind
+        self.id = id
+        self.name = normalize_text(name)
+        self.secondary = normalize_text(secondary)
+        self.weight = weight or 0
+        self.result = result
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def texts(self):
+        return [text for text in (self.name, self.secondary) if text]
+
+    def content(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def is_candidate(self, query):
+        """Whether TypeaheadIndex._candidates can return this entry for query"""
+        if len(query) >= GRAM_SIZE:
+            return grams(query) <= set().union(*(grams(text) for text in self.texts()))
+        return any(query in short_prefixes(text) for text in self.texts())
+
+    def match_rank(self, query):
+        """0 exact name, 1 name prefix, 2 word prefix, 3 anywhere in the name, 4 secondary text only"""
+        if self.name == query:
+            return 0
+        if self.name.startswith(query):
+            return 1
+        if " " + query in self.name:
+            return 2
+        if query in self.name:
+            return 3
+        if query in self.secondary:
+            return 4
+        return None
+
+
+def proximity_boosts(origin, entries):
+    """PROXIMITY_BOOST scaled by closeness to origin (latitude, longitude), 0 for entries without coordinates"""
+    boosts = np.zeros(len(entries))
+    located = [i for i, entry in enumerate(entries) if entry.latitude is not None and entry.longitude is not None]
+    if located:
+        miles = haversine(
+            origin[0],
+            origin[1],
+            [entries[i].latitude for i in located],
+            [entries[i].longitude for i in located],
+        )
+        boosts[located] = PROXIMITY_BOOST * np.exp(-miles / PROXIMITY_SCALE_MILES)
+    return boosts
+
+
+def rank_entries(query, entries, origin=None):
+    """(entries, complete): those matching query, best first and capped at KIND_LIMITS per kind
+
+    complete is False when a kind had more matches than its limit, so the list is not every match.
+    With an origin, match ranks are lowered by proximity_boosts, so nearby spots and shops can
+    outrank better text matches further away.
+    """
+    matched = [(entry.match_rank(query), entry) for entry in entries]
+    matched = [(rank, entry) for rank, entry in matched if rank is not None]
+    boosts = proximity_boosts(origin, [entry for _, entry in matched]) if origin else None
+    ranked = {kind: [] for kind in KIND_LIMITS}
+    for i, (rank, entry) in enumerate(matched):
+        if boosts is not None:
+            rank = rank - float(boosts[i])
+        ranked[entry.kind].append(
+            ((rank, KIND_PRIORITY[entry.kind], -entry.weight, len(entry.name), entry.name, entry.id), entry)
+        )
+    results = []
+    complete = True
+    for kind, matches in ranked.items():
+        matches.sort(key=lambda match: match[0])
+        complete = complete and len(matches) <= KIND_LIMITS[kind]
+        results.extend(matches[: KIND_LIMITS[kind]])
+    results.sort(key=lambda match: match[0])
+    return [entry for _, entry in results], complete
+
+
+def live_typeahead(query, beach_only=False, origin=None):
+    """TypeaheadIndex.search over spot and shop names straight from their tables
+
+    For the requests a worker serves before its first build finishes.
+    """
+    query = normalize_text(query)
+    if not query:
+        return []
+    spots = (
+        Spot.query.options(lazyload(Spot.tags))
+        .filter(Spot.is_deleted.isnot(True), Spot.name_normalized.contains(query, autoescape=True))
+        .limit(KIND_LIMITS["spot"])
+    )
+    entries = [
+        TypeaheadEntry(
+            "spot",
+            spot.id,
+            spot.name,
+            typeahead_from_spot(spot),
+            spot.location_city,
+            spot.num_reviews,
+            spot.latitude,
+            spot.longitude,
+        )
+        for spot in spots
+    ]
+    if not beach_only:
+        shops = DiveShop.query.filter(DiveShop.name_normalized.contains(query, autoescape=True)).limit(
+            KIND_LIMITS["shop"]
+        )
+        entries.extend(
+            TypeaheadEntry(
+                "shop",
+                shop.id,
+                shop.name,
+                typeahead_from_shop(shop),
+                weight=shop.num_reviews,
+                latitude=shop.latitude,
+                longitude=shop.longitude,
+            )
+            for shop in shops
+        )
+    entries, _ = rank_entries(query, entries, origin)
+    return [entry.result for entry in entries]
+
+
+class TypeaheadIndex(IncrementalIndex):
+    """In-process search index over spots, dive shops and the four location tables
+
+    Names are normalized with normalize_text and indexed by trigram, plus word prefixes for one
+    and two letter queries, so a lookup intersects a few posting sets instead of running six
+    leading-wildcard scans. Results (URLs and subtexts included) are built once when a row is
+    indexed. The periodic rebuild also picks up parent renames in location URLs.
+    """
+
+    # Caches keyed on it must never see a value again, so it only moves forward across builds
+    _unswapped = IncrementalIndex._unswapped + ("generation",)
+
+    def __init__(self, rebuild_interval=3600):
+        # Bumped on every change, so caches built on search results know when they are stale
+        self.generation = 0
+        super().__init__(rebuild_interval)
+
+    def _reset(self):
+        self._entries = {}
+        self._grams = {}
+        self._prefixes = {}
+        # Country/area short names and names, so child URLs don't lazy load their parents
+        self._places = {}
+        # Geographic node id -> URL path, reloaded before each pass over spots
+        self._node_paths = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry):
+        key = (entry.kind, entry.id)
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current.content() == entry.content():
+                # Refreshes re-read rows that didn't change, which mustn't invalidate cached results
+                return
+            self.remove(*key)
+            self._entries[key] = entry
+            self.generation += 1
+            for text in entry.texts():
+                for gram in grams(text):
+                    self._grams.setdefault(gram, set()).add(key)
+                for prefix in short_prefixes(text):
+                    self._prefixes.setdefault(prefix, set()).add(key)
+
+    def remove(self, kind, id):
+        key = (kind, id)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            self.generation += 1
+            for text in entry.texts():
+                for postings, tokens in ((self._grams, grams(text)), (self._prefixes, short_prefixes(text))):
+                    for token in tokens:
+                        keys = postings.get(token)
+                        if keys is not None:
+                            keys.discard(key)
+                            if not keys:
+                                del postings[token]
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self.generation += 1
+
+    def build(self):
+        super().build()
+        with self._lock:
+            self.generation += 1
+
+    def _candidates(self, query):
+        if len(query) < GRAM_SIZE:
+            return set(self._prefixes.get(query, ()))
+        postings = []
+        for gram in grams(query):
+            keys = self._grams.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for keys in postings[1:]:
+            candidates &= keys
+            if not candidates:
+                break
+        return candidates
+
+    def ranked(self, query, beach_only=False, origin=None):
+        """(entries, complete) for a normalized query; see rank_entries"""
+        with self._lock:
+            entries = [self._entries[key] for key in self._candidates(query) if not beach_only or key[0] == "spot"]
+        return rank_entries(query, entries, origin)
+
+    def search(self, query, beach_only=False, origin=None):
+        """Typeahead results for a query, best match first, favoring spots and shops near origin"""
+        query = normalize_text(query)
+        if not query:
+            return []
+        entries, _ = self.ranked(query, beach_only, origin)
+        return [entry.result for entry in entries]
+
+    def _sources(self):
+        # Parents first, so children updated in the same window get their new URLs
+        for kind, model in MODELS.items():
+            query = model.query
+            if kind == "spot":
+                self._node_paths = node_paths()
+                query = query.options(lazyload(Spot.tags))
+            yield kind, model.updated, query
+
+    def _apply_rows(self, kind, rows):
+        for row in rows:
+            self._apply_row(kind, row)
+
+    def _place(self, kind, id):
+        return self._places.get((kind, id)) if id is not None else None
+
+    def _apply_row(self, kind, row):
+        entry = getattr(self, f"_{kind}_entry")(row)
+        if entry is None:
+            self.remove(kind, row.id)
+        else:
+            self.add(entry)
+
+    def _spot_entry(self, spot):
+        if spot.is_deleted:
+            return None
+        return TypeaheadEntry(
+            "spot",
+            spot.id,
+            spot.name,
+            typeahead_from_spot(spot, spot_url(spot, self._node_paths)),
+            spot.location_city,
+            spot.num_reviews,
+            spot.latitude,
+            spot.longitude,
+        )
+
+    def _shop_entry(self, shop):
+        if not shop.name:
+            return None
+        return TypeaheadEntry(
+            "shop",
+            shop.id,
+            shop.name,
+            typeahead_from_shop(shop),
+            weight=shop.num_reviews,
+            latitude=shop.latitude,
+            longitude=shop.longitude,
+        )
+
+    def _country_entry(self, country):
+        self._places[("country", country.id)] = SimpleNamespace(name=country.name, short_name=country.short_name)
+        result = location_result(country.id, country.name, country.get_url(), country.name)
+        return TypeaheadEntry("country", country.id, country.name, result)
+
+    def _area_one_entry(self, area_one):
+        self._places[("area_one", area_one.id)] = SimpleNamespace(name=area_one.name, short_name=area_one.short_name)
+        country = self._place("country", area_one.country_id)
+        if country is None:
+            return None
+        result = location_result(area_one.id, area_one.name, area_one.get_url(country), country.name)
+        return TypeaheadEntry("area_one", area_one.id, area_one.name, result)
+
+    def _area_two_entry(self, area_two):
+        self._places[("area_two", area_two.id)] = SimpleNamespace(name=area_two.name, short_name=area_two.short_name)
+        country = self._place("country", area_two.country_id)
+        if country is None:
+            return None
+        url = area_two.get_url(country, self._place("area_one", area_two.area_one_id))
+        return TypeaheadEntry(
+            "area_two", area_two.id, area_two.name, location_result(area_two.id, area_two.name, url, country.name)
+        )
+
+    def _locality_entry(self, locality):
+        country = self._place("country", locality.country_id)
+        if country is None:
+            return None
+        url = locality.get_url(
+            country,
+            self._place("area_one", locality.area_one_id),
+            self._place("area_two", locality.area_two_id),
+        )
+        result = location_result(locality.id, locality.name, url, country.name)
+        return TypeaheadEntry("locality", locality.id, locality.name, result)
+
+
+typeahead_index = TypeaheadIndex()
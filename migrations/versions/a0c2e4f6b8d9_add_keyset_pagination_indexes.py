@@ -0,0 +1,50 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: a0c2e4f6b8d9
+Revises: f9b1d3e5a7c8
+Create Date: 2026-10-17 17:38:12.504211
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a0c2e4f6b8d9"
+down_revision = "f9b1d3e5a7c8"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns) in each endpoint's sort order, ending in id so the order is total
+INDEXES = [
+    ("ix_review_beach_id_date_posted_id", "review", ["beach_id", "date_posted", "id"]),
+    ("ix_review_date_posted_id", "review", ["date_posted", "id"]),
+    ("ix_spot_num_reviews_id", "spot", [sa.text("coalesce(num_reviews, 0)"), "id"]),
+    (
+        "ix_spot_num_reviews_rating_id",
+        "spot",
+        [sa.text("coalesce(num_reviews, 0)"), sa.text("coalesce(CAST(rating AS FLOAT), -1.0)"), "id"],
+    ),
+    ("ix_spot_last_review_date_id", "spot", [sa.text("coalesce(last_review_date, '1970-01-01 00:00:00')"), "id"]),
+    (
+        "ix_dive_shop_rating_num_reviews_id",
+        "dive_shop",
+        [sa.text("coalesce(rating, 0)"), sa.text("coalesce(num_reviews, 0)"), "id"],
+    ),
+    ("ix_dive_shop_num_reviews_id", "dive_shop", [sa.text("coalesce(num_reviews, 0)"), "id"]),
+    ("ix_dive_shop_created_id", "dive_shop", ["created", "id"]),
+]
+
+
+def upgrade():
+    """Indexes matching the keyset pagination sort keys"""
+
+    for name, table_name, columns in INDEXES:
+        op.create_index(name, table_name, columns)
+
+
+def downgrade():
+    """Remove keyset pagination indexes"""
+
+    for name, table_name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table_name)
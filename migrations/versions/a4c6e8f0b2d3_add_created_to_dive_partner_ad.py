@@ -0,0 +1,30 @@
+"""add_created_to_dive_partner_ad
+
+Revision ID: a4c6e8f0b2d3
+Revises: f3a5c7e9b1d2
+Create Date: 2026-10-17 13:20:51.336482
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a4c6e8f0b2d3"
+down_revision = "f3a5c7e9b1d2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add ad creation time so buddy search can rank ads by recency"""
+
+    # Existing ads have no known creation time; they all rank as posted at migration time
+    op.add_column(
+        "dive_partner_ad",
+        sa.Column("created", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("dive_partner_ad", "created")
@@ -0,0 +1,75 @@
+"""add_name_normalized_columns
+
+Revision ID: b1d3f5a7c9e0
+Revises: a0c2e4f6b8d9
+Create Date: 2026-10-17 16:02:47.318204
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.helpers.normalize_text import normalize_text
+
+# revision identifiers, used by Alembic.
+revision = "b1d3f5a7c9e0"
+down_revision = "a0c2e4f6b8d9"
+branch_labels = None
+depends_on = None
+
+TABLES = ["country", "area_one", "area_two", "locality", "spot", "dive_shop"]
+BATCH_SIZE = 1000
+
+
+def backfill(table_name):
+    """Fill name_normalized for existing rows, BATCH_SIZE rows per round trip"""
+    bind = op.get_bind()
+    table = sa.table(
+        table_name,
+        sa.column("id", sa.Integer),
+        sa.column("name", sa.String),
+        sa.column("name_normalized", sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.name)
+            .where(table.c.id > last_id)
+            .where(table.c.name.is_not(None))
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        bind.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam("row_id"))
+            .values(name_normalized=sa.bindparam("row_name_normalized")),
+            [{"row_id": row.id, "row_name_normalized": normalize_text(row.name) or None} for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    """Add name_normalized columns, backfill existing rows, then build btree and trigram indexes"""
+
+    for table_name in TABLES:
+        op.add_column(table_name, sa.Column("name_normalized", sa.String(), nullable=True))
+        backfill(table_name)
+        op.create_index(f"ix_{table_name}_name_normalized", table_name, ["name_normalized"])
+        op.create_index(
+            f"ix_{table_name}_name_normalized_trgm",
+            table_name,
+            ["name_normalized"],
+            postgresql_using="gin",
+            postgresql_ops={"name_normalized": "gin_trgm_ops"},
+        )
+
+
+def downgrade():
+    """Remove name_normalized columns and indexes"""
+
+    for table_name in reversed(TABLES):
+        op.drop_index(f"ix_{table_name}_name_normalized_trgm", table_name=table_name)
+        op.drop_index(f"ix_{table_name}_name_normalized", table_name=table_name)
+        op.drop_column(table_name, "name_normalized")
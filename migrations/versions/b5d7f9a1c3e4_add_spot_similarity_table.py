@@ -0,0 +1,43 @@
+"""Add SpotSimilarity table for precomputed similar spots
+
+Revision ID: b5d7f9a1c3e4
+Revises: a4c6e8f0b2d3
+Create Date: 2026-10-17 14:05:12.804417
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b5d7f9a1c3e4"
+down_revision = "a4c6e8f0b2d3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "spot_similarity",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("spot_id", sa.Integer(), nullable=False),
+        sa.Column("similar_spot_id", sa.Integer(), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("co_reviewers", sa.Integer(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["spot_id"], ["spot.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["similar_spot_id"], ["spot.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_spot_similarity_spot_id_rank",
+        "spot_similarity",
+        ["spot_id", "rank"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_spot_similarity_spot_id_rank", table_name="spot_similarity")
+    op.drop_table("spot_similarity")
@@ -0,0 +1,37 @@
+"""Add SearchQuery table for search analytics
+
+Revision ID: c2e4a6b8d0f1
+Revises: b1d3f5a7c9e0
+Create Date: 2026-10-17 18:24:51.736905
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c2e4a6b8d0f1"
+down_revision = "b1d3f5a7c9e0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "search_query",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("endpoint", sa.String(), nullable=False),
+        sa.Column("text", sa.String(), nullable=False),
+        sa.Column("normalized", sa.String(), nullable=False),
+        sa.Column("shape", sa.String(), nullable=False),
+        sa.Column("result_count", sa.Integer(), nullable=False),
+        sa.Column("latency_ms", sa.Float(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_search_query_created", "search_query", ["created"])
+
+
+def downgrade():
+    op.drop_index("ix_search_query_created", table_name="search_query")
+    op.drop_table("search_query")
@@ -0,0 +1,30 @@
+"""Add decayed trending score to Spot
+
+Revision ID: c6e8a0b2d4f5
+Revises: b5d7f9a1c3e4
+Create Date: 2026-10-17 14:48:37.115920
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c6e8a0b2d4f5"
+down_revision = "b5d7f9a1c3e4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("spot", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("trending_score", sa.Float(), server_default="0", nullable=False))
+        batch_op.add_column(sa.Column("trending_updated", sa.DateTime(), nullable=True))
+        batch_op.create_index("ix_spot_trending_score", ["trending_score"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("spot", schema=None) as batch_op:
+        batch_op.drop_index("ix_spot_trending_score")
+        batch_op.drop_column("trending_updated")
+        batch_op.drop_column("trending_score")
@@ -0,0 +1,27 @@
+"""Add NotificationJob.recipients_failed for addresses Pinpoint rejects for good
+
+Revision ID: d3f5b7c9e1a2
+Revises: c2e4a6b8d0f1
+Create Date: 2026-10-18 09:12:40.318254
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d3f5b7c9e1a2"
+down_revision = "c2e4a6b8d0f1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "notification_job",
+        sa.Column("recipients_failed", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("notification_job", "recipients_failed")
@@ -0,0 +1,31 @@
+"""add_lat_lng_indexes
+
+Revision ID: d7e3a1f0b9c2
+Revises: c41ee6a08991
+Create Date: 2026-10-17 09:12:44.118203
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d7e3a1f0b9c2"
+down_revision = "c41ee6a08991"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add lat/lng indexes for bounding-box prefilters on nearby queries"""
+
+    op.create_index("ix_spot_latitude_longitude", "spot", ["latitude", "longitude"])
+    op.create_index("ix_dive_shop_latitude_longitude", "dive_shop", ["latitude", "longitude"])
+    op.create_index("ix_user_latitude_longitude", "user", ["latitude", "longitude"])
+
+
+def downgrade():
+    """Remove lat/lng indexes"""
+
+    op.drop_index("ix_user_latitude_longitude", table_name="user")
+    op.drop_index("ix_dive_shop_latitude_longitude", table_name="dive_shop")
+    op.drop_index("ix_spot_latitude_longitude", table_name="spot")
@@ -0,0 +1,32 @@
+"""Add updated timestamps to location tables
+
+Revision ID: d7f9b1c3e5a6
+Revises: c6e8a0b2d4f5
+Create Date: 2026-10-17 15:32:04.551873
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d7f9b1c3e5a6"
+down_revision = "c6e8a0b2d4f5"
+branch_labels = None
+depends_on = None
+
+TABLES = ["country", "area_one", "area_two", "locality"]
+
+
+def upgrade():
+    """Add the updated column the typeahead index refreshes from"""
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column("updated", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        )
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_column(table, "updated")
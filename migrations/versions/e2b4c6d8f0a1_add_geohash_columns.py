@@ -0,0 +1,72 @@
+"""add_geohash_columns
+
+Revision ID: e2b4c6d8f0a1
+Revises: d7e3a1f0b9c2
+Create Date: 2026-10-17 10:41:05.902117
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.helpers.geohash import encode
+
+# revision identifiers, used by Alembic.
+revision = "e2b4c6d8f0a1"
+down_revision = "d7e3a1f0b9c2"
+branch_labels = None
+depends_on = None
+
+TABLES = ["spot", "dive_shop", "user", "dive_partner_ad"]
+BATCH_SIZE = 1000
+
+
+def backfill(table_name):
+    """Fill geohash for existing rows, BATCH_SIZE rows per round trip"""
+    bind = op.get_bind()
+    table = sa.table(
+        table_name,
+        sa.column("id", sa.Integer),
+        sa.column("latitude", sa.Float),
+        sa.column("longitude", sa.Float),
+        sa.column("geohash", sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.latitude, table.c.longitude)
+            .where(table.c.id > last_id)
+            .where(table.c.latitude.is_not(None))
+            .where(table.c.longitude.is_not(None))
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam("row_id")).values(geohash=sa.bindparam("row_geohash")),
+            [{"row_id": row.id, "row_geohash": encode(row.latitude, row.longitude)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    """Add geohash columns, prefix indexes and backfill existing rows"""
+
+    for table_name in TABLES:
+        op.add_column(table_name, sa.Column("geohash", sa.String(), nullable=True))
+        op.create_index(
+            f"ix_{table_name}_geohash",
+            table_name,
+            ["geohash"],
+            postgresql_ops={"geohash": "varchar_pattern_ops"},
+        )
+        backfill(table_name)
+
+
+def downgrade():
+    """Remove geohash columns and indexes"""
+
+    for table_name in reversed(TABLES):
+        op.drop_index(f"ix_{table_name}_geohash", table_name=table_name)
+        op.drop_column(table_name, "geohash")
@@ -0,0 +1,23 @@
+"""Index Review by author and updated for the recommendations version lookup
+
+Revision ID: e5a7c9d1f3b4
+Revises: d3f5b7c9e1a2
+Create Date: 2026-10-18 10:41:07.552913
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e5a7c9d1f3b4"
+down_revision = "d3f5b7c9e1a2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_review_author_id_updated", "review", ["author_id", "updated"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_review_author_id_updated", table_name="review")
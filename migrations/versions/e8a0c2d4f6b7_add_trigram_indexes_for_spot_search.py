@@ -0,0 +1,38 @@
+"""Add pg_trgm GIN indexes for fuzzy spot search
+
+Revision ID: e8a0c2d4f6b7
+Revises: d7f9b1c3e5a6
+Create Date: 2026-10-17 16:10:26.390114
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e8a0c2d4f6b7"
+down_revision = "d7f9b1c3e5a6"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["name", "location_city", "description"]
+
+
+def upgrade():
+    """Trigram indexes serve both word-similarity matches and the existing %term% ILIKE filters"""
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in COLUMNS:
+        op.create_index(
+            f"ix_spot_{column}_trgm",
+            "spot",
+            [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade():
+    """Remove trigram indexes (the extension is left installed)"""
+
+    for column in reversed(COLUMNS):
+        op.drop_index(f"ix_spot_{column}_trgm", table_name="spot")
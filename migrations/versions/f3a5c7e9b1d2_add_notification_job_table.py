@@ -0,0 +1,49 @@
+"""Add NotificationJob table for background review notifications
+
+Revision ID: f3a5c7e9b1d2
+Revises: e2b4c6d8f0a1
+Create Date: 2026-10-17 11:58:20.417093
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f3a5c7e9b1d2"
+down_revision = "e2b4c6d8f0a1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notification_job",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("latitude", sa.Float(), nullable=False),
+        sa.Column("longitude", sa.Float(), nullable=False),
+        sa.Column("radius", sa.Float(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("scheduled_for", sa.DateTime(), nullable=False),
+        sa.Column("last_user_id", sa.Integer(), nullable=False),
+        sa.Column("recipients_sent", sa.Integer(), nullable=False),
+        sa.Column("pending_tokens", sa.JSON(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_notification_job_status_scheduled_for",
+        "notification_job",
+        ["status", "scheduled_for"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_notification_job_status_scheduled_for", table_name="notification_job")
+    op.drop_table("notification_job")
@@ -0,0 +1,80 @@
+"""add_search_vectors
+
+Revision ID: f9b1d3e5a7c8
+Revises: e8a0c2d4f6b7
+Create Date: 2026-10-17 16:52:40.227581
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "f9b1d3e5a7c8"
+down_revision = "e8a0c2d4f6b7"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+# table -> (weighted document expression for a {row} alias, columns whose update rebuilds it)
+DOCUMENTS = {
+    "spot": (
+        "setweight(to_tsvector('english', coalesce({row}.name, '')), 'A')"
+        " || setweight(to_tsvector('english', coalesce({row}.location_city, '')), 'B')"
+        " || setweight(to_tsvector('english', coalesce({row}.description, '')), 'C')",
+        "name, location_city, description",
+    ),
+    "review": (
+        "setweight(to_tsvector('english', coalesce({row}.title, '')), 'A')"
+        " || setweight(to_tsvector('english', coalesce({row}.text, '')), 'B')",
+        "title, text",
+    ),
+}
+
+
+def backfill(table_name, document):
+    """Fill search_vector for existing rows, BATCH_SIZE ids per statement"""
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text(f"SELECT max(id) FROM {table_name}")).scalar() or 0
+    for start in range(0, max_id, BATCH_SIZE):
+        bind.execute(
+            sa.text(f"UPDATE {table_name} SET search_vector = {document} WHERE id > :start AND id <= :end"),
+            {"start": start, "end": start + BATCH_SIZE},
+        )
+
+
+def upgrade():
+    """Add weighted tsvector columns, GIN indexes and triggers that keep them current"""
+
+    for table_name, (document, columns) in DOCUMENTS.items():
+        op.add_column(table_name, sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+        op.execute(
+            f"""
+            CREATE FUNCTION {table_name}_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {document.format(row="NEW")};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+            """
+        )
+        op.execute(
+            f"""
+            CREATE TRIGGER {table_name}_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF {columns} ON {table_name}
+            FOR EACH ROW EXECUTE PROCEDURE {table_name}_search_vector_update()
+            """
+        )
+        backfill(table_name, document.format(row=table_name))
+        op.create_index(f"ix_{table_name}_search_vector", table_name, ["search_vector"], postgresql_using="gin")
+
+
+def downgrade():
+    """Remove search vectors, their indexes and triggers"""
+
+    for table_name in reversed(list(DOCUMENTS)):
+        op.drop_index(f"ix_{table_name}_search_vector", table_name=table_name)
+        op.execute(f"DROP TRIGGER IF EXISTS {table_name}_search_vector_trigger ON {table_name}")
+        op.execute(f"DROP FUNCTION IF EXISTS {table_name}_search_vector_update()")
+        op.drop_column(table_name, "search_vector")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark /spots/search: %term% ILIKE sequential scan vs pg_trgm GIN-backed fuzzy search
+
+Seeds N synthetic spots into BENCHMARK_DATABASE_URL, which must be a scratch Postgres
+database (its spot table is emptied), then times the current ILIKE query without trigram
+indexes against fuzzy_search_spots with them, and prints each query's top plan node.
+
+Usage: BENCHMARK_DATABASE_URL=postgresql://localhost/bench python scripts/benchmark_fuzzy_search.py --size 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Add the parent directory to Python path so we can import app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import event, or_, text
+
+from app import create_app, db
+from app.helpers.fuzzy_search import fuzzy_search_spots
+from app.models import Spot
+
+TRIGRAM_INDEXES = ["ix_spot_name_trgm", "ix_spot_location_city_trgm", "ix_spot_description_trgm"]
+PREFIXES = ["Blue", "Coral", "Turtle", "Shark", "Manta", "Black", "Hidden", "Old", "North", "South", "Twin"]
+FEATURES = ["Reef", "Rock", "Bay", "Cove", "Wall", "Point", "Pinnacle", "Wreck", "Garden", "Canyon", "Arch"]
+CITIES = ["Kihei", "Lahaina", "Kona", "Cozumel", "Dahab", "Tulamben", "Bonaire", "Monterey", "Exmouth", "Moalboal"]
+WORDS = ["shore", "boat", "drift", "night", "sandy", "entry", "current", "visibility", "turtles", "eels", "macro"]
+
+
+class BenchmarkConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get("BENCHMARK_DATABASE_URL", "")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    JWT_SECRET_KEY = "benchmark"
+
+
+def synthetic_spots(count, rng):
+    now = datetime.utcnow()
+    for i in range(count):
+        yield {
+            "name": f"{rng.choice(PREFIXES)} {rng.choice(FEATURES)} {i}",
+            "location_city": rng.choice(CITIES),
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))),
+            "is_verified": True,
+            "is_deleted": False,
+            "num_reviews": 0,
+            "trending_score": 0.0,
+            "created": now,
+            "updated": now,
+        }
+
+
+def seed(count, rng):
+    db.session.execute(Spot.__table__.delete())
+    batch = []
+    for row in synthetic_spots(count, rng):
+        batch.append(row)
+        if len(batch) == 10000:
+            db.session.execute(Spot.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Spot.__table__.insert(), batch)
+    db.session.commit()
+
+
+def base_query():
+    return Spot.query.filter(Spot.is_verified.isnot(False), Spot.is_deleted.isnot(True))
+
+
+def ilike_search(term, limit):
+    pattern = "%" + term + "%"
+    return (
+        base_query()
+        .filter(or_(Spot.name.ilike(pattern), Spot.location_city.ilike(pattern), Spot.description.ilike(pattern)))
+        .limit(limit)
+        .all()
+    )
+
+
+def set_trigram_indexes(enabled):
+    for name in TRIGRAM_INDEXES:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    if enabled:
+        for name in TRIGRAM_INDEXES:
+            column = name[len("ix_spot_") : -len("_trgm")]
+            db.session.execute(text(f"CREATE INDEX {name} ON spot USING gin ({column} gin_trgm_ops)"))
+    db.session.execute(text("ANALYZE spot"))
+    db.session.commit()
+
+
+def top_plan_node(statement):
+    """First scan node of EXPLAIN for a captured SELECT (Seq Scan, Bitmap Heap Scan, ...)"""
+    plan = db.session.execute(text("EXPLAIN " + statement)).scalars().all()
+    for line in plan:
+        for node in ("Seq Scan", "Bitmap Heap Scan", "Index Scan", "Bitmap Index Scan"):
+            if node in line:
+                return node
+    return plan[0].strip()
+
+
+def captured_sql(fn, term, limit):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(cursor.mogrify(statement, parameters).decode())
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        fn(term, limit)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements[0]
+
+
+def timed(fn, terms, limit):
+    samples = []
+    for term in terms:
+        start = time.perf_counter()
+        fn(term, limit)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples, plan):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"  {label:<16} p50 {statistics.median(samples):9.2f} ms   p99 {p99:9.2f} ms   plan: {plan}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=25)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    if not BenchmarkConfig.SQLALCHEMY_DATABASE_URI.startswith("postgresql"):
+        sys.exit("Set BENCHMARK_DATABASE_URL to a scratch Postgres database; pg_trgm needs Postgres")
+
+    app = create_app(config_object=BenchmarkConfig)
+    with app.app_context():
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        db.session.commit()
+        db.create_all()
+        rng = random.Random(args.size)
+        print(f"Seeding {args.size} spots...")
+        seed(args.size, rng)
+
+        # Typo'd and exact names, cities and description words
+        terms = [
+            rng.choice(["mnta", "turtle", "kona", "pinacle", "cozumel", "wrek", "drift"]) for _ in range(args.queries)
+        ]
+
+        def fuzzy(term, limit):
+            return fuzzy_search_spots(base_query(), term, limit)
+
+        set_trigram_indexes(False)
+        report(
+            "ilike, no index",
+            timed(ilike_search, terms, args.limit),
+            top_plan_node(captured_sql(ilike_search, "wrek", 50)),
+        )
+        report("fuzzy, no index", timed(fuzzy, terms, args.limit), top_plan_node(captured_sql(fuzzy, "wrek", 50)))
+
+        set_trigram_indexes(True)
+        report(
+            "ilike, trgm gin",
+            timed(ilike_search, terms, args.limit),
+            top_plan_node(captured_sql(ilike_search, "wrek", 50)),
+        )
+        report("fuzzy, trgm gin", timed(fuzzy, terms, args.limit), top_plan_node(captured_sql(fuzzy, "wrek", 50)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark nearby-spot lookups: SQL distance sort vs the in-process spatial index
+
+Seeds N synthetic verified spots into BENCHMARK_DATABASE_URL (an in-memory SQLite
+database by default) and times get_nearby_spots' SQL ordering against the grid index.
+
+Usage: python scripts/benchmark_spatial_index.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Add the parent directory to Python path so we can import app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import create_app, db
+from app.models import Spot
+from app.services.spatial_index import SpotSpatialIndex
+
+
+class BenchmarkConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get("BENCHMARK_DATABASE_URL", "sqlite://")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    JWT_SECRET_KEY = "benchmark"
+
+
+def synthetic_spots(count, rng):
+    """Clustered around a few hundred "dive regions" with some uniform noise, like real data"""
+    centers = [(rng.uniform(-45, 60), rng.uniform(-180, 180)) for _ in range(300)]
+    now = datetime.utcnow()
+    for i in range(count):
+        if rng.random() < 0.8:
+            lat, lng = rng.choice(centers)
+            lat, lng = lat + rng.gauss(0, 0.75), lng + rng.gauss(0, 0.75)
+        else:
+            lat, lng = rng.uniform(-60, 70), rng.uniform(-180, 180)
+        yield {
+            "name": f"Synthetic {i}",
+            "latitude": max(-89.9, min(89.9, lat)),
+            "longitude": max(-180.0, min(180.0, lng)),
+            "is_verified": True,
+            "is_deleted": False,
+            "num_reviews": 0,
+            "created": now,
+            "updated": now,
+        }
+
+
+def seed(count, rng):
+    db.session.execute(Spot.__table__.delete())
+    batch = []
+    for row in synthetic_spots(count, rng):
+        batch.append(row)
+        if len(batch) == 10000:
+            db.session.execute(Spot.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Spot.__table__.insert(), batch)
+    db.session.commit()
+
+
+def sql_nearest(latitude, longitude, limit):
+    return [
+        row.id
+        for row in db.session.query(Spot.id)
+        .filter(Spot.is_verified, Spot.is_deleted.is_not(True))
+        .order_by(Spot.distance(latitude, longitude))
+        .limit(limit)
+    ]
+
+
+def timed(fn, origins, limit):
+    samples = []
+    results = []
+    for latitude, longitude in origins:
+        start = time.perf_counter()
+        results.append(fn(latitude, longitude, limit))
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, results
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"  {label:<14} p50 {statistics.median(samples):9.3f} ms   p99 {p99:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=25)
+    parser.add_argument("--limit", type=int, default=25)
+    args = parser.parse_args()
+
+    app = create_app(config_object=BenchmarkConfig)
+    with app.app_context():
+        db.create_all()
+        for size in args.sizes:
+            rng = random.Random(size)
+            print(f"Seeding {size} spots...")
+            seed(size, rng)
+
+            index = SpotSpatialIndex()
+            start = time.perf_counter()
+            index.refresh(force=True)
+            print(f"  index build    {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+            origins = [
+                (row.latitude, row.longitude) for row in Spot.query.order_by(db.func.random()).limit(args.queries)
+            ]
+            sql_samples, sql_results = timed(sql_nearest, origins, args.limit)
+            index_samples, index_results = timed(
+                lambda lat, lng, k: [spot_id for _, spot_id in index.nearest(lat, lng, k)], origins, args.limit
+            )
+            radius_samples, _ = timed(lambda lat, lng, _: index.within(lat, lng, 25), origins, args.limit)
+
+            report("sql k-nearest", sql_samples)
+            report("index k-near", index_samples)
+            report("index 25mi", radius_samples)
+            mismatches = sum(1 for a, b in zip(sql_results, index_results) if a != b)
+            print(f"  order mismatches vs SQL: {mismatches}/{len(origins)}")
+
+
+if __name__ == "__main__":
+    main()
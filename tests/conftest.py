@@ -14,6 +14,7 @@ class TestConfig:
     WTF_CSRF_ENABLED = False
     JWT_SECRET_KEY = "test-secret-key"
     JWT_ACCESS_TOKEN_EXPIRES = False
+    SEARCH_LOG_FLUSH_SECONDS = 0
 
 
 @pytest.fixture(scope="session")
@@ -0,0 +1,128 @@
+import time
+
+from app.services.autocomplete_index import (
+    ALIAS,
+    HEADER,
+    MAGIC,
+    NAME,
+    VERSION,
+    WORD,
+    AutocompleteSnapshot,
+    aliases,
+    autocomplete_index,
+    build_snapshot,
+    live_search,
+    spot_keys,
+    write_snapshot,
+)
+
+
+class TestAutocompleteIndex:
+    """Test cases for the memory-mapped autocomplete snapshot."""
+
+    def test_aliases(self):
+        """Test "also known as" names are read from descriptions written by add_spot_wdscript."""
+        description = "Shore entry.\n\nMakena Landing is also known as Turtle Town, Five Caves or Nahuna Point."
+        assert aliases(description) == ["Turtle Town", "Five Caves", "Nahuna Point"]
+        assert aliases(None) == []
+
+    def test_spot_keys(self):
+        """Test names, later words and aliases become normalized keys."""
+        assert dict(spot_keys("Molokini Crater", ["Molókini"])) == {
+            "molokini crater": NAME,
+            "crater": WORD,
+            "molokini": ALIAS,
+        }
+
+    def test_snapshot_search(self, tmp_path):
+        """Test prefix matches rank names over aliases over later words, then by popularity."""
+        path = str(tmp_path / "autocomplete.idx")
+        write_snapshot(
+            path,
+            [
+                (1, 3, "Black Rock", "/black-rock", spot_keys("Black Rock")),
+                (2, 10, "Blue Hole", "/blue-hole", spot_keys("Blue Hole")),
+                (3, 50, "Ka'anapali Beach", "/kaanapali", spot_keys("Ka'anapali Beach", ["Black Sand"])),
+                (4, 0, "Hanauma Bay", "/hanauma", spot_keys("Hanauma Bay", ["Blue Lagoon"])),
+            ],
+        )
+        snapshot = AutocompleteSnapshot(path)
+        assert [spot_id for spot_id, _, _ in snapshot.search("bl")] == [2, 1, 3, 4]
+        assert snapshot.search("BEACH") == [(3, "Ka'anapali Beach", "/kaanapali")]
+        assert [spot_id for spot_id, _, _ in snapshot.search("kaana")] == [3]
+        assert snapshot.search("zz") == []
+        assert snapshot.search("  ") == []
+
+    def test_word_prefixes_in_any_order(self, tmp_path):
+        """Test every query word has to start a word of the name, wherever it sits."""
+        path = str(tmp_path / "autocomplete.idx")
+        write_snapshot(
+            path,
+            [
+                (1, 5, "La Jolla Cove", "/la-jolla-cove", spot_keys("La Jolla Cove")),
+                (2, 9, "Cove Reef", "/cove-reef", spot_keys("Cove Reef")),
+            ],
+        )
+        snapshot = AutocompleteSnapshot(path)
+        assert [spot_id for spot_id, _, _ in snapshot.search("cov")] == [2, 1]
+        assert [spot_id for spot_id, _, _ in snapshot.search("cove la")] == [1]
+        assert [spot_id for spot_id, _, _ in snapshot.search("jolla co")] == [1]
+        assert snapshot.search("ove") == []
+
+    def test_short_prefix_ranks_every_key(self, tmp_path):
+        """Test a one-letter query ranks the whole key range, not just its alphabetical head."""
+        path = str(tmp_path / "autocomplete.idx")
+        entries = [(i, 1, f"Bay {i:05d}", f"/bay-{i}", spot_keys(f"Bay {i:05d}")) for i in range(1, 3000)]
+        entries.append((3000, 100, "Blue Water", "/blue-water", spot_keys("Blue Water")))
+        write_snapshot(path, entries)
+        assert AutocompleteSnapshot(path).search("b", limit=1)[0][0] == 3000
+
+    def test_autocomplete_endpoint(self, app, client, db_session, spot_factory, tmp_path):
+        """Test /search/autocomplete answers from the table until the background build lands."""
+        app.config["AUTOCOMPLETE_INDEX_PATH"] = str(tmp_path / "autocomplete.idx")
+        autocomplete_index.clear()
+        spot_factory(name="Molokini Crater", description="Molokini Crater is also known as Molokini.")
+        spot_factory(name="Molokai Reef", is_deleted=True)
+        try:
+            response = client.get("/search/autocomplete?q=molo")
+            assert [item["label"] for item in response.json["data"]] == ["Molokini Crater"]
+            assert response.json["data"][0]["type"] == "spot"
+
+            autocomplete_index._build_thread.join()
+            assert autocomplete_index.get(app.config["AUTOCOMPLETE_INDEX_PATH"]) is not None
+            response = client.get("/search/autocomplete?q=crater molo")
+            assert [item["label"] for item in response.json["data"]] == ["Molokini Crater"]
+        finally:
+            autocomplete_index.clear()
+
+    def test_snapshot_from_another_version_is_rebuilt(self, app, client, db_session, spot_factory, tmp_path):
+        """Test a snapshot written with another VERSION is answered live and rebuilt, not a 500."""
+        path = tmp_path / "autocomplete.idx"
+        app.config["AUTOCOMPLETE_INDEX_PATH"] = str(path)
+        autocomplete_index.clear()
+        spot_factory(name="Molokini Crater")
+        path.write_bytes(HEADER.pack(MAGIC, VERSION + 1, 0, 0, 0, 0, 0, time.time()))
+        try:
+            response = client.get("/search/autocomplete?q=molo")
+            assert response.status_code == 200
+            assert [item["label"] for item in response.json["data"]] == ["Molokini Crater"]
+
+            autocomplete_index._build_thread.join()
+            assert autocomplete_index.get(str(path), max_age=0).search("molo")
+        finally:
+            autocomplete_index.clear()
+
+    def test_live_search(self, db_session, spot_factory):
+        """Test the fallback query matches word prefixes of live spots, most reviewed first."""
+        quiet = spot_factory(name="La Jolla Cove", num_reviews=1)
+        busy = spot_factory(name="Cove Reef", num_reviews=8)
+        spot_factory(name="Coverage Point", is_deleted=True)
+        assert [spot_id for spot_id, _, _ in live_search("cove")] == [busy.id, quiet.id]
+        assert [spot_id for spot_id, _, _ in live_search("cove jol")] == [quiet.id]
+        assert live_search("%") == []
+
+    def test_build_snapshot_counts(self, db_session, spot_factory, tmp_path):
+        """Test the build reports indexed spots and keys."""
+        spot_factory(name="Shark Fin Rock")
+        result = build_snapshot(str(tmp_path / "autocomplete.idx"))
+        assert result == {"spots": 1, "keys": 3}
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from app.models import DivePartnerAd
+from app.services.buddy_search import BuddySearchService
+
+
+def _diver(user_factory, name, latitude=None, longitude=None):
+    return user_factory(email=f"{name}@example.com", username=name, latitude=latitude, longitude=longitude)
+
+
+def _ad(db_session, user, latitude, longitude, days_ago=0):
+    ad = DivePartnerAd(
+        user_id=user.id,
+        latitude=latitude,
+        longitude=longitude,
+        created=datetime.utcnow() - timedelta(days=days_ago),
+    )
+    db_session.add(ad)
+    db_session.commit()
+    return ad
+
+
+class TestBuddySearchService:
+    """Test cases for geo buddy search."""
+
+    def test_ranks_by_distance_then_ad_recency(self, db_session, user_factory):
+        """Test closer buddies come first and equal distances fall back to the newest ad."""
+        old, new, far = (_diver(user_factory, name) for name in ("old", "new", "far"))
+        _ad(db_session, old, 20.9, -156.3, days_ago=30)
+        _ad(db_session, new, 20.9, -156.3, days_ago=1)
+        _ad(db_session, far, 21.5, -156.3)
+
+        results = BuddySearchService.search(20.8, -156.3, include_users=False)
+        assert [result.user.username for result in results] == ["new", "old", "far"]
+
+    def test_user_location_and_ad_count_once(self, db_session, user_factory):
+        """Test a user with both a home location and an ad appears once, at the closer one."""
+        diver = _diver(user_factory, "diver", 25.0, -80.0)
+        _ad(db_session, diver, 20.85, -156.3)
+
+        results = BuddySearchService.search(20.8, -156.3)
+        assert len(results) == 1
+        assert results[0].distance < 5
+
+    def test_pages_match_full_ranking(self, db_session, user_factory):
+        """Test k-nearest pages line up with one big ranking even when the radius has to widen."""
+        for i in range(12):
+            _diver(user_factory, f"diver{i}", 20.8 + i * 0.7, -156.3)
+
+        everyone = BuddySearchService.search(20.8, -156.3, limit=12)
+        pages = BuddySearchService.search(20.8, -156.3, limit=5, offset=0)
+        pages += BuddySearchService.search(20.8, -156.3, limit=5, offset=5)
+        assert [result.user.id for result in pages] == [result.user.id for result in everyone[:10]]
+
+    def test_many_ads_from_one_user(self, db_session, user_factory):
+        """Test a user with several close ads doesn't crowd other buddies out of a page."""
+        busy, other = _diver(user_factory, "busy"), _diver(user_factory, "other")
+        for days_ago in range(4):
+            _ad(db_session, busy, 20.81, -156.3, days_ago=days_ago)
+        _ad(db_session, other, 20.9, -156.3)
+
+        results = BuddySearchService.search(20.8, -156.3, radius=50, limit=2, include_users=False)
+        assert [result.user.username for result in results] == ["busy", "other"]
+
+    def test_radius(self, db_session, user_factory):
+        """Test a radius search leaves out buddies beyond it."""
+        _diver(user_factory, "near", 20.85, -156.3)
+        _diver(user_factory, "far", 22.0, -156.3)
+
+        results = BuddySearchService.search(20.8, -156.3, radius=20)
+        assert [result.user.username for result in results] == ["near"]
+
+    def test_users_nearby_endpoint(self, client, db_session, user_factory):
+        """Test /users/nearby returns the closest users with their distance."""
+        _diver(user_factory, "near", 20.85, -156.3)
+        _diver(user_factory, "far", 22.0, -156.3)
+
+        response = client.get("/users/nearby?latitude=20.8&longitude=-156.3")
+        assert [user["username"] for user in response.json["data"]] == ["near", "far"]
+        assert "latitude" not in response.json["data"][0]
+        assert client.get("/users/nearby").status_code == 422
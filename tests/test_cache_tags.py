@@ -0,0 +1,203 @@
+import time
+
+import pytest
+from flask_caching.backends import SimpleCache
+
+from app import cache, db
+from app.models import GeographicNode
+from app.routes import geography, locality
+from app.routes import spot as spot_routes
+from app.services import cache_tags
+from app.services.cache_tags import (
+    LOCK_PREFIX,
+    TAG_PREFIX,
+    _cache_key,
+    _is_fresh,
+    _tagged_timeout,
+    _wait_for,
+    purge_tags,
+)
+from app.services.shared_cache import SharedRedisCache, fake_redis
+from app.services.two_tier_cache import TwoTierCache
+
+
+@pytest.fixture
+def simple_cache(app):
+    """Swap the tests' null cache for a working one"""
+    previous = app.extensions["cache"][cache]
+    app.extensions["cache"][cache] = SimpleCache(threshold=1000)
+    yield app.extensions["cache"][cache]
+    app.extensions["cache"][cache] = previous
+
+
+class TestCacheTags:
+    """Test cases for tag-based cache invalidation."""
+
+    def test_purge_drops_tagged_responses(self, client, simple_cache, spot_factory):
+        """Test a cached spot page is served until its tag is purged."""
+        spot = spot_factory(name="Shaws Cove")
+        assert client.get(f"/spot/{spot.id}").json["data"]["name"] == "Shaws Cove"
+        spot.name = "Shaw's Cove"
+        db.session.commit()
+        assert client.get(f"/spot/{spot.id}").json["data"]["name"] == "Shaws Cove"
+        purge_tags(f"spot:{spot.id + 1}")
+        assert client.get(f"/spot/{spot.id}").json["data"]["name"] == "Shaws Cove"
+        purge_tags(f"spot:{spot.id}")
+        assert client.get(f"/spot/{spot.id}").json["data"]["name"] == "Shaw's Cove"
+
+    def test_entries_built_before_a_purge_are_stale(self, app, simple_cache):
+        """Test a purge during a request, or a purge time evicted from the cache, marks entries stale."""
+        started = time.time()
+        entry = {"tags": ["spot:1"], "started": started, "response": {}}
+        simple_cache.set(TAG_PREFIX + "spot:1", started - 10)
+        assert _is_fresh(entry)
+        simple_cache.set(TAG_PREFIX + "spot:1", started + 0.001)
+        assert not _is_fresh(entry)
+        simple_cache.delete(TAG_PREFIX + "spot:1")
+        assert not _is_fresh(entry)
+        assert _is_fresh({"tags": [], "started": started, "response": {}})
+
+    def test_patch_spot_purges_pages_and_areas(self, client, simple_cache, spot_factory, admin_auth_headers):
+        """Test patching a spot refreshes its pages and the /loc listings of every area above it."""
+        country = GeographicNode(name="Bonaire", short_name="bq", admin_level=0)
+        db.session.add(country)
+        db.session.commit()
+        region = GeographicNode(name="Kralendijk", short_name="kralendijk", admin_level=1, parent_id=country.id)
+        db.session.add(region)
+        db.session.commit()
+        spot = spot_factory(name="Salt Pier", geographic_node_id=region.id)
+        pages = [f"/spot/{spot.id}", f"/spots/get?beach_id={spot.id}", f"/loc/bq/kralendijk/{spot.id}"]
+        for page in pages:
+            assert client.get(page).json["data"]["name"] == "Salt Pier"
+        assert client.get("/loc/bq").json["spots"][0]["name"] == "Salt Pier"
+
+        response = client.patch(
+            "/spots/patch", json={"id": spot.id, "name": "Salt Pier North"}, headers=admin_auth_headers
+        )
+        assert response.status_code == 200
+        for page in pages:
+            assert client.get(page).json["data"]["name"] == "Salt Pier North"
+        assert client.get("/loc/bq").json["spots"][0]["name"] == "Salt Pier North"
+
+    def test_patch_review_purges_reviews(
+        self, client, simple_cache, sample_user, auth_headers, spot_factory, review_factory
+    ):
+        """Test editing a review refreshes the spot's cached review list."""
+        spot = spot_factory()
+        review = review_factory(author_id=sample_user.id, beach_id=spot.id, text="Calm")
+        assert client.get(f"/reviews/get?beach_id={spot.id}").json["data"][0]["text"] == "Calm"
+        client.patch("/review/patch", json={"id": review.id, "text": "Surgy"}, headers=auth_headers)
+        assert client.get(f"/reviews/get?beach_id={spot.id}").json["data"][0]["text"] == "Surgy"
+
+    def test_merge_purges_both_spots(self, client, simple_cache, spot_factory):
+        """Test merging a duplicate refreshes the original's page and purges the duplicate's."""
+        orig = spot_factory(name="Casino Point", difficulty=None)
+        dupe = spot_factory(name="Casino Point Dive Park", difficulty="beginner")
+        assert client.get(f"/spot/{orig.id}").json["data"]["difficulty"] == "Unrated"
+        assert client.get(f"/spot/{dupe.id}").status_code == 200
+        built = simple_cache.get(TAG_PREFIX + f"spot:{dupe.id}")
+
+        assert client.post("/spots/merge", json={"orig_id": orig.id, "dupe_id": dupe.id}).status_code == 200
+        assert client.get(f"/spot/{orig.id}").json["data"]["difficulty"] == "beginner"
+        assert simple_cache.get(TAG_PREFIX + f"spot:{dupe.id}") > built
+
+    def test_recalc_purges_the_spot(self, client, simple_cache, sample_user, spot_factory, review_factory):
+        """Test recalculating a spot's rating refreshes its cached page."""
+        spot = spot_factory(num_reviews=0, rating=None)
+        assert client.get(f"/spot/{spot.id}").json["data"]["num_reviews"] == 0
+        review_factory(author_id=sample_user.id, beach_id=spot.id, rating=4)
+        assert client.get(f"/spot/recalc?beach_id={spot.id}").status_code == 200
+        assert client.get(f"/spot/{spot.id}").json["data"]["num_reviews"] == 1
+
+    def test_geocode_purges_old_and_new_areas(self, client, simple_cache, monkeypatch, sample_country, spot_factory):
+        """Test geocoding a spot into another area refreshes the /loc listings of both areas."""
+        old = GeographicNode(name="Bonaire", short_name="bq", admin_level=0)
+        new = GeographicNode(name="Curacao", short_name="cw", admin_level=0)
+        db.session.add_all([old, new])
+        db.session.commit()
+        spot = spot_factory(name="Salt Pier", geographic_node_id=old.id, latitude=12.08, longitude=-68.28)
+        assert [s["name"] for s in client.get("/loc/bq").json["spots"]] == ["Salt Pier"]
+        assert client.get("/loc/cw").json["spots"] == []
+
+        class Geocoded:
+            def json(self):
+                return {"status": "OK", "results": [{"address_components": []}]}
+
+        monkeypatch.setattr(spot_routes.requests, "get", lambda *args, **kwargs: Geocoded())
+        monkeypatch.setattr(spot_routes, "get_localities", lambda components: (None, None, None, sample_country, new))
+        assert client.get(f"/spot/geocode/{spot.id}").status_code == 200
+        assert client.get("/loc/bq").json["spots"] == []
+        assert [s["name"] for s in client.get("/loc/cw").json["spots"]] == ["Salt Pier"]
+
+    def test_tagged_timeout_needs_a_shared_cache(self, app, simple_cache, monkeypatch):
+        """Test the long tagged timeout is only used when purges reach every worker."""
+        monkeypatch.setitem(app.config, "CACHE_DEFAULT_TIMEOUT", 300)
+        monkeypatch.setitem(app.config, "CACHE_TAGGED_TIMEOUT", 86400)
+        assert _tagged_timeout() == 300
+        app.extensions["cache"][cache] = TwoTierCache(l2=simple_cache)
+        assert _tagged_timeout() == 300
+        app.extensions["cache"][cache] = TwoTierCache(l2=SharedRedisCache(host=fake_redis))
+        assert _tagged_timeout() == 86400
+
+
+def cache_key(app, view, path):
+    with app.test_request_context(path):
+        return _cache_key(view, True)
+
+
+class TestCacheCoalescing:
+    """Test cases for single-flight rebuilds and stale-while-revalidate in cached_with_tags."""
+
+    def test_aged_out_entry_is_served_while_refreshing(
+        self, app, client, simple_cache, monkeypatch, sample_country, spot_factory
+    ):
+        """Test an expired entry within the grace window is served and refreshed once in the background."""
+        refreshes = []
+        monkeypatch.setattr(cache_tags, "_refresh", refreshes.append)
+        spot_factory(country_id=sample_country.id)
+        assert client.get("/locality/country").json["data"][0]["num_spots"] == 1
+        spot_factory(name="Second Spot", country_id=sample_country.id)
+        key = cache_key(app, locality.get_country, "/locality/country")
+        entry = simple_cache.get(key)
+        simple_cache.set(key, {**entry, "expires": time.time() - 1})
+
+        assert client.get("/locality/country").json["data"][0]["num_spots"] == 1
+        assert client.get("/locality/country").json["data"][0]["num_spots"] == 1
+        assert len(refreshes) == 1
+        refreshes[0]()
+        assert client.get("/locality/country").json["data"][0]["num_spots"] == 2
+        assert not simple_cache.has(LOCK_PREFIX + key)
+
+    def test_purged_entry_is_served_while_another_request_rebuilds(self, app, client, simple_cache, spot_factory):
+        """Test requests that lose the rebuild lock after a purge get the old response instead of waiting."""
+        country = GeographicNode(name="Belize", short_name="bz", admin_level=0)
+        db.session.add(country)
+        db.session.commit()
+        spot = spot_factory(name="Blue Hole", geographic_node_id=country.id)
+        assert client.get("/loc/bz").json["spots"][0]["name"] == "Blue Hole"
+        spot.name = "Great Blue Hole"
+        db.session.commit()
+        purge_tags(f"node:{country.id}")
+
+        key = cache_key(app, geography.get_geographic_area, "/loc/bz")
+        simple_cache.add(LOCK_PREFIX + key, True)
+        assert client.get("/loc/bz").json["spots"][0]["name"] == "Blue Hole"
+        simple_cache.delete(LOCK_PREFIX + key)
+        assert client.get("/loc/bz").json["spots"][0]["name"] == "Great Blue Hole"
+
+    def test_waiters_get_the_holders_entry(self, app, simple_cache):
+        """Test a request waiting on the rebuild lock takes the holder's entry, or gives up when the lock goes."""
+        simple_cache.add(LOCK_PREFIX + "key", True)
+        simple_cache.set("key", {"tags": [], "started": time.time(), "expires": time.time() + 60, "response": {}})
+        assert _wait_for("key")["response"] == {}
+        simple_cache.delete("key")
+        simple_cache.delete(LOCK_PREFIX + "key")
+        assert _wait_for("key") is None
+
+    def test_missing_entry_is_built_when_the_wait_times_out(self, app, client, db_session, simple_cache, monkeypatch):
+        """Test a request builds the response itself if the lock holder takes longer than CACHE_LOCK_WAIT."""
+        monkeypatch.setitem(app.config, "CACHE_LOCK_WAIT", 0.1)
+        key = cache_key(app, locality.get_country, "/locality/country")
+        simple_cache.add(LOCK_PREFIX + key, True)
+        assert client.get("/locality/country").status_code == 200
+        assert simple_cache.get(key) is not None
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import DiveShop
+
+
+class TestConditionalGet:
+    """Test cases for ETag and Last-Modified validation of GET responses."""
+
+    def test_spot_page_sets_validators(self, client, spot_factory):
+        """Test a spot page carries an ETag and Last-Modified and must be revalidated."""
+        spot = spot_factory(updated=datetime(2024, 5, 1, 12, 30, 15))
+        response = client.get(f"/spot/{spot.id}")
+        assert response.status_code == 200
+        assert response.headers["ETag"]
+        assert response.headers["Last-Modified"] == "Wed, 01 May 2024 12:30:15 GMT"
+        assert response.headers["Cache-Control"] == "no-cache"
+
+    def test_matching_etag_skips_the_view(self, client, spot_factory, monkeypatch):
+        """Test If-None-Match with the current ETag answers 304 before the response is built."""
+        spot = spot_factory()
+        etag = client.get(f"/spot/{spot.id}").headers["ETag"]
+
+        def fail(beach_id):
+            raise AssertionError("view ran")
+
+        monkeypatch.setattr("app.routes.spot.get_summary_reviews_helper", fail)
+        response = client.get(f"/spot/{spot.id}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etag
+
+    def test_updates_change_the_etag(self, client, sample_user, spot_factory, review_factory):
+        """Test editing the spot or adding a review to it invalidates the client's copy."""
+        spot = spot_factory(updated=datetime(2024, 5, 1))
+        etag = client.get(f"/spot/{spot.id}").headers["ETag"]
+        spot.updated = datetime(2024, 5, 2)
+        db.session.commit()
+        response = client.get(f"/spot/{spot.id}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        review_factory(author_id=sample_user.id, beach_id=spot.id, updated=datetime(2024, 5, 1))
+        assert client.get(f"/spot/{spot.id}", headers={"If-None-Match": etag}).status_code == 200
+
+    def test_if_modified_since_is_ignored(self, client, sample_user, spot_factory, review_factory):
+        """Test If-Modified-Since never answers 304, since a deleted review doesn't move Last-Modified."""
+        spot = spot_factory(updated=datetime(2024, 5, 1))
+        review_factory(author_id=sample_user.id, beach_id=spot.id, updated=datetime(2024, 5, 1))
+        second = review_factory(author_id=sample_user.id, beach_id=spot.id, updated=datetime(2024, 4, 1))
+        since = {"If-Modified-Since": "Thu, 02 May 2024 00:00:00 GMT"}
+        assert client.get(f"/spot/{spot.id}", headers=since).status_code == 200
+        db.session.delete(second)
+        db.session.commit()
+        response = client.get(f"/reviews/get?beach_id={spot.id}", headers=since)
+        assert response.status_code == 200
+        assert len(response.json["data"]) == 1
+
+    def test_missing_spot_is_not_validated(self, client, db_session):
+        """Test a 404 carries no validators."""
+        response = client.get("/spot/999999", headers={"If-None-Match": "*"})
+        assert response.status_code == 404
+        assert "ETag" not in response.headers
+
+    def test_deleted_review_changes_reviews_etag(self, client, sample_user, spot_factory, review_factory):
+        """Test removing a review invalidates the review list even though no updated moved."""
+        spot = spot_factory()
+        review_factory(author_id=sample_user.id, beach_id=spot.id, updated=datetime(2024, 5, 1))
+        second = review_factory(author_id=sample_user.id, beach_id=spot.id, updated=datetime(2024, 4, 1))
+        etag = client.get(f"/reviews/get?beach_id={spot.id}").headers["ETag"]
+        assert client.get(f"/reviews/get?beach_id={spot.id}", headers={"If-None-Match": etag}).status_code == 304
+        db.session.delete(second)
+        db.session.commit()
+        assert client.get(f"/reviews/get?beach_id={spot.id}", headers={"If-None-Match": etag}).status_code == 200
+
+    def test_user_and_shop_pages(self, client, sample_user, db_session):
+        """Test profiles and dive shop pages are validated by their own updated timestamps."""
+        etag = client.get("/user/get?username=testuser").headers["ETag"]
+        assert client.get("/user/get?username=testuser", headers={"If-None-Match": etag}).status_code == 304
+        sample_user.updated = datetime.utcnow() + timedelta(minutes=1)
+        db.session.commit()
+        assert client.get("/user/get?username=testuser", headers={"If-None-Match": etag}).status_code == 200
+
+        shop = DiveShop(name="Reef Divers", updated=datetime(2024, 5, 1))
+        db.session.add(shop)
+        db.session.commit()
+        etag = client.get(f"/shop/get/{shop.id}").headers["ETag"]
+        assert client.get(f"/shop/get/{shop.id}", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,52 @@
+from app import cache
+from app.helpers.fulltext_search import MARK_START, MARK_STOP, fulltext_search, highlight, marked_headline
+
+
+class TestFulltextSearch:
+    """Test cases for full-text search over spots and reviews."""
+
+    def test_highlight(self):
+        """Test every hit in the snippet window is marked."""
+        marked = highlight("Saw a Manta and two mantas", ["manta"])
+        assert marked == "Saw a <mark>Manta</mark> and two <mark>manta</mark>s"
+        assert highlight("Nothing here", ["manta"]) is None
+
+    def test_highlights_escape_html(self):
+        """Test text around and inside the hits is escaped, so only the <mark> tags are markup."""
+        marked = highlight('<img src=x onerror="alert(1)"> manta <b>', ["manta"])
+        assert marked == "&lt;img src=x onerror=&quot;alert(1)&quot;&gt; <mark>manta</mark> &lt;b&gt;"
+        headline = f"<script>{MARK_START}manta{MARK_STOP}</script>"
+        assert marked_headline(headline) == "&lt;script&gt;<mark>manta</mark>&lt;/script&gt;"
+
+    def test_spots_and_reviews_ranked(self, db_session, spot_factory, user_factory, review_factory):
+        """Test name hits outrank description hits, review hits count, and private reviews are ignored."""
+        diver = user_factory()
+        named = spot_factory(name="Manta Point", description="Cleaning station")
+        described = spot_factory(name="Outer Reef", description="Mantas visit in winter")
+        reviewed = spot_factory(name="Black Rock", description="Shore dive")
+        hidden = spot_factory(name="Secret Cove", description="Quiet")
+        review_factory(author_id=diver.id, beach_id=reviewed.id, text="Night dive with a manta overhead")
+        review_factory(author_id=diver.id, beach_id=hidden.id, text="Manta!", is_private=True)
+
+        results = fulltext_search("manta")
+        assert [result["spot"].id for result in results] == [named.id, described.id, reviewed.id]
+        assert results[2]["review_matches"] == 1
+        assert results[2]["highlight"] == "Night dive with a <mark>manta</mark> overhead"
+        assert fulltext_search("manta", limit=1, offset=1)[0]["spot"].id == described.id
+
+    def test_all_words_required(self, db_session, spot_factory):
+        """Test multi-word queries only match documents containing every word."""
+        both = spot_factory(name="Turtle Town", description="Turtles at night")
+        spot_factory(name="Turtle Reef", description="Day dives only")
+        assert [result["spot"].id for result in fulltext_search("turtle night")] == [both.id]
+
+    def test_fulltext_endpoint(self, client, db_session, spot_factory):
+        """Test /search/fulltext returns spot dicts with rank and highlight, without the raw vector."""
+        cache.clear()
+        spot = spot_factory(name="Manta Point", description="Mantas at dusk")
+        response = client.get("/search/fulltext?q=manta")
+        data = response.json["data"]
+        assert [item["id"] for item in data] == [spot.id]
+        assert data[0]["highlight"] == "<mark>Manta</mark>s at dusk"
+        assert "search_vector" not in data[0]
+        assert client.get("/search/fulltext").status_code == 422
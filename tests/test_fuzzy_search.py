@@ -0,0 +1,35 @@
+from app.helpers.fuzzy_search import trigrams, word_similarity
+
+
+class TestFuzzySearch:
+    """Test cases for trigram spot search."""
+
+    def test_trigrams_match_pg_trgm(self):
+        """Test words are padded like pg_trgm's show_trgm."""
+        assert trigrams("Cat") == {"  c", " ca", "cat", "at "}
+
+    def test_word_similarity(self):
+        """Test exact words score 1 and a one-letter typo still clears the match threshold."""
+        assert word_similarity("molokini", "Molokini Crater") == 1.0
+        assert 0.6 <= word_similarity("molokni", "Molokini Crater") < 1.0
+        assert word_similarity("shark", "Molokini Crater") < 0.3
+
+    def test_fuzzy_mode_ranks_by_weighted_fields(self, client, db_session, spot_factory):
+        """Test ?mode=fuzzy tolerates typos and ranks name matches above city and description ones."""
+        described = spot_factory(name="Turtle Town", description="Boat trips out to Molokini daily")
+        named = spot_factory(name="Molokini Crater")
+        city = spot_factory(name="Back Wall", location_city="Molokini")
+        spot_factory(name="Black Rock", description="Shore dive")
+
+        response = client.get("/spots/search?query=molokni&mode=fuzzy")
+        assert [spot["id"] for spot in response.json["data"]] == [named.id, city.id, described.id]
+
+        page = client.get("/spots/search?query=molokni&mode=fuzzy&limit=1&offset=1")
+        assert [spot["id"] for spot in page.json["data"]] == [city.id]
+        assert client.get("/spots/search?query=molokni&mode=fuzzy&cursor=abc").status_code == 400
+
+    def test_short_terms_still_match_substrings(self, client, db_session, spot_factory):
+        """Test terms too short for trigrams fall back to substring matches."""
+        spot = spot_factory(name="Ka'anapali Beach")
+        response = client.get("/spots/search?query=ka&mode=fuzzy")
+        assert [item["id"] for item in response.json["data"]] == [spot.id]
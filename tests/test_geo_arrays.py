@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+
+from app.models import Spot, db
+from app.services.geo_arrays import (
+    ORIGIN_CHUNK,
+    GeoArrays,
+    confidence_scores,
+    haversine,
+    haversine_many,
+    min_distances,
+    sort_by_confidence,
+    top_k,
+)
+
+
+def _scalar_haversine(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 3958.8 * math.asin(math.sqrt(a))
+
+
+class TestGeoArrays:
+    """Test cases for vectorized distance ranking."""
+
+    def test_haversine_matches_scalar(self):
+        """Test the vectorized haversine agrees with the textbook scalar formula."""
+        rng = np.random.default_rng(1)
+        lats, lngs = rng.uniform(-80, 80, 50), rng.uniform(-180, 180, 50)
+        expected = [_scalar_haversine(20.8, -156.3, lat, lng) for lat, lng in zip(lats, lngs)]
+        np.testing.assert_allclose(haversine(20.8, -156.3, lats, lngs), expected)
+
+    def test_many_origins(self):
+        """Test the origins x points matrix matches one haversine call per origin."""
+        lats, lngs = np.array([20.8, 21.3, 33.4]), np.array([-156.3, -157.8, -118.4])
+        matrix = haversine_many([20.0, 34.0], [-156.0, -118.0], lats, lngs)
+        assert matrix.shape == (2, 3)
+        np.testing.assert_allclose(matrix[1], haversine(34.0, -118.0, lats, lngs))
+
+    def test_min_distances_spans_chunks(self):
+        """Test the closest-origin distance is the minimum over every origin, across origin chunks."""
+        rng = np.random.default_rng(2)
+        origin_lats, origin_lngs = rng.uniform(-80, 80, ORIGIN_CHUNK + 5), rng.uniform(-180, 180, ORIGIN_CHUNK + 5)
+        lats, lngs = rng.uniform(-80, 80, 20), rng.uniform(-180, 180, 20)
+        expected = haversine_many(origin_lats, origin_lngs, lats, lngs).min(axis=0)
+        np.testing.assert_allclose(min_distances(origin_lats, origin_lngs, lats, lngs), expected)
+        assert np.isinf(min_distances([], [], lats, lngs)).all()
+
+    def test_top_k(self):
+        """Test argpartition top-k returns the k smallest in order, ties by position."""
+        values = np.array([5.0, 1.0, 3.0, 1.0, 9.0, 0.5])
+        assert list(top_k(values, 3)) == [5, 1, 3]
+        assert list(top_k(values, 2, largest=True)) == [4, 0]
+        assert list(top_k(values, 10)) == [5, 1, 3, 2, 0, 4]
+
+    def test_sort_by_confidence_matches_python_sort(self, db_session, spot_factory):
+        """Test the vectorized top sort keeps the order of the per-spot confidence sort."""
+        spots = [
+            spot_factory(name=f"Spot {i}", rating=str(rating), num_reviews=count)
+            for i, (rating, count) in enumerate([(4.5, 2), (4.0, 40), (5, 0), (4.5, 2), (3.9, 100)])
+        ]
+        expected = sorted(spots, reverse=True, key=lambda spot: spot.get_confidence_score())
+        assert sort_by_confidence(spots) == expected
+        assert confidence_scores(["4"], [0])[0] == 0
+        assert confidence_scores(["", None], [0, None]).tolist() == [0, 0]
+
+    def test_nearest_and_min_distances(self, db_session, spot_factory):
+        """Test loaded arrays answer k-nearest and closest-origin queries."""
+        near = spot_factory(name="Near", latitude=20.81, longitude=-156.3)
+        far = spot_factory(name="Far", latitude=33.4, longitude=-118.4)
+        arrays = GeoArrays(lambda: db.session.query(Spot.id, Spot.latitude, Spot.longitude))
+        arrays.refresh(force=True)
+
+        assert [spot_id for _, spot_id in arrays.nearest(20.8, -156.3, k=1)] == [near.id]
+        assert arrays.nearest(20.8, -156.3, k=5, exclude_ids={near.id})[0][1] == far.id
+
+        ids, miles = arrays.min_distances(np.array([33.0, 21.0]), np.array([-118.0, -156.0]))
+        assert dict(zip(ids.tolist(), miles.tolist()))[far.id] < 50
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from app import cache
+from app.helpers.keyset import decode_cursor, encode_cursor
+from app.models import GeographicNode
+
+
+def walk(client, url, key="data", cursor_path=("next_cursor",)):
+    """Every item of a listing, following cursors until the last page"""
+    items, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        items.extend(item["id"] for item in response.json[key])
+        cursor = response.json
+        for part in cursor_path:
+            cursor = cursor[part]
+        if not cursor:
+            return items
+
+
+class TestKeysetPagination:
+    """Test cases for cursor pagination."""
+
+    def test_cursor_round_trip(self, app):
+        """Test cursors carry datetimes and are tied to their sort order."""
+        posted = datetime(2024, 5, 1, 12, 30)
+        cursor = encode_cursor(["date_posted", "id"], [posted, 7])
+        with app.test_request_context():
+            assert decode_cursor(cursor, ["date_posted", "id"]) == [posted, 7]
+
+    def test_bad_cursors_rejected(self, client, db_session):
+        """Test malformed cursors and cursors from another sort order are 400s."""
+        assert client.get("/reviews/recent?cursor=not-a-cursor").status_code == 400
+        other_sort = encode_cursor(["id"], [3])
+        assert client.get(f"/reviews/recent?cursor={other_sort}").status_code == 400
+
+    def test_reviews_pages_match_offsets(self, client, db_session, sample_spot, user_factory, review_factory):
+        """Test cursor pages break date_posted ties by id and agree with offset pages."""
+        cache.clear()
+        diver = user_factory()
+        same_day = datetime(2024, 1, 1)
+        for day in (1, 1, 1, 2, 3):
+            review_factory(author_id=diver.id, beach_id=sample_spot.id, date_posted=same_day.replace(day=day))
+
+        by_cursor = walk(client, f"/reviews/get?beach_id={sample_spot.id}&limit=2")
+        by_offset = []
+        for offset in (0, 2, 4):
+            response = client.get(f"/reviews/get?beach_id={sample_spot.id}&limit=2&offset={offset}")
+            by_offset.extend(item["id"] for item in response.json["data"])
+        assert len(by_cursor) == 5
+        assert by_cursor == by_offset
+        assert walk(client, f"/review/get?beach_id={sample_spot.id}&limit=3") == by_cursor
+        assert walk(client, "/reviews/recent?limit=2") == by_cursor
+
+    def test_search_pages(self, client, db_session, spot_factory):
+        """Test /spots/search cursor pages cover every match once."""
+        ids = [spot_factory(name=f"Reef {i}").id for i in range(5)]
+        assert walk(client, "/spots/search?query=reef&limit=2") == ids
+
+    def test_geography_pages_skip_count(self, client, db_session, spot_factory):
+        """Test /loc listings page by cursor in sort order and only count without one."""
+        cache.clear()
+        node = GeographicNode(name="Bonaire", short_name="bq", admin_level=0)
+        db_session.add(node)
+        db_session.commit()
+        spots = [
+            spot_factory(name=f"Site {i}", num_reviews=reviews, geographic_node_id=node.id)
+            for i, reviews in enumerate([3, None, 3, 8, 0])
+        ]
+        first = client.get("/loc/bq?sort=most_reviewed&limit=2").json
+        assert first["pagination"]["total"] == 5
+        cursor = first["pagination"]["next_cursor"]
+        second = client.get(f"/loc/bq?sort=most_reviewed&limit=2&cursor={cursor}").json
+        assert "total" not in second["pagination"]
+
+        expected = [spots[i].id for i in (3, 2, 0, 4, 1)]
+        assert walk(client, "/loc/bq?sort=most_reviewed&limit=2", "spots", ("pagination", "next_cursor")) == expected
+        assert len(walk(client, "/loc/bq?sort=latest&limit=2", "spots", ("pagination", "next_cursor"))) == 5
@@ -0,0 +1,84 @@
+import pytest
+
+from app.services.map_clusters import MapClusterIndex, map_clusters
+
+
+@pytest.fixture
+def clustered_spots(spot_factory):
+    spots = [
+        spot_factory(name="Molokini", latitude=20.63, longitude=-156.50, rating="5", num_reviews=12),
+        spot_factory(name="Black Rock", latitude=20.92, longitude=-156.69, rating="4", num_reviews=30),
+        spot_factory(name="Hanauma Bay", latitude=21.27, longitude=-157.69, rating="4", num_reviews=50),
+        spot_factory(name="Casino Point", latitude=33.35, longitude=-118.33, rating="3", num_reviews=4),
+    ]
+    return spots
+
+
+class TestMapClusterIndex:
+    """Test cases for the map viewport cluster index."""
+
+    def test_low_zoom_clusters(self, db_session, clustered_spots):
+        """Test low zoom viewports get counts, centroids and the top rated spot per cell."""
+        index = MapClusterIndex()
+        index.refresh(force=True)
+
+        clusters = index.clusters(-170, 10, -110, 40, zoom=2)
+        assert sorted(cluster["count"] for cluster in clusters) == [1, 3]
+        hawaii = next(cluster for cluster in clusters if cluster["count"] == 3)
+        assert hawaii["top_spot"]["name"] == "Molokini"
+        assert hawaii["latitude"] == pytest.approx((20.63 + 20.92 + 21.27) / 3)
+
+    def test_high_zoom_points(self, db_session, clustered_spots):
+        """Test zoomed-in viewports get only the spots inside the box."""
+        index = MapClusterIndex()
+        index.refresh(force=True)
+
+        points = index.points(-156.8, 20.5, -156.4, 21.0)
+        assert sorted(point["name"] for point in points) == ["Black Rock", "Molokini"]
+
+    def test_refresh_moves_spot_between_clusters(self, db_session, clustered_spots):
+        """Test an updated spot leaves its old cluster and joins the new one on refresh."""
+        index = MapClusterIndex()
+        index.refresh(force=True)
+
+        clustered_spots[0].latitude, clustered_spots[0].longitude = 33.4, -118.4
+        db_session.commit()
+        index.refresh(force=True)
+
+        counts = {cluster["geohash"]: cluster["count"] for cluster in index.clusters(-170, 10, -110, 40, zoom=2)}
+        assert sorted(counts.values()) == [2, 2]
+
+    def test_map_endpoint(self, client, db_session, clustered_spots):
+        """Test /spots/map switches from clusters to points with zoom."""
+        map_clusters.clear()
+        try:
+            # The first request only starts the build, on a background thread
+            assert client.get("/spots/map?bbox=-170,10,-110,40&zoom=3").status_code == 503
+            map_clusters._build_thread.join()
+            response = client.get("/spots/map?bbox=-170,10,-110,40&zoom=3")
+            assert response.json["type"] == "clusters"
+
+            response = client.get("/spots/map?bbox=-156.8,20.5,-156.4,21.0&zoom=13")
+            assert response.json["type"] == "points"
+            assert len(response.json["data"]) == 2
+
+            assert client.get("/spots/map?zoom=3").status_code == 422
+        finally:
+            map_clusters.clear()
+
+    def test_due_rebuild_runs_in_the_background(self, app, db_session, clustered_spots):
+        """Test a due rebuild runs on the build thread and swaps in the full scan when it finishes."""
+        index = MapClusterIndex()
+        index.refresh(force=True)
+        clustered_spots[3].is_verified = False
+        db_session.commit()
+        index._built_at -= index.rebuild_interval
+
+        index.refresh(max_age=0, background=True)
+        index._build_thread.join()
+        assert index.ready
+        assert sorted(point["name"] for point in index.points(-170, 10, -110, 40)) == [
+            "Black Rock",
+            "Hanauma Bay",
+            "Molokini",
+        ]
@@ -0,0 +1,45 @@
+from app.models import DiveShop
+
+
+class TestNameNormalized:
+    """Test cases for the persisted normalized name columns."""
+
+    def test_kept_in_step_with_name(self, db_session, spot_factory, sample_locality):
+        """Test name_normalized is filled on insert and follows name on update."""
+        spot = spot_factory(name="Plage de l'Anse Crève-Cœur")
+        assert spot.name_normalized == "plage de lanse creve coeur"
+        spot.name = "Anse Noire"
+        db_session.commit()
+        assert spot.name_normalized == "anse noire"
+        assert sample_locality.name_normalized == "santa monica"
+
+    def test_spot_search_ignores_accents(self, client, db_session, spot_factory):
+        """Test /spots/search matches names whatever their accents or case."""
+        spot = spot_factory(name="Playa Jardín")
+        spot_factory(name="Lagoon")
+        for query in ("jardin", "JARDÍN", "playa-jardin"):
+            assert [item["id"] for item in client.get(f"/spots/search?query={query}").json["data"]] == [spot.id]
+
+    def test_location_lookup_ignores_accents(self, client, db_session, spot_factory, sample_locality):
+        """Test /spots/location finds a locality from a differently cased or accented name."""
+        spot = spot_factory(name="Pier", locality_id=sample_locality.id)
+        response = client.get("/spots/location?type=locality&name=santa%20mónica")
+        assert [item["id"] for item in response.json["data"]] == [spot.id]
+        assert client.get("/spots/location?type=country&name=UNITED%20STATES").status_code == 200
+
+    def test_shop_typeahead_ignores_accents(self, client, db_session):
+        """Test /shop/typeahead matches shop names without their accents."""
+        db_session.add(DiveShop(name="Plongée Côte Bleue", city="Marseille"))
+        db_session.commit()
+        response = client.get("/shop/typeahead?query=plongee%20cote")
+        assert [item["text"] for item in response.json["data"]] == ["Plongée Côte Bleue"]
+
+    def test_punctuation_only_terms_match_nothing(self, client, db_session, spot_factory):
+        """Test a term that normalizes to nothing returns no spots or shops instead of all of them."""
+        spot_factory(name="Lagoon")
+        db_session.add(DiveShop(name="Reef Divers", city="Kona"))
+        db_session.commit()
+        for query in ("%21%21", "-", "%25"):
+            assert client.get(f"/spots/search?query={query}").json["data"] == []
+            assert client.get(f"/spots/search?query={query}&mode=fuzzy").json["data"] == []
+            assert client.get(f"/shop/typeahead?query={query}").json["data"] == []
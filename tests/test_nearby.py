@@ -0,0 +1,165 @@
+import os
+import random
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, event, or_, text
+
+from app import db
+from app.helpers.distance import spot_distance
+from app.helpers.geohash import covering_prefixes, encode
+from app.helpers.nearby import bounding_box, filter_within_radius, nearest
+from app.models import Spot
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+class TestBoundingBox:
+    """Test cases for the lat/lng bounding box."""
+
+    @pytest.mark.parametrize("latitude", [0.0, 21.3, -45.0, 71.5])
+    def test_box_contains_everything_in_radius(self, latitude):
+        """Test no point within the radius falls outside the box, even far from the equator."""
+        rng = random.Random(latitude)
+        longitude, radius = -157.8, 80
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius)
+        for _ in range(5000):
+            point_lat = latitude + rng.uniform(-2, 2)
+            point_lng = longitude + rng.uniform(-6, 6)
+            if spot_distance(latitude, longitude, point_lat, point_lng) <= radius:
+                assert min_lat <= point_lat <= max_lat
+                assert min_lng <= point_lng <= max_lng
+
+    def test_box_near_pole_drops_longitude(self):
+        """Test longitude stops constraining once the box reaches a pole."""
+        assert bounding_box(89.5, 10.0, 100)[2:] == (None, None)
+        assert bounding_box(0.0, 0.0, 20000) is None
+
+
+class TestGeohash:
+    """Test cases for geohash encoding and covering prefixes."""
+
+    def test_encode_known_value(self):
+        """Test encoding matches the reference geohash."""
+        assert encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+        assert encode(None, 10.0) is None
+
+    def test_covering_prefixes_cover_box(self):
+        """Test every point in a box has a geohash starting with one of the covering prefixes."""
+        rng = random.Random(5)
+        box = bounding_box(20.8, -156.3, 40)
+        prefixes = covering_prefixes(*box)
+        assert 0 < len(prefixes) <= 16
+        for _ in range(2000):
+            point = encode(rng.uniform(box[0], box[1]), rng.uniform(box[2], box[3]))
+            assert any(point.startswith(prefix) for prefix in prefixes)
+
+    def test_column_follows_location(self, db_session, spot_factory):
+        """Test the stored geohash is set on insert and follows lat/lng updates."""
+        spot = spot_factory(latitude=20.8, longitude=-156.3)
+        assert spot.geohash == encode(20.8, -156.3)
+
+        spot.latitude = 21.3
+        db_session.commit()
+        assert spot.geohash == encode(21.3, -156.3)
+
+
+class TestNearest:
+    """Test cases for bounding-box k-nearest queries."""
+
+    def test_matches_unfiltered_order(self, db_session, spot_factory):
+        """Test the widened box returns the same spots as sorting the whole table."""
+        rng = random.Random(3)
+        for i in range(40):
+            spot_factory(name=f"Spot {i}", latitude=rng.uniform(-30, 30), longitude=rng.uniform(-30, 30))
+
+        base = Spot.query.filter(Spot.is_verified)
+        expected = base.order_by(Spot.distance(1.5, 2.5)).limit(12).all()
+        assert nearest(base, Spot, "1.5", "2.5", 12) == expected
+
+    def test_dense_area_needs_one_query(self, db_session, spot_factory):
+        """Test a k-nearest lookup in a dense area is answered by the first box."""
+        for i in range(10):
+            spot_factory(name=f"Spot {i}", latitude=20.8 + i * 0.01, longitude=-156.3)
+
+        with count_queries(db.engine) as statements:
+            results = nearest(db.session.query(Spot.id, Spot.latitude, Spot.longitude), Spot, 20.8, -156.3, 5)
+        assert len(results) == 5
+        assert len(statements) == 1
+        assert "BETWEEN" in statements[0]
+
+    def test_sparse_area_widens_until_full(self, db_session, spot_factory):
+        """Test the box widens a bounded number of times when nothing is close by."""
+        for i in range(3):
+            spot_factory(name=f"Spot {i}", latitude=40.0 + i, longitude=-70.0)
+
+        with count_queries(db.engine) as statements:
+            results = nearest(db.session.query(Spot.id, Spot.latitude, Spot.longitude), Spot, 0.0, 0.0, 3)
+        assert len(results) == 3
+        assert 1 < len(statements) <= 6
+
+    def test_within_radius(self, db_session, spot_factory):
+        """Test the radius filter keeps only rows within the radius."""
+        near = spot_factory(name="Near", latitude=20.8, longitude=-156.3)
+        spot_factory(name="Far", latitude=21.8, longitude=-156.3)
+
+        results = filter_within_radius(Spot.query, Spot, 20.81, -156.3, 50).all()
+        assert results == [near]
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+class TestNearestPostgresPlan:
+    """Test cases for the Postgres plan of bounding-box queries."""
+
+    def test_box_query_uses_location_index(self):
+        """Test the first box of a k-nearest query is answered from a location index, not a scan."""
+        engine = create_engine(POSTGRES_URL)
+        db.metadata.create_all(engine)
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            try:
+                rng = random.Random(11)
+                connection.execute(
+                    Spot.__table__.insert(),
+                    [
+                        {
+                            "name": f"Plan {i}",
+                            "latitude": latitude,
+                            "longitude": longitude,
+                            "geohash": encode(latitude, longitude),
+                            "is_verified": True,
+                        }
+                        for i, (latitude, longitude) in enumerate(
+                            (rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(5000)
+                        )
+                    ],
+                )
+                connection.execute(text("ANALYZE spot"))
+
+                box = bounding_box(20.8, -156.3, 25)
+                query = Spot.__table__.select().where(
+                    or_(*[Spot.geohash.startswith(prefix) for prefix in covering_prefixes(*box)])
+                )
+                query = query.where(Spot.latitude.between(box[0], box[1]))
+                query = query.where(Spot.longitude.between(box[2], box[3]))
+                query = query.order_by(Spot.distance(20.8, -156.3)).limit(25)
+                compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+                plan = "\n".join(row[0] for row in connection.execute(text(f"EXPLAIN {compiled}")))
+                assert "ix_spot_geohash" in plan or "ix_spot_latitude_longitude" in plan
+                assert "Seq Scan" not in plan
+            finally:
+                transaction.rollback()
@@ -0,0 +1,119 @@
+import pytest
+
+from app.helpers import send_notifications
+from app.helpers.send_notifications import (
+    claim_notification_job,
+    process_notification_job,
+    process_notification_jobs,
+    queue_notification,
+)
+from app.models import NotificationJob
+from app.services.pinpoint import StubPinpointClient
+
+
+@pytest.fixture
+def nearby_users(user_factory):
+    def _create(count, latitude=20.8, longitude=-156.3, prefix="diver"):
+        return [
+            user_factory(
+                email=f"{prefix}{i}@example.com",
+                username=f"{prefix}{i}",
+                latitude=latitude,
+                longitude=longitude,
+                push_token=f"{prefix}-token-{i}",
+            )
+            for i in range(count)
+        ]
+
+    return _create
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(send_notifications, "RETRY_BACKOFF_SECONDS", 0)
+
+
+class TestNotificationJobs:
+    """Test cases for the background review notification fan-out."""
+
+    def test_batches_recipients(self, db_session, nearby_users):
+        """Test recipients are sent in multi-address requests of at most BATCH_SIZE."""
+        nearby_users(250)
+        nearby_users(3, latitude=40.7, longitude=-74.0, prefix="nyc")
+        client = StubPinpointClient()
+
+        job = queue_notification(20.8, -156.3, "New activity", "Great vis today")
+        assert process_notification_job(job, client=client)
+
+        sizes = [len(call["MessageRequest"]["Addresses"]) for call in client.calls]
+        assert sizes == [100, 100, 50]
+        assert job.status == "sent"
+        assert job.recipients_sent == 250
+
+    def test_retries_transient_failures(self, db_session, nearby_users):
+        """Test throttled addresses are retried inline and only they are resent."""
+        nearby_users(5)
+        client = StubPinpointClient(failures={"diver-token-2": "THROTTLED"})
+
+        job = queue_notification(20.8, -156.3, "New activity", "Great vis today")
+        assert process_notification_job(job, client=client)
+
+        assert len(client.calls) == 2
+        assert list(client.calls[1]["MessageRequest"]["Addresses"]) == ["diver-token-2"]
+
+    def test_reschedules_undelivered(self, db_session, nearby_users, monkeypatch):
+        """Test a job whose sends keep failing stays pending and only retries the failures."""
+        nearby_users(3)
+        monkeypatch.setattr(send_notifications, "SEND_RETRIES", 1)
+        client = StubPinpointClient(failures={"diver-token-0": "TEMPORARY_FAILURE"})
+
+        job = queue_notification(20.8, -156.3, "New activity", "Great vis today")
+        assert not process_notification_job(job, client=client)
+        assert job.status == "pending"
+        assert job.pending_tokens == ["diver-token-0"]
+
+        assert process_notification_job(job, client=client)
+        assert list(client.calls[-1]["MessageRequest"]["Addresses"]) == ["diver-token-0"]
+        assert job.recipients_sent == 3
+
+    def test_process_due_jobs(self, app, db_session, nearby_users):
+        """Test the CLI entry point sends every due job through the configured client."""
+        nearby_users(2)
+        app.config["PINPOINT_CLIENT"] = "stub"
+        try:
+            queue_notification(20.8, -156.3, "New activity", "Great vis today")
+            result = process_notification_jobs()
+        finally:
+            app.config.pop("PINPOINT_CLIENT")
+
+        assert result == {"sent": 1, "failed": 0, "total_processed": 1}
+        assert NotificationJob.query.one().status == "sent"
+
+    def test_rejected_addresses_are_counted_separately(self, db_session, nearby_users):
+        """Test addresses Pinpoint refuses for good are neither retried nor counted as sent."""
+        nearby_users(4)
+        client = StubPinpointClient(failures={"diver-token-1": "OPT_OUT"})
+
+        job = queue_notification(20.8, -156.3, "New activity", "Great vis today")
+        assert process_notification_job(job, client=client)
+        assert len(client.calls) == 1
+        assert job.recipients_sent == 3
+        assert job.recipients_failed == 1
+
+    def test_overlapping_runs_claim_a_job_once(self, app, db_session, nearby_users):
+        """Test a job claimed by one run is skipped by another until its lease runs out."""
+        nearby_users(2)
+        job = queue_notification(20.8, -156.3, "New activity", "Great vis today")
+        assert claim_notification_job(job)
+        assert job.status == "processing"
+        assert not claim_notification_job(job)
+
+        app.config["PINPOINT_CLIENT"] = "stub"
+        try:
+            assert process_notification_jobs() == {"sent": 0, "failed": 0, "total_processed": 0}
+            job.scheduled_for -= send_notifications.CLAIM_LEASE
+            db_session.commit()
+            assert process_notification_jobs() == {"sent": 1, "failed": 0, "total_processed": 1}
+        finally:
+            app.config.pop("PINPOINT_CLIENT")
+        assert job.status == "sent"
@@ -0,0 +1,60 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import cache
+from app.services.recommendations import recommend_spot_ids, spot_features
+
+
+@pytest.fixture
+def recs(db_session, spot_factory, user_factory):
+    """A diver in Maui, a popular far-away spot and two unreviewed spots near home."""
+    cache.clear()
+    diver = user_factory(latitude=20.8, longitude=-156.3)
+    spots = {
+        "home": spot_factory(name="Home Reef", latitude=20.85, longitude=-156.3, num_reviews=3, rating=4.5),
+        "near": spot_factory(name="Near Reef", latitude=20.9, longitude=-156.4, num_reviews=2, rating=4.0),
+        "far": spot_factory(name="Far Reef", latitude=25.0, longitude=-80.0, num_reviews=5, rating=4.5),
+    }
+    spot_features.refresh(force=True)
+    return diver, spots
+
+
+class TestRecommendations:
+    """Test cases for geo-ranked spot recommendations."""
+
+    def test_proximity_outranks_popularity(self, recs):
+        """Test nearby spots beat a slightly more popular spot across the world."""
+        diver, spots = recs
+        ids = recommend_spot_ids(diver.id)
+        assert ids == [spots["home"].id, spots["near"].id, spots["far"].id]
+
+        florida = recommend_spot_ids(diver.id, 25.0, -80.0)
+        assert florida[0] == spots["far"].id
+
+    def test_reviewed_spots_excluded(self, recs, review_factory):
+        """Test a new review drops the reviewed spot without any explicit invalidation."""
+        diver, spots = recs
+        assert spots["home"].id in recommend_spot_ids(diver.id)
+
+        review_factory(author_id=diver.id, beach_id=spots["home"].id)
+        assert recommend_spot_ids(diver.id) == [spots["near"].id, spots["far"].id]
+
+    def test_closest_visited_spot_without_home(self, recs, user_factory, spot_factory, review_factory):
+        """Test a user without a home location is ranked by distance to the nearest spot they've reviewed."""
+        _, spots = recs
+        # Halfway between the traveller's two areas, where a single central point would land
+        middle = spot_factory(name="Mid Pacific", latitude=28.0, longitude=-118.0, num_reviews=2, rating=4.0)
+        spot_features.refresh(force=True)
+        traveller = user_factory(email="traveller@example.com", username="traveller")
+        review_factory(author_id=traveller.id, beach_id=spots["home"].id)
+        review_factory(author_id=traveller.id, beach_id=spots["far"].id)
+        assert recommend_spot_ids(traveller.id) == [spots["near"].id, middle.id]
+
+    def test_recs_endpoint(self, client, recs):
+        """Test /spots/recs returns ranked spot dicts and needs a user."""
+        diver, spots = recs
+        headers = {"Authorization": f"Bearer {create_access_token(identity=diver.id)}"}
+        response = client.get("/spots/recs?lat=25.0&lng=-80.0", headers=headers)
+        assert response.json["data"][0]["id"] == spots["far"].id
+        assert client.get("/spots/recs").status_code == 401
+        assert client.get("/spots/recs?lat=abc&lng=-80.0", headers=headers).status_code == 422
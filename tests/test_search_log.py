@@ -0,0 +1,101 @@
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.models import SearchQuery
+from app.services.search_log import SearchQueryLog, query_shape, search_log, search_report
+from app.services.typeahead_cache import typeahead_cache
+from app.services.typeahead_index import typeahead_index
+
+
+@pytest.fixture
+def log(db_session):
+    search_log.clear()
+    typeahead_index.clear()
+    typeahead_cache.clear()
+    yield search_log
+    search_log.clear()
+    if typeahead_index._build_thread is not None:
+        typeahead_index._build_thread.join()
+    typeahead_index.clear()
+
+
+class TestSearchLog:
+    """Test cases for the buffered search query log."""
+
+    def test_query_shape(self):
+        """Test queries are bucketed by word count and normalized length."""
+        assert query_shape("") == "0 words, 0 chars"
+        assert query_shape("ma") == "1 word, 1-2 chars"
+        assert query_shape("manta ray") == "2 words, 6-10 chars"
+        assert query_shape("a b c d e f") == "4+ words, 11-20 chars"
+
+    def test_requests_are_buffered_until_flushed(self, client, log, spot_factory):
+        """Test searches only reach the table when the buffer is flushed, in one batch."""
+        spot_factory(name="Molokini Crater")
+        client.get("/search/typeahead?query=molo")
+        client.get("/spots/search?query=Molokini")
+        client.get("/spots/search?query=Molokini&offset=50")
+        assert len(log) == 2
+        assert SearchQuery.query.count() == 0
+
+        assert log.flush() == 2
+        rows = {row.endpoint: row for row in SearchQuery.query}
+        assert rows["typeahead"].normalized == "molo"
+        assert rows["typeahead"].result_count == 1
+        assert rows["spots"].text == "Molokini"
+        assert rows["spots"].latency_ms >= 0
+        assert log.flush() == 0
+
+    def test_cached_views_are_logged_on_every_call(self, app, client, log, db_session):
+        """Test views behind @cache.cached are recorded per request, built or cached responses alike."""
+        client.get("/search/fulltext?q=manta")
+        client.get("/shop/typeahead?query=reef")
+        assert [row["endpoint"] for row in log._buffer] == ["fulltext", "shops"]
+
+        cached = log.logged("shops", "query")(
+            lambda: app.response_class('{"data": [1, 2]}', mimetype="application/json")
+        )
+        with app.test_request_context("/shop/typeahead?query=reef"):
+            cached()
+        assert log._buffer[-1]["result_count"] == 2
+
+    def test_full_buffer_keeps_newest(self, app):
+        """Test a buffer the database can't keep up with drops its oldest rows."""
+        log = SearchQueryLog(max_buffer=2)
+        with app.test_request_context():
+            for query in ("a", "b", "c"):
+                log.record("typeahead", query, 0, time.perf_counter())
+        assert [row["text"] for row in log._buffer] == ["b", "c"]
+        assert log.dropped == 1
+
+    def test_report(self, log, app, db_session):
+        """Test the report ranks zero-result queries by frequency and shapes by latency."""
+        with app.test_request_context():
+            for query, results, seconds in [
+                ("Mantá", 0, 0.0),
+                ("manta", 0, 0.0),
+                ("turtles", 0, 0.0),
+                ("", 0, 0.0),
+                ("turtle reef", 4, 0.5),
+            ]:
+                log.record("typeahead", query, results, time.perf_counter() - seconds)
+        log.flush()
+        report = search_report()
+        assert [(row["query"], row["count"]) for row in report["zero_results"]] == [("manta", 2), ("turtles", 1)]
+        slowest = report["slowest_shapes"][0]
+        assert slowest["shape"] == "2 words, 11-20 chars"
+        assert slowest["avg_ms"] >= 500
+        assert report["slowest_shapes"][1]["zero_result_rate"] == 1
+
+    def test_analytics_endpoint_requires_admin(self, client, log, user_factory):
+        """Test /search/analytics is admin only and includes this worker's unflushed rows."""
+        client.get("/search/typeahead?query=nowhere")
+        user = user_factory()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=user.id)}"}
+        assert client.get("/search/analytics", headers=headers).status_code == 403
+        admin = user_factory(admin=True, email="admin@example.com", username="adminuser")
+        headers = {"Authorization": f"Bearer {create_access_token(identity=admin.id)}"}
+        response = client.get("/search/analytics", headers=headers)
+        assert response.json["data"]["zero_results"][0]["query"] == "nowhere"
@@ -0,0 +1,89 @@
+import pytest
+from flask import Flask
+from flask_caching import Cache
+from redis.exceptions import ConnectionError
+
+from app.services.shared_cache import SharedRedisCache, fake_redis
+
+SHARED = {"CACHE_TYPE": "app.services.shared_cache.SharedRedisCache", "CACHE_REDIS_URL": "fake://"}
+
+
+@pytest.fixture
+def server():
+    fake_redis.down = False
+    fake_redis.flushdb()
+    yield fake_redis
+    fake_redis.down = False
+    fake_redis.flushdb()
+
+
+def worker(**config):
+    """A separate app with its own Cache, as a gunicorn worker would have"""
+    app = Flask(__name__)
+    cache = Cache(app, config={**SHARED, **config})
+    calls = []
+
+    @app.route("/slow")
+    @cache.cached()
+    def slow():
+        calls.append(1)
+        return {"calls": len(calls)}
+
+    return app, cache, calls
+
+
+class TestSharedCache:
+    """Test cases for the shared Redis cache backend and its in-process stand-in."""
+
+    def test_fake_redis_semantics(self, server):
+        """Test the stand-in follows Redis for nx sets, expiry and counters."""
+        assert server.set("a", "1", ex=60)
+        assert server.set("a", "2", nx=True) is None
+        assert server.get("a") == b"1"
+        assert 0 < server.ttl("a") <= 60
+        server.set("b", "x", px=1)
+        server._expires["b"] -= 1
+        assert server.get("b") is None
+        assert server.incr("n", 5) == 5
+        assert server.mget(["a", "missing"]) == [b"1", None]
+        assert server.keys("a*") == ["a"]
+
+    def test_workers_share_entries(self, server):
+        """Test a response cached by one worker is served by another."""
+        first, first_cache, first_calls = worker()
+        second, second_cache, second_calls = worker()
+        first.test_client().get("/slow")
+        assert second.test_client().get("/slow").json == {"calls": 1}
+        assert second_calls == []
+        with second.app_context():
+            assert isinstance(second_cache.cache, SharedRedisCache)
+            second_cache.set("recs", [1, 2, 3])
+        with first.app_context():
+            assert first_cache.get("recs") == [1, 2, 3]
+
+    def test_outage_fails_open(self, server):
+        """Test a down server turns cache calls into misses and backs off before retrying."""
+        app, cache, calls = worker(CACHE_REDIS_RETRY_SECONDS=60)
+        client = app.test_client()
+        client.get("/slow")
+        server.down = True
+        assert client.get("/slow").status_code == 200
+        assert client.get("/slow").status_code == 200
+        assert len(calls) == 3
+        with app.app_context():
+            assert cache.get("anything") is None
+            assert cache.set("anything", 1) is False
+            assert cache.cache.errors == 1
+
+            server.down = False
+            assert cache.get("anything") is None
+            cache.cache._down_until = 0
+            cache.set("anything", 1)
+            assert cache.get("anything") == 1
+
+    def test_fail_closed(self, server):
+        """Test errors propagate when fail-open is turned off."""
+        app, cache, _ = worker(CACHE_FAIL_OPEN=False)
+        server.down = True
+        with app.app_context(), pytest.raises(ConnectionError):
+            cache.get("anything")
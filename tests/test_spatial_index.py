@@ -0,0 +1,91 @@
+import random
+
+from app.helpers.distance import spot_distance
+from app.helpers.get_nearby_spots import get_nearby_spots
+from app.models import Spot
+from app.services.spatial_index import SpotSpatialIndex, spot_index
+
+
+def _scatter_spots(spot_factory, count=60, seed=7):
+    rng = random.Random(seed)
+    spots = []
+    for i in range(count):
+        spots.append(
+            spot_factory(
+                name=f"Spot {i}",
+                latitude=rng.uniform(18.5, 22.5),
+                longitude=rng.uniform(-160.5, -154.5),
+            )
+        )
+    return spots
+
+
+class TestSpotSpatialIndex:
+    """Test cases for the in-process spot spatial index."""
+
+    def test_nearest_matches_sql_order(self, db_session, spot_factory):
+        """Test k-nearest ids come back in the same order as the SQL distance sort."""
+        _scatter_spots(spot_factory)
+        index = SpotSpatialIndex()
+        index.refresh(force=True)
+
+        latitude, longitude = 20.8, -156.3
+        expected = [
+            spot.id
+            for spot in Spot.query.filter(Spot.is_verified).order_by(Spot.distance(latitude, longitude)).limit(15).all()
+        ]
+        assert [spot_id for _, spot_id in index.nearest(latitude, longitude, 15)] == expected
+
+    def test_nearest_excludes_spot(self, db_session, spot_factory):
+        """Test the origin spot is left out of its own nearby list."""
+        spots = _scatter_spots(spot_factory, count=10)
+        index = SpotSpatialIndex()
+        index.refresh(force=True)
+
+        origin = spots[0]
+        results = index.nearest(origin.latitude, origin.longitude, 5, exclude_id=origin.id)
+        assert origin.id not in [spot_id for _, spot_id in results]
+        assert len(results) == 5
+
+    def test_within_radius(self, db_session, spot_factory):
+        """Test radius queries return every spot inside the radius, closest first."""
+        spots = _scatter_spots(spot_factory)
+        index = SpotSpatialIndex()
+        index.refresh(force=True)
+
+        latitude, longitude, radius = 20.8, -156.3, 60
+        expected = sorted(
+            spot.id for spot in spots if spot_distance(latitude, longitude, spot.latitude, spot.longitude) <= radius
+        )
+        results = index.within(latitude, longitude, radius)
+        assert sorted(spot_id for _, spot_id in results) == expected
+        assert [distance for distance, _ in results] == sorted(distance for distance, _ in results)
+
+    def test_refresh_applies_updates(self, db_session, spot_factory):
+        """Test unverifying a spot drops it from the index on the next refresh."""
+        spots = _scatter_spots(spot_factory, count=5)
+        index = SpotSpatialIndex()
+        index.refresh(force=True)
+        assert len(index) == 5
+
+        spots[0].is_verified = False
+        db_session.commit()
+        index.refresh(force=True)
+        assert len(index) == 4
+
+    def test_get_nearby_spots_uses_index(self, app, db_session, spot_factory):
+        """Test get_nearby_spots returns the same spots with and without the index."""
+        _scatter_spots(spot_factory, count=30)
+        spot_index.clear()
+        get_nearby_spots(20.8, -156.3, 10)
+        spot_index._build_thread.join()
+        assert spot_index.ready
+
+        from_index = get_nearby_spots(20.8, -156.3, 10)
+        app.config["SPATIAL_INDEX_ENABLED"] = False
+        try:
+            from_sql = get_nearby_spots(20.8, -156.3, 10)
+        finally:
+            app.config.pop("SPATIAL_INDEX_ENABLED")
+            spot_index.clear()
+        assert [spot.id for spot in from_index] == [spot.id for spot in from_sql]
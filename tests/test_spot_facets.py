@@ -0,0 +1,108 @@
+import pytest
+
+from app import cache
+from app.models import Tag
+from app.services.spot_facets import bitset, depth_bucket, rating_buckets, spot_facets
+
+
+@pytest.fixture
+def facets(db_session):
+    spot_facets.clear()
+    cache.clear()
+    yield spot_facets
+    if spot_facets._build_thread is not None:
+        spot_facets._build_thread.join()
+    spot_facets.clear()
+
+
+class TestSpotFacets:
+    """Test cases for the facet bitset index."""
+
+    def test_buckets(self):
+        """Test free-text depths and string ratings land in the right buckets."""
+        assert bitset([0, 3, 9]) == 0b1000001001
+        assert depth_bucket("18") == "10-20m"
+        assert depth_bucket("60 ft") == "10-20m"
+        assert depth_bucket("45m") == "30m+"
+        assert depth_bucket(None) is None
+        assert rating_buckets("3.5") == ["3+", "2+", "1+"]
+        assert rating_buckets(None) == []
+
+    def test_counts_are_disjunctive(self, facets, db_session, spot_factory, review_factory, user_factory):
+        """Test each facet's counts apply the other selected filters but not its own."""
+        shore = Tag(text="Shore", type="Access", short_name="shore")
+        boat = Tag(text="Boat", type="Access", short_name="boat")
+        easy = spot_factory(name="Easy Shore", difficulty="beginner", max_depth="8", rating="4.5")
+        easy.tags.append(shore)
+        hard = spot_factory(name="Hard Shore", difficulty="advanced", max_depth="35m", rating="3")
+        hard.tags.append(shore)
+        wreck = spot_factory(name="Wreck", difficulty="advanced")
+        wreck.tags.append(boat)
+        db_session.commit()
+        diver = user_factory()
+        review_factory(author_id=diver.id, beach_id=easy.id, activity_type="snorkel")
+        review_factory(author_id=diver.id, beach_id=wreck.id, activity_type="scuba", is_private=True)
+        facets.refresh(force=True)
+
+        ids = [easy.id, hard.id, wreck.id]
+        counts = facets.counts(ids)
+        assert counts["difficulty"] == {"beginner": 1, "advanced": 2}
+        assert counts["entry"] == {"shore": 2, "boat": 1}
+        assert counts["max_depth"] == {"0-10m": 1, "30m+": 1}
+        assert counts["rating"] == {"4+": 1, "3+": 2, "2+": 2, "1+": 2}
+        assert counts["activity"] == {"snorkel": 1}
+
+        selected = facets.counts(ids, {"difficulty": "advanced", "entry": None})
+        assert selected["difficulty"] == {"beginner": 1, "advanced": 2}
+        assert selected["entry"] == {"shore": 1, "boat": 1}
+        assert facets.counts([hard.id], {"entry": "boat"})["difficulty"] == {}
+
+    def test_incremental_refresh(self, facets, db_session, spot_factory):
+        """Test refreshes move a spot between values without a rebuild."""
+        spot = spot_factory(name="Molokini", difficulty="beginner")
+        facets.refresh(force=True)
+        assert facets.counts([spot.id])["difficulty"] == {"beginner": 1}
+        spot.difficulty = "intermediate"
+        db_session.commit()
+        facets.refresh(force=True)
+        assert facets.counts([spot.id])["difficulty"] == {"intermediate": 1}
+
+    def test_due_rebuild_keeps_serving_the_old_bitsets(self, facets, db_session, spot_factory):
+        """Test a due rebuild runs on the build thread and swaps in synced bitsets when it finishes."""
+        spot = spot_factory(name="Molokini", difficulty="beginner")
+        facets.refresh(force=True)
+        spot.difficulty = "advanced"
+        db_session.commit()
+        facets._built_at -= facets.rebuild_interval
+
+        facets.refresh(max_age=0, background=True)
+        facets._build_thread.join()
+        assert not facets._dirty
+        assert facets.counts([spot.id])["difficulty"] == {"advanced": 1}
+
+    def test_search_and_get_return_facets(self, client, facets, spot_factory, sample_locality):
+        """Test /spots/search and /spots/get include counts when asked, once the background build has landed."""
+        spot_factory(name="Reef One", difficulty="beginner")
+        spot_factory(name="Reef Two", difficulty="advanced")
+        spot_factory(
+            name="Local Cove",
+            difficulty="beginner",
+            locality_id=sample_locality.id,
+            area_two_id=sample_locality.area_two_id,
+            area_one_id=sample_locality.area_one_id,
+            country_id=sample_locality.country_id,
+        )
+        response = client.get("/spots/search?query=reef&difficulty=beginner&facets=1")
+        assert len(response.json["data"]) == 1
+        assert "facets" not in response.json
+        facets._build_thread.join()
+        response = client.get("/spots/search?query=reef&difficulty=beginner&facets=1")
+        assert response.json["facets"]["difficulty"] == {"advanced": 1, "beginner": 1}
+        assert "facets" not in client.get("/spots/search?query=reef").json
+        assert client.get("/spots/search?query=reef&mode=fuzzy&facets=1").json["facets"]["difficulty"] == {
+            "advanced": 1,
+            "beginner": 1,
+        }
+
+        response = client.get("/spots/get?country=us&area_one=ca&area_two=la&locality=santa-monica&facets=1")
+        assert response.json["facets"]["difficulty"] == {"beginner": 1}
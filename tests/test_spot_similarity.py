@@ -0,0 +1,56 @@
+from app.helpers.spot_similarity import build_similar_spots, similar_spots
+from app.models import SpotSimilarity
+
+
+class TestSpotSimilarity:
+    """Test cases for co-review similar spots."""
+
+    def test_cosine_over_shared_reviewers(self):
+        """Test scores are shared reviewers over the geometric mean of each spot's reviewers."""
+        pairs = [(1, 10), (1, 20), (2, 10), (2, 20), (3, 10), (3, 30), (4, 10), (4, 30), (4, 30)]
+        neighbors = similar_spots(pairs, min_co_reviewers=2)
+
+        assert [neighbor[0] for neighbor in neighbors[10]] == [20, 30]
+        assert neighbors[20] == [(10, 2 / (4 * 2) ** 0.5, 2)]
+        assert 20 not in [neighbor[0] for neighbor in neighbors[30]]
+
+    def test_min_co_reviewers_and_k(self):
+        """Test pairs below the co-reviewer floor are dropped and each spot keeps at most k."""
+        pairs = [(user, spot) for user in range(3) for spot in range(5)] + [(9, 5), (9, 0)]
+        neighbors = similar_spots(pairs, k=2, min_co_reviewers=2)
+
+        assert len(neighbors[0]) == 2
+        assert 5 not in neighbors
+
+    def test_build_and_endpoint(self, client, db_session, spot_factory, user_factory, review_factory):
+        """Test the job stores ranked neighbors and /spot/<id>/similar serves them."""
+        spots = [spot_factory(name=f"Spot {i}") for i in range(3)]
+        deleted = spot_factory(name="Gone", is_deleted=True)
+        unverified = spot_factory(name="Pending", is_verified=False)
+        for i in range(2):
+            diver = user_factory(email=f"diver{i}@example.com", username=f"diver{i}")
+            for spot in (spots[0], spots[1], deleted, unverified):
+                review_factory(author_id=diver.id, beach_id=spot.id)
+
+        result = build_similar_spots()
+        assert result["pairs"] == 2
+        assert SpotSimilarity.query.filter_by(spot_id=spots[0].id).one().similar_spot_id == spots[1].id
+
+        response = client.get(f"/spot/{spots[0].id}/similar")
+        assert [spot["id"] for spot in response.json["data"]] == [spots[1].id]
+        assert response.json["data"][0]["similarity"] == 1.0
+        assert client.get(f"/spot/{spots[2].id}/similar").json["data"] == []
+
+    def test_delete_spot_removes_similarities(self, client, db_session, spot_factory, user_factory, review_factory):
+        """Test deleting a spot drops the similarity rows that point from and to it."""
+        spots = [spot_factory(name=f"Spot {i}") for i in range(2)]
+        for i in range(2):
+            diver = user_factory(email=f"diver{i}@example.com", username=f"diver{i}")
+            for spot in spots:
+                review_factory(author_id=diver.id, beach_id=spot.id)
+        build_similar_spots()
+        assert SpotSimilarity.query.count() == 2
+
+        assert client.get(f"/spots/delete?id={spots[0].id}").status_code == 200
+        assert SpotSimilarity.query.count() == 0
+        assert client.get(f"/spot/{spots[1].id}/similar").json["data"] == []
@@ -0,0 +1,24 @@
+from app.helpers.spot_urls import node_paths, spot_url
+from app.models import GeographicNode
+
+
+class TestSpotUrls:
+    """Test cases for building spot URLs from preloaded geographic paths."""
+
+    def test_matches_get_url(self, db_session, spot_factory):
+        """Test URLs built from node_paths match Spot.get_url, legacy URLs included."""
+        country = GeographicNode(name="Bonaire", short_name="bq", admin_level=0)
+        db_session.add(country)
+        db_session.commit()
+        region = GeographicNode(name="Kralendijk", short_name="kralendijk", admin_level=1, parent_id=country.id)
+        db_session.add(region)
+        db_session.commit()
+        spots = [
+            spot_factory(name="Salt Pier", geographic_node_id=region.id),
+            spot_factory(name="Klein Bonaire", geographic_node_id=country.id),
+            spot_factory(name="Unplaced Reef"),
+        ]
+
+        paths = node_paths()
+        assert paths == {country.id: "bq", region.id: "bq/kralendijk"}
+        assert [spot_url(spot, paths) for spot in spots] == [spot.get_url() for spot in spots]
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import cache, db
+from app.helpers.trending import (
+    TRENDING_HALF_LIFE_HOURS,
+    bump_trending,
+    current_score,
+    decay_trending_scores,
+    get_trending_spots,
+)
+from app.models import ShoreDivingData, Spot
+
+NOW = datetime(2026, 10, 17, 12, 0)
+HALF_LIFE = timedelta(hours=TRENDING_HALF_LIFE_HOURS)
+
+
+class TestTrending:
+    """Test cases for decayed trending scores."""
+
+    def test_bump_decays_then_adds(self, db_session, spot_factory):
+        """Test a bump decays the old score to now before adding the new activity."""
+        spot = spot_factory()
+        bump_trending(spot, 2.0, now=NOW)
+        bump_trending(spot, 1.0, now=NOW + HALF_LIFE)
+        assert spot.trending_score == pytest.approx(2.0)
+        assert spot.trending_updated == NOW + HALF_LIFE
+
+        bump_trending(spot, -1.0, at=NOW, now=NOW + HALF_LIFE)
+        assert spot.trending_score == pytest.approx(1.5)
+
+    def test_utc_offset_times(self, client, db_session, spot_factory):
+        """Test "Z"-suffixed activity times from clients decay like the stored naive UTC ones."""
+        spot = spot_factory()
+        bump_trending(spot, 1.0, at=datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc), now=NOW)
+        assert spot.trending_score == pytest.approx(0.5)
+
+        reviewed = spot_factory(name="Reviewed")
+        db.session.add(ShoreDivingData(id=7, spot=reviewed))
+        db.session.commit()
+        response = client.post(
+            "/review/add/shorediving",
+            json={
+                "beach_id": 7,
+                "review_id": 70,
+                "reviewer_name": "Sandy Bottom",
+                **{level: 4 for level in ("snorkel", "beginner", "intermediate", "advanced", "night")},
+                "review_text": "Calm entry",
+                "date_dived": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+            },
+        )
+        assert response.status_code == 200
+        assert db.session.get(Spot, reviewed.id).trending_score == pytest.approx(1.0, rel=1e-3)
+
+    def test_bulk_decay(self, db_session, spot_factory):
+        """Test the decay job brings stored scores to now and zeroes the faded ones."""
+        active = spot_factory(name="Active", trending_score=4.0, trending_updated=NOW, updated=NOW)
+        faded = spot_factory(name="Faded", trending_score=0.015, trending_updated=NOW)
+
+        result = decay_trending_scores(now=NOW + HALF_LIFE)
+        assert result == {"updated": 2, "zeroed": 1}
+        assert db_session.get(Spot, active.id).trending_score == pytest.approx(2.0)
+        assert db_session.get(Spot, active.id).updated == NOW
+        assert db_session.get(Spot, faded.id).trending_score == 0.0
+
+    def test_ranking_uses_current_scores(self, db_session, spot_factory):
+        """Test a spot with a stale high stored score ranks below one with fresher activity."""
+        stale = spot_factory(name="Stale", trending_score=3.0, trending_updated=NOW - 2 * HALF_LIFE)
+        fresh = spot_factory(name="Fresh", trending_score=1.0, trending_updated=NOW)
+        spot_factory(name="Quiet")
+
+        ranked = get_trending_spots(limit=5, now=NOW)
+        assert [spot.id for _, spot in ranked] == [fresh.id, stale.id]
+        assert ranked[1][0] == pytest.approx(current_score(3.0, NOW - 2 * HALF_LIFE, NOW))
+        assert [spot.id for _, spot in get_trending_spots(limit=1, offset=1, now=NOW)] == [stale.id]
+
+    def test_trending_endpoint(self, client, db_session, spot_factory):
+        """Test /spots/trending returns spots with their current score."""
+        cache.clear()
+        spot = spot_factory(trending_score=1.0, trending_updated=datetime.utcnow())
+        response = client.get("/spots/trending")
+        assert [item["id"] for item in response.json["data"]] == [spot.id]
+        assert response.json["data"][0]["trending_score"] == pytest.approx(1.0, rel=1e-3)
@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock
+
+import pytest
+from cachelib import SimpleCache
+
+from app import cache
+from app.services.shared_cache import SharedRedisCache, fake_redis
+from app.services.two_tier_cache import TwoTierCache
+
+
+@pytest.fixture
+def l2():
+    return MagicMock(wraps=SimpleCache(threshold=1000), default_timeout=300)
+
+
+class TestTwoTierCache:
+    """Test cases for the per-worker LRU in front of the configured cache backend."""
+
+    def test_l1_hit_skips_l2(self, l2):
+        """Test a value read once is served from the L1 without touching L2 again."""
+        tiers = TwoTierCache(l2)
+        l2.set("recs", [1, 2])
+        assert tiers.get("recs") == [1, 2]
+        assert tiers.get("recs") == [1, 2]
+        assert l2.get.call_count == 1
+        stats = tiers.stats()
+        assert stats["l1"]["hits"] == 1 and stats["l1"]["misses"] == 1
+        assert stats["l2"] == {"hits": 1, "misses": 0, "hit_rate": 1.0}
+
+    def test_values_are_copies(self, l2):
+        """Test callers mutating a cached value don't change what the next caller gets."""
+        tiers = TwoTierCache(l2)
+        tiers.set("recs", [1, 2])
+        tiers.get("recs").append(3)
+        assert tiers.get("recs") == [1, 2]
+
+    def test_writes_and_deletes_reach_both_tiers(self, l2):
+        """Test set, set_many and delete keep L1 and L2 in step."""
+        tiers = TwoTierCache(l2)
+        tiers.set_many({"a": 1, "b": 2})
+        assert l2.get("a") == 1 and tiers.get_many("a", "b") == [1, 2]
+        tiers.delete("a")
+        assert l2.get("a") is None and tiers.get("a") is None
+        assert not tiers.add("b", 3)
+        assert tiers.get("b") == 2
+
+    def test_evicts_least_recently_used(self, l2):
+        """Test the L1 keeps at most max_entries, dropping the least recently read."""
+        tiers = TwoTierCache(l2, max_entries=2)
+        tiers.set("a", 1)
+        tiers.set("b", 2)
+        tiers.get("a")
+        tiers.set("c", 3)
+        assert tiers.stats()["l1"]["entries"] == 2
+        l2.reset_mock()
+        tiers.get("a")
+        tiers.get("c")
+        l2.get.assert_not_called()
+        tiers.get("b")
+        l2.get.assert_called_once_with("b")
+
+    def test_bounded_by_bytes(self, l2):
+        """Test the L1 stays under max_bytes and skips values larger than the whole budget."""
+        tiers = TwoTierCache(l2, max_bytes=1000)
+        tiers.set("big", "x" * 2000)
+        tiers.set("a", "x" * 400)
+        tiers.set("b", "x" * 400)
+        tiers.set("c", "x" * 400)
+        stats = tiers.stats()["l1"]
+        assert stats["entries"] == 2 and stats["bytes"] <= 1000
+        assert tiers.get("big") == "x" * 2000
+
+    def test_l1_entries_expire(self, l2):
+        """Test an L1 entry older than the L1 timeout is re-read from L2."""
+        tiers = TwoTierCache(l2, timeout=5)
+        tiers.set("a", 1)
+        l2.set("a", 2)
+        assert tiers.get("a") == 1
+        expires, data = tiers._entries["a"]
+        tiers._entries["a"] = (expires - 10, data)
+        assert tiers.get("a") == 2
+
+    def test_wraps_configured_backend(self, app):
+        """Test CACHE_L1_ENABLED puts the L1 in front of the shared backend."""
+        from app import create_app
+        from tests.conftest import TestConfig
+
+        class L1Config(TestConfig):
+            CACHE_TYPE = "app.services.shared_cache.SharedRedisCache"
+            CACHE_REDIS_URL = "fake://"
+            CACHE_L1_ENABLED = True
+            CACHE_L1_MAX_ENTRIES = 10
+
+        worker_app = create_app(config_object=L1Config)
+        backend = worker_app.extensions["cache"][cache]
+        assert isinstance(backend, TwoTierCache)
+        assert isinstance(backend.l2, SharedRedisCache)
+        assert backend.max_entries == 10
+        fake_redis.flushdb()
+
+    def test_stats_endpoint_is_admin_only(self, client, auth_headers, admin_auth_headers):
+        """Test /cache/stats reports the backend to admins only."""
+        assert client.get("/cache/stats", headers=auth_headers).status_code == 403
+        response = client.get("/cache/stats", headers=admin_auth_headers)
+        assert response.status_code == 200
+        assert response.json["data"]["backend"] == "NullCache"
@@ -0,0 +1,116 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.services.typeahead_cache import TypeaheadCache, can_narrow, typeahead_cache
+from app.services.typeahead_index import typeahead_index
+
+
+@pytest.fixture
+def index(db_session):
+    typeahead_index.clear()
+    typeahead_cache.clear()
+    yield typeahead_index
+    if typeahead_index._build_thread is not None:
+        typeahead_index._build_thread.join()
+    typeahead_index.clear()
+    typeahead_cache.clear()
+
+
+class TestTypeaheadCache:
+    """Test cases for the prefix-aware typeahead cache."""
+
+    def test_can_narrow(self):
+        """Test only prefixes whose match set contains the longer query's are usable."""
+        assert can_narrow("m", "ma")
+        assert can_narrow("mau", "maui")
+        assert not can_narrow("ma", "mau")
+        assert not can_narrow("mo", "ma")
+
+    def test_longer_query_answered_from_prefix(self, index, spot_factory):
+        """Test a complete shorter result answers longer queries exactly as the index would."""
+        spot_factory(name="Maui Reef", num_reviews=5)
+        spot_factory(name="Mala Wharf", num_reviews=3)
+        spot_factory(name="Emma Mole")
+        spot_factory(name="Kamau Point")
+        index.refresh(force=True)
+        cache = TypeaheadCache(index)
+
+        assert cache.search("m")[1] == "miss"
+        results, outcome = cache.search("ma")
+        assert outcome == "prefix_hit"
+        assert results == index.search("ma")
+        assert cache.search("MA")[1] == "hit"
+        assert cache.search("mau")[1] == "miss"
+        results, outcome = cache.search("maui")
+        assert outcome == "prefix_hit"
+        assert results == index.search("maui")
+
+    def test_incomplete_prefix_not_narrowed(self, index, spot_factory):
+        """Test a prefix whose result was cut at the per-kind limit is not used."""
+        for i in range(26):
+            spot_factory(name=f"Reef {i}")
+        spot_factory(name="Reefside")
+        index.refresh(force=True)
+        cache = TypeaheadCache(index)
+        cache.search("reef")
+        results, outcome = cache.search("reefs")
+        assert outcome == "miss"
+        assert [result["text"] for result in results] == ["Reefside"]
+
+    def test_index_changes_invalidate(self, index, spot_factory):
+        """Test cached results are dropped once the index changes."""
+        spot_factory(name="Molokini Crater")
+        index.refresh(force=True)
+        cache = TypeaheadCache(index)
+        cache.search("molo")
+        spot_factory(name="Molokai Reef")
+        index.refresh(force=True)
+        results, outcome = cache.search("molo")
+        assert outcome == "miss"
+        assert len(results) == 2
+
+    def test_unchanged_refresh_keeps_cache(self, index, spot_factory):
+        """Test a refresh that only re-reads unchanged rows leaves cached results valid."""
+        spot_factory(name="Molokini Crater")
+        index.refresh(force=True)
+        cache = TypeaheadCache(index)
+        cache.search("molo")
+        generation = index.generation
+        index.refresh(force=True)
+        assert index.generation == generation
+        assert cache.search("molo")[1] == "hit"
+
+    def test_stats_by_length(self, index):
+        """Test outcomes are counted per query length."""
+        cache = TypeaheadCache(index)
+        cache.search("m")
+        cache.search("m")
+        cache.search("ma")
+        cache.search("an extremely long query")
+        stats = cache.stats()["by_length"]
+        assert stats[1] == {"hit": 1, "prefix_hit": 0, "miss": 1, "hit_rate": 0.5}
+        assert stats[2]["prefix_hit"] == 1
+        assert stats[10]["miss"] == 1
+
+    def test_stats_endpoint_requires_admin(self, client, index, user_factory):
+        """Test /search/typeahead/stats is only served to admins."""
+        index.refresh(force=True)
+        client.get("/search/typeahead?query=ma")
+        user = user_factory()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=user.id)}"}
+        assert client.get("/search/typeahead/stats", headers=headers).status_code == 403
+        admin = user_factory(admin=True, email="admin@example.com", username="adminuser")
+        headers = {"Authorization": f"Bearer {create_access_token(identity=admin.id)}"}
+        response = client.get("/search/typeahead/stats", headers=headers)
+        assert response.json["data"]["by_length"]["2"]["miss"] == 1
+
+    def test_origin_reranks_cached_entries(self, index, spot_factory):
+        """Test a location-biased query reuses the text-ranked cache entry."""
+        spot_factory(name="Turtle Reef", latitude=20.63, longitude=-156.44, num_reviews=90)
+        near = spot_factory(name="Big Turtle Cove", latitude=34.01, longitude=-118.50)
+        index.refresh(force=True)
+        cache = TypeaheadCache(index)
+        cache.search("turtle")
+        results, outcome = cache.search("turtle", origin=(34.02, -118.49))
+        assert outcome == "hit"
+        assert results[0]["id"] == near.id
@@ -0,0 +1,98 @@
+import pytest
+
+from app import cache
+from app.helpers.normalize_text import normalize_text
+from app.models import Country, DiveShop
+from app.services.typeahead_index import typeahead_index
+
+
+@pytest.fixture
+def index(db_session):
+    typeahead_index.clear()
+    cache.clear()
+    yield typeahead_index
+    if typeahead_index._build_thread is not None:
+        typeahead_index._build_thread.join()
+    typeahead_index.clear()
+
+
+class TestTypeaheadIndex:
+    """Test cases for the in-memory typeahead index."""
+
+    def test_normalize_text(self):
+        """Test matching text is lowercased, unaccented and stripped of punctuation."""
+        assert normalize_text("Curaçao") == "curacao"
+        assert normalize_text("  Molokini's  Crater!") == "molokinis crater"
+        assert normalize_text(None) == ""
+
+    def test_locations_have_precomputed_urls(self, index, sample_locality):
+        """Test location results carry the same URL and data segments the ILIKE version built."""
+        index.refresh(force=True)
+        result = index.search("santa mon")[0]
+        assert result["url"] == "/loc/us/ca/la/santa-monica"
+        assert result["subtext"] == "United States"
+        assert result["data"] == {"country": "us", "area_one": "ca", "area_two": "la", "locality": "santa-monica"}
+
+    def test_unaccented_match_and_ranking(self, index, db_session, spot_factory):
+        """Test accents are ignored and exact/prefix name matches outrank substring matches."""
+        db_session.add(Country(name="Curaçao", short_name="cw", url="/cw"))
+        spot_factory(name="Blue Bay Curacao", num_reviews=50)
+        spot_factory(name="Curacao Tugboat", num_reviews=1)
+        spot_factory(name="Reef", location_city="Willemstad, Curacao")
+        index.refresh(force=True)
+
+        results = index.search("CURACAO")
+        assert [result["text"] for result in results] == ["Curaçao", "Curacao Tugboat", "Blue Bay Curacao", "Reef"]
+        assert index.search("cu", beach_only=True) == results[1:]
+
+    def test_incremental_refresh(self, index, db_session, spot_factory):
+        """Test refreshes pick up new, renamed and deleted rows without a rebuild."""
+        spot = spot_factory(name="Molokini Crater")
+        index.refresh(force=True)
+        assert len(index.search("molokini")) == 1
+
+        db_session.add(DiveShop(name="Molokini Divers", city="Kihei"))
+        spot.is_deleted = True
+        db_session.commit()
+        index.refresh(force=True)
+        assert [result["type"] for result in index.search("molokini")] == ["shop"]
+
+    def test_due_rebuild_runs_in_the_background(self, index, spot_factory):
+        """Test a due rebuild swaps in a full scan from the build thread and moves the generation on."""
+        spot_factory(name="Molokini Crater")
+        index.refresh(force=True)
+        generation = index.generation
+        spot_factory(name="Molokini Shoal")
+        index._built_at -= index.rebuild_interval
+
+        index.refresh(max_age=0, background=True)
+        index._build_thread.join()
+        assert len(index.search("molokini")) == 2
+        assert index.generation > generation
+
+    def test_typeahead_endpoint(self, client, index, sample_spot):
+        """Test /search/typeahead answers spots and shops from the tables until its build lands, then from the index."""
+        response = client.get("/search/typeahead?query=monica")
+        assert [result["text"] for result in response.json["data"]] == ["Santa Monica Beach"]
+        index._build_thread.join()
+        response = client.get("/search/typeahead?query=monica")
+        assert response.json["data"][0]["text"] == "Santa Monica"
+        assert "Santa Monica Beach" in [result["text"] for result in response.json["data"]]
+
+    def test_location_bias(self, index, spot_factory):
+        """Test nearby spots outrank better text matches far away, and distant ones don't."""
+        far = spot_factory(name="Turtle Reef", latitude=20.63, longitude=-156.44, num_reviews=90)
+        near = spot_factory(name="Big Turtle Cove", latitude=34.01, longitude=-118.50)
+        index.refresh(force=True)
+        assert [result["id"] for result in index.search("turtle")] == [far.id, near.id]
+        assert [result["id"] for result in index.search("turtle", origin=(34.02, -118.49))] == [near.id, far.id]
+        assert [result["id"] for result in index.search("turtle", origin=(0.0, 0.0))] == [far.id, near.id]
+
+    def test_typeahead_endpoint_with_location(self, client, index, spot_factory):
+        """Test /search/typeahead ranks by location and returns nearby spots before any query."""
+        spot_factory(name="Turtle Reef", latitude=20.63, longitude=-156.44, num_reviews=90)
+        spot_factory(name="Big Turtle Cove", latitude=34.01, longitude=-118.50)
+        response = client.get("/search/typeahead?query=turtle&latitude=34.02&longitude=-118.49")
+        assert [result["text"] for result in response.json["data"]] == ["Big Turtle Cove", "Turtle Reef"]
+        response = client.get("/search/typeahead?latitude=34.02&longitude=-118.49")
+        assert response.json["data"][0]["text"] == "Big Turtle Cove"